@@ -1,42 +1,61 @@
+import os
+import tempfile
 import streamlit as st
 import pandas as pd
-import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, date, timedelta
 from database import Database
-from typing import Dict, Any, List
+from query_cache import QueryCache
+from export import ExportJob, FORMATS
+from engagement import EngagementAnalytics
+from typing import Dict, Any, List, Optional
 
 class AdminPanel:
-    def __init__(self, database: Database):
+    def __init__(self, database: Database, cache: Optional[QueryCache] = None):
         self.db = database
+        self.cache = cache or QueryCache(database)
+        self.engagement = EngagementAnalytics(database)
+    
+    def quick_stats(self) -> Dict[str, int]:
+        """빠른 통계 (공유 캐시; active_raffles 는 시각 기준이라 60초 TTL)"""
+        return self.cache.get('quick_stats', self.db.get_quick_stats, depends=('users', 'raffles'),
+                              key=date.today(), ttl=60)
+    
+    def user_stats(self) -> Dict[str, Any]:
+        """SQL 집계 통계 (공유 캐시; 사용자 데이터 버전이 바뀔 때만 다시 계산)"""
+        return self.cache.get('user_stats', lambda: {
+            'summary': self.db.get_user_summary(),
+            'coins': self.db.get_user_histogram('coins', 20),
+            'streak': self.db.get_user_histogram('consecutive_checkins', 15),
+            'growth': self.db.get_signup_growth()
+        })
+    
+    # 메뉴 -> 렌더 메서드
+    SECTIONS = {
+        "📊 Dashboard": "render_dashboard",
+        "👥 User Management": "render_user_management",
+        "🎰 Raffle Management": "render_raffle_management",
+        "🛍️ Product Management": "render_product_management",
+        "📣 Broadcast": "render_broadcast",
+        "📈 Statistics": "render_statistics",
+        "📤 Export": "render_export",
+        "⚙️ Settings": "render_settings"
+    }
     
     def render(self):
         """Render admin panel"""
         st.header("📊 Admin Panel")
         
-        # Create tabs
-        tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs([
-            "📊 Dashboard", "👥 User Management", "🎰 Raffle Management", 
-            "🛍️ Product Management", "📈 Statistics", "⚙️ Settings"
-        ])
-        
-        with tab1:
-            self.render_dashboard()
-        
-        with tab2:
-            self.render_user_management()
-        
-        with tab3:
-            self.render_raffle_management()
-        
-        with tab4:
-            self.render_product_management()
-        
-        with tab5:
-            self.render_statistics()
+        # Only the selected section runs its queries (st.tabs ran all of them on every rerun)
+        section = st.radio("Section", list(self.SECTIONS), horizontal=True,
+                           key="admin_section", label_visibility="collapsed")
         
-        with tab6:
-            self.render_settings()
+        # Widgets inside the section rerun just the section; writes call st.rerun() for the whole app
+        st.fragment(getattr(self, self.SECTIONS[section]))()
+    
+    def engagement_report(self) -> Dict[str, Any]:
+        """참여 지표 (롤업 증분 갱신 후 조회; 체크인은 사용자 변경이라 'users' 버전에 의존)"""
+        return self.cache.get('engagement', self.engagement.report, depends=('users',), key=date.today())
     
     def render_dashboard(self):
         """Render dashboard"""
@@ -44,7 +63,7 @@ class AdminPanel:
         
         try:
             # 주요 지표
-            stats = self.db.get_quick_stats()
+            stats = self.quick_stats()
             
             col1, col2, col3, col4 = st.columns(4)
             
@@ -70,9 +89,8 @@ class AdminPanel:
                 )
             
             with col4:
-                # 총 코인 발행량 계산
-                users = self.db.get_all_users()
-                total_coins = sum(user['total_earned'] for user in users)
+                # 총 코인 발행량
+                total_coins = self.user_stats()['summary']['total_earned']
                 st.metric(
                     label="총 발행 코인",
                     value=f"{total_coins:,}",
@@ -85,9 +103,8 @@ class AdminPanel:
             st.subheader("📅 최근 활동")
             
             # 최근 가입한 사용자들
-            users = self.db.get_all_users()
-            if users:
-                recent_users = users[:5]  # 최근 5명
+            recent_users = self.cache.get('recent_users', lambda: self.db.get_users_page(limit=5))  # 최근 5명
+            if recent_users:
                 
                 st.write("**최근 가입 사용자**")
                 for user in recent_users:
@@ -96,80 +113,98 @@ class AdminPanel:
         except Exception as e:
             st.error(f"대시보드 로딩 중 오류: {e}")
     
+    # 사용자 목록 정렬 -> (컬럼, 내림차순)
+    USER_SORTS = {
+        "Joined Date (Newest)": ("joined_date", True),
+        "Joined Date (Oldest)": ("joined_date", False),
+        "Coins (Most)": ("coins", True),
+        "Coins (Least)": ("coins", False),
+        "Total Earned (Most)": ("total_earned", True),
+        "Consecutive Check-ins (Most)": ("consecutive_checkins", True)
+    }
+    USERS_PAGE_SIZE = 50
+    
+    def user_picker(self, key: str, limit: int = 20) -> Optional[int]:
+        """Type-ahead user picker: options are only the users matching the typed text"""
+        query = st.text_input("Find User", key=f"{key}_query", placeholder="Name, username or user ID",
+                              help="Type part of a name, username or a user ID")
+        matches = self.db.get_users_page(query, limit=limit) if query.strip() else []
+        labels = {
+            user['user_id']: f"{user['full_name']} ({user['username']}) - Current: {user['coins']} coins"
+            for user in matches
+        }
+        return st.selectbox(
+            "Choose User",
+            list(labels),
+            index=None,
+            format_func=labels.get,
+            placeholder="Select a user..." if labels else "Type to search users...",
+            key=f"{key}_choice",
+            help="Select a user to manage their coins"
+        )
+    
     def render_user_management(self):
         """User Management"""
         st.subheader("👥 User Management")
         
         try:
-            users = self.db.get_all_users()
-            
-            if not users:
+            if not self.quick_stats()['total_users']:
                 st.info("No registered users found.")
                 return
             
-            # Convert user list to DataFrame
-            df = pd.DataFrame(users)
-            
-            # Search functionality
-            search_term = st.text_input("🔍 Search Users (name or username)")
-            if search_term:
-                df = df[
-                    df['full_name'].str.contains(search_term, case=False, na=False) |
-                    df['username'].str.contains(search_term, case=False, na=False)
-                ]
-            
-            # Sort options
-            sort_options = {
-                "Joined Date (Newest)": ("joined_date", False),
-                "Joined Date (Oldest)": ("joined_date", True),
-                "Coins (Most)": ("coins", False),
-                "Coins (Least)": ("coins", True),
-                "Total Earned (Most)": ("total_earned", False),
-                "Consecutive Check-ins (Most)": ("consecutive_checkins", False)
-            }
-            
-            sort_by = st.selectbox("Sort by", list(sort_options.keys()))
-            column, ascending = sort_options[sort_by]
-            df = df.sort_values(by=column, ascending=ascending)
+            # Search, sort and paging run in SQL (FTS5 search, indexed ORDER BY ... LIMIT/OFFSET)
+            search_term = st.text_input("🔍 Search Users (name, username or user ID)", key="user_search")
+            
+            col_sort, col_page = st.columns([3, 1])
+            with col_sort:
+                sort_by = st.selectbox("Sort by", list(self.USER_SORTS.keys()))
+            column, descending = self.USER_SORTS[sort_by]
+            
+            total = self.db.count_users(search_term) if search_term.strip() else self.quick_stats()['total_users']
+            pages = max(1, -(-total // self.USERS_PAGE_SIZE))
+            with col_page:
+                page = st.number_input("Page", min_value=1, max_value=pages, value=1, step=1, key="user_page")
+            
+            offset = (min(page, pages) - 1) * self.USERS_PAGE_SIZE
+            users = self.db.get_users_page(search_term, column, descending, self.USERS_PAGE_SIZE, offset)
             
             # User list display
-            st.dataframe(
-                df[['user_id', 'full_name', 'username', 'coins', 'total_earned', 
-                    'consecutive_checkins', 'total_checkins', 'joined_date']],
-                column_config={
-                    'user_id': 'User ID',
-                    'full_name': 'Full Name',
-                    'username': 'Username',
-                    'coins': 'Current Coins',
-                    'total_earned': 'Total Earned',
-                    'consecutive_checkins': 'Consecutive Days',
-                    'total_checkins': 'Total Check-ins',
-                    'joined_date': 'Joined Date'
-                },
-                use_container_width=True
-            )
+            if users:
+                st.dataframe(
+                    pd.DataFrame(users)[['user_id', 'full_name', 'username', 'coins', 'total_earned',
+                                         'consecutive_checkins', 'total_checkins', 'joined_date']],
+                    column_config={
+                        'user_id': 'User ID',
+                        'full_name': 'Full Name',
+                        'username': 'Username',
+                        'coins': 'Current Coins',
+                        'total_earned': 'Total Earned',
+                        'consecutive_checkins': 'Consecutive Days',
+                        'total_checkins': 'Total Check-ins',
+                        'joined_date': 'Joined Date'
+                    },
+                    use_container_width=True
+                )
+                st.caption(f"Showing {offset + 1:,}–{offset + len(users):,} of {total:,} users")
+            else:
+                st.info("No users match your search.")
             
+            # Typing in the picker reruns only the coin management fragment
+            st.fragment(self.render_coin_management)()
+            
+        except Exception as e:
+            st.error(f"Error loading user management: {e}")
+    
+    def render_coin_management(self):
+        """Coin Management"""
+        try:
             # Coin management section
             st.subheader("💰 Coin Management")
             
-            # Create user selection options
-            user_options = ["Select a user..."]
-            user_mapping = {}
-            
-            for _, user in df.iterrows():
-                display_name = f"{user['full_name']} ({user['username']}) - Current: {user['coins']} coins"
-                user_options.append(display_name)
-                user_mapping[display_name] = user['user_id']
-            
             col1, col2 = st.columns(2)
             
             with col1:
-                # Replace the number input with user selection dropdown
-                selected_user = st.selectbox(
-                    "Choose User",
-                    user_options,
-                    help="Select a user to manage their coins"
-                )
+                target_user_id = self.user_picker("coin_user")
                 
                 coin_amount = st.number_input("Coin Amount", min_value=1, value=10, step=10)
                 
@@ -179,16 +214,15 @@ class AdminPanel:
             
             # Process coins if user is selected
             if st.button("💰 Process Coins", type="primary"):
-                if selected_user != "Select a user..." and coin_amount and reason:
+                if target_user_id is not None and coin_amount and reason:
                     try:
-                        target_user_id = user_mapping[selected_user]
                         user_info = self.db.get_user_info(target_user_id)
                         
                         if not user_info:
                             st.error("User not found.")
                         else:
                             amount = coin_amount if action == "Add Coins" else -coin_amount
-                            self.db.add_coins(target_user_id, amount)
+                            self.db.add_coins(target_user_id, amount, reason)
                             
                             action_text = "added to" if action == "Add Coins" else "removed from"
                             st.success(f"✅ {coin_amount} coins {action_text} {user_info['full_name']}!")
@@ -220,7 +254,7 @@ class AdminPanel:
                             st.error("User not found.")
                         else:
                             amount = manual_coin_amount if manual_action == "Add Coins" else -manual_coin_amount
-                            self.db.add_coins(manual_user_id, amount)
+                            self.db.add_coins(manual_user_id, amount, manual_reason)
                             
                             action_text = "added to" if manual_action == "Add Coins" else "removed from"
                             st.success(f"✅ {manual_coin_amount} coins {action_text} User ID {manual_user_id}!")
@@ -231,7 +265,12 @@ class AdminPanel:
                     st.warning("Please fill all fields.")
             
         except Exception as e:
-            st.error(f"Error loading user management: {e}")
+            st.error(f"Error loading coin management: {e}")
+    
+    # 래플 상태 필터 -> status
+    RAFFLE_STATUS_FILTERS = {"전체": None, "진행중": "active", "종료": "completed", "중지": "stopped"}
+    RAFFLES_PAGE_SIZE = 20
+    ENTRIES_PAGE_SIZE = 50
     
     def render_raffle_management(self):
         """래플 관리"""
@@ -245,7 +284,9 @@ class AdminPanel:
                 with col1:
                     raffle_name = st.text_input("Raffle Name", placeholder="e.g., iPhone 15 Pro Giveaway")
                     prize = st.text_input("Prize", placeholder="e.g., iPhone 15 Pro 256GB")
-                    entry_cost = st.number_input("Entry Cost (coins)", min_value=1, value=100)
+                    entry_cost = st.number_input("Entry Cost (coins per ticket)", min_value=1, value=100)
+                    max_entries = st.number_input("Ticket Limit (0 = unlimited)", min_value=0, value=0)
+                    winners = st.number_input("Winners", min_value=1, value=1)
                 
                 with col2:
                     description = st.text_area("Description", placeholder="Enter detailed description of the raffle")
@@ -262,7 +303,9 @@ class AdminPanel:
                             description=description,
                             prize=prize,
                             entry_cost=entry_cost,
-                            end_date=end_datetime.isoformat()
+                            end_date=end_datetime.isoformat(),
+                            max_entries=int(max_entries) or None,
+                            winners=int(winners)
                         )
                         st.success(f"✅ Raffle '{raffle_name}' created successfully! (ID: {raffle_id})")
                         st.rerun()
@@ -273,24 +316,35 @@ class AdminPanel:
         st.subheader("📋 래플 목록")
         
         try:
-            raffles = self.db.get_all_raffles()
-            
-            if not raffles:
-                st.info("생성된 래플이 없습니다.")
+            # 상태별 필터링과 페이지는 SQL 에서 (당첨자 이름, 참여 수, 모인 코인 포함 한 번의 쿼리)
+            col_filter, col_page = st.columns([3, 1])
+            with col_filter:
+                status_filter = st.selectbox("상태 필터", list(self.RAFFLE_STATUS_FILTERS))
+            filter_status = self.RAFFLE_STATUS_FILTERS[status_filter]
+            
+            total = self.cache.get('raffle_count', lambda: self.db.count_raffles(filter_status),
+                                   depends=('raffles',), key=filter_status)
+            if not total:
+                st.info("생성된 래플이 없습니다." if filter_status is None else "해당 상태의 래플이 없습니다.")
                 return
             
-            # 래플 목록을 DataFrame으로 변환
-            df = pd.DataFrame(raffles)
-            
-            # 상태별 필터링
-            status_filter = st.selectbox("상태 필터", ["전체", "진행중", "종료"])
+            pages = max(1, -(-total // self.RAFFLES_PAGE_SIZE))
+            with col_page:
+                page = st.number_input("Page", min_value=1, max_value=pages, value=1, step=1, key="raffle_page")
+            offset = (min(page, pages) - 1) * self.RAFFLES_PAGE_SIZE
             
-            if status_filter != "전체":
-                filter_status = "active" if status_filter == "진행중" else "completed"
-                df = df[df['status'] == filter_status]
+            # 참여는 사용자 변경으로 기록되므로 'users' 버전에도 의존
+            raffles = self.cache.get(
+                'raffles_page',
+                lambda: self.db.get_raffles_page(filter_status, self.RAFFLES_PAGE_SIZE, offset),
+                depends=('raffles', 'users'), key=(filter_status, offset)
+            )
+            st.caption(f"Showing {offset + 1}–{offset + len(raffles)} of {total} raffles")
             
             # 래플 목록 표시
-            for _, raffle in df.iterrows():
+            @st.fragment
+            def raffle_row(raffle):
+                # A click in one row reruns only that row
                 with st.container():
                     col1, col2, col3 = st.columns([2, 1, 1])
                     
@@ -303,19 +357,32 @@ class AdminPanel:
                     with col2:
                         st.write(f"📅 시작: {raffle['start_date'][:10]}")
                         st.write(f"📅 마감: {raffle['end_date'][:10]}")
+                        st.write(f"👥 참여: {raffle['entries']}명 · {raffle['coins_collected']:,} 코인")
+                        limit = f" / {raffle['max_entries']:,}" if raffle['max_entries'] else ""
+                        st.write(f"🎟️ 티켓: {raffle['tickets_sold']:,}{limit} · 당첨 {raffle['winners']}명")
                         if raffle['winner_id']:
-                            # Get winner information
-                            winner_info = self.db.get_user_info(raffle['winner_id'])
-                            if winner_info:
-                                winner_display = f"{winner_info['full_name']} (ID: {raffle['winner_id']})"
+                            if raffle['winner_name']:
+                                winner_display = f"{raffle['winner_name']} (ID: {raffle['winner_id']})"
                             else:
                                 winner_display = f"User ID: {raffle['winner_id']}"
+                            if raffle['winners_drawn'] > 1:
+                                winner_display += f" 외 {raffle['winners_drawn'] - 1}명"
                             st.write(f"🏆 Winner: {winner_display}")
+                        # 추첨 전에는 해시만, 추첨 후에는 시드와 당첨 순번을 공개
+                        if raffle['draw_seed']:
+                            drawn = (f"ticket #{raffle['draw_index'] + 1} of {raffle['draw_entries']}"
+                                     if raffle['draw_entries'] else "no entries")
+                            st.caption(f"🔐 Seed: `{raffle['draw_seed']}` · {drawn}")
+                        elif raffle['draw_commitment']:
+                            st.caption(f"🔐 Draw hash: `{raffle['draw_commitment']}`")
                     
                     with col3:
+                        if st.button(f"👥 View Entries", key=f"entries_{raffle['id']}"):
+                            self.show_raffle_entries(raffle)
+                        
                         if raffle['status'] == 'active':
                             if st.button(f"🎯 Draw Winner", key=f"draw_{raffle['id']}"):
-                                self.draw_raffle_winner(int(raffle['id']))
+                                self.draw_raffle_winner(raffle)
                             
                             if st.button(f"⏹️ Stop Raffle", key=f"stop_{raffle['id']}"):
                                 self.stop_raffle(int(raffle['id']))
@@ -337,40 +404,77 @@ class AdminPanel:
                             with col_cancel:
                                 if st.button("❌ Cancel", key=f"confirm_delete_raffle_no_{raffle['id']}"):
                                     st.session_state[f"confirm_delete_raffle_{raffle['id']}"] = False
-                                    st.rerun()
+                                    st.rerun(scope="fragment")
                     
                     st.divider()
+            
+            for raffle in raffles:
+                raffle_row(raffle)
         
         except Exception as e:
             st.error(f"래플 목록 로딩 중 오류: {e}")
     
-    def draw_raffle_winner(self, raffle_id: int):
-        """Draw a winner for the raffle"""
+    def show_raffle_entries(self, raffle: Dict[str, Any]):
+        """Open the entries dialog for a raffle"""
+        st.dialog(f"Raffle Entries - {raffle['name']}", width="large")(self.render_raffle_entries)(raffle)
+    
+    def render_raffle_entries(self, raffle: Dict[str, Any]):
+        """Paginated raffle entries with user names (dialog body)"""
+        total = raffle['entries']
+        st.metric("Total Entries", total)
+        
+        if not total:
+            st.info("No entries yet")
+            return
+        
+        pages = max(1, -(-total // self.ENTRIES_PAGE_SIZE))
+        page = st.number_input("Page", min_value=1, max_value=pages, value=1, step=1,
+                               key=f"entries_page_{raffle['id']}")
+        offset = (min(page, pages) - 1) * self.ENTRIES_PAGE_SIZE
+        entries = self.db.get_raffle_entries_page(raffle['id'], self.ENTRIES_PAGE_SIZE, offset)
+        
+        st.dataframe(
+            pd.DataFrame([
+                {
+                    '#': offset + position,
+                    'user': entry['full_name'] or entry['username'] or f"User {entry['user_id']}",
+                    'username': f"@{entry['username']}" if entry['username'] else "",
+                    'entered': entry['entry_date'],
+                    'tickets': entry['tickets'],
+                    'coins': entry['coins_spent'],
+                    'winner': f"🏆 #{entry['place']}" if entry['place'] else ""
+                }
+                for position, entry in enumerate(entries, 1)
+            ]),
+            hide_index=True,
+            use_container_width=True
+        )
+        st.caption(f"Showing {offset + 1}–{offset + len(entries)} of {total} entries")
+        
+        if raffle['status'] == 'completed' and not raffle['winner_id']:
+            st.warning("⚠️ This raffle has ended but no winner has been selected yet.")
+    
+    def draw_raffle_winner(self, raffle: Dict[str, Any]):
+        """Close the raffle and draw its committed-seed winner"""
         try:
-            # Get raffle entries
-            entries = self.db.get_raffle_entries(raffle_id)
-            
-            if not entries:
+            if not raffle['entries']:
                 st.warning("No entries found for this raffle.")
                 return
-                
-            # Randomly select a winner
-            import random
-            winner_id = random.choice(entries)
-            
-            # Update raffle with winner
-            self.db.set_raffle_winner(raffle_id, winner_id)
             
-            # Get winner info
-            winner_info = self.db.get_user_info(winner_id)
-            raffle_info = self.db.get_raffle(raffle_id)
+            # 당첨자 선정, 마감, 시드 공개는 한 트랜잭션
+            result = self.db.close_and_draw_raffle(int(raffle['id']))
+            if result is None:
+                st.warning("This raffle has already been closed.")
+                return
             
-            if winner_info and raffle_info:
-                st.success(f"🎉 Winner drawn! {winner_info['full_name']} won '{raffle_info['prize']}'!")
-                st.balloons()
-                st.rerun()
-            else:
-                st.error("Could not retrieve winner or raffle information.")
+            winners = ", ".join(
+                f"#{winner['place']} {winner['full_name'] or winner['username'] or winner['user_id']}"
+                for winner in self.db.get_raffle_winners(result['id'])
+            )
+            st.success(f"🎉 Winners drawn for '{result['prize']}': {winners} "
+                       f"({result['draw_entries']} tickets)")
+            st.balloons()
+            st.rerun()
             
         except Exception as e:
             st.error(f"Error drawing winner: {e}")
@@ -458,7 +562,7 @@ class AdminPanel:
         st.subheader("📋 Product List")
         
         try:
-            products = self.db.get_all_products()
+            products = self.cache.get('all_products', self.db.get_all_products, depends=('catalog',))
             
             if not products:
                 st.info("No products registered yet.")
@@ -475,7 +579,9 @@ class AdminPanel:
                 df = df[df['category'] == category_filter]
             
             # Display product list
-            for _, product in df.iterrows():
+            @st.fragment
+            def product_row(product):
+                # A click in one row reruns only that row
                 with st.container():
                     col1, col2, col3 = st.columns([2, 1, 1])
                     
@@ -518,7 +624,7 @@ class AdminPanel:
                             with col_cancel:
                                 if st.button("❌ Cancel", key=f"confirm_no_{product['id']}"):
                                     st.session_state[f"confirm_delete_{product['id']}"] = False
-                                    st.rerun()
+                                    st.rerun(scope="fragment")
                     
                     # Show edit form if editing this product
                     if st.session_state.get(f"editing_{product['id']}", False):
@@ -583,41 +689,142 @@ class AdminPanel:
                                 with col_cancel:
                                     if st.form_submit_button("❌ Cancel"):
                                         st.session_state[f"editing_{product['id']}"] = False
-                                        st.rerun()
+                                        st.rerun(scope="fragment")
                     
                     st.divider()
+            
+            for _, product in df.iterrows():
+                product_row(product)
         
         except Exception as e:
             st.error(f"Error loading product list: {e}")
     
+    def render_broadcast(self):
+        """Broadcast messages to all users"""
+        st.subheader("📣 Broadcast")
+        
+        with st.form("create_broadcast", clear_on_submit=True):
+            message = st.text_area(
+                "Announcement Message",
+                placeholder="Enter your announcement message here...",
+                max_chars=4096,
+                help="Sent as plain text to every user by the running bot"
+            )
+            submitted = st.form_submit_button("📣 Send to All Users")
+            
+            if submitted:
+                if message.strip():
+                    try:
+                        broadcast_id = self.db.create_broadcast(message.strip())
+                        st.success(f"✅ Broadcast queued! (ID: {broadcast_id}) The bot will start sending shortly.")
+                    except Exception as e:
+                        st.error(f"Error queuing broadcast: {e}")
+                else:
+                    st.warning("Please enter a message.")
+        
+        st.subheader("📋 Broadcast Progress")
+        
+        @st.fragment(run_every=2)
+        def broadcast_progress():
+            try:
+                broadcasts = self.db.get_broadcasts(limit=10)
+                
+                if not broadcasts:
+                    st.info("No broadcasts yet.")
+                    return
+                
+                status_emojis = {'queued': '🟡', 'running': '🟢', 'completed': '✅', 'cancelled': '⚫'}
+                
+                for broadcast in broadcasts:
+                    done = broadcast['sent_count'] + broadcast['failed_count']
+                    total = max(broadcast['total_recipients'], done)
+                    elapsed = broadcast['elapsed_seconds']
+                    throughput = done / elapsed if elapsed > 0 else 0.0
+                    
+                    col1, col2 = st.columns([3, 1])
+                    
+                    with col1:
+                        emoji = status_emojis.get(broadcast['status'], '❓')
+                        preview = broadcast['message'][:80] + ("..." if len(broadcast['message']) > 80 else "")
+                        st.write(f"{emoji} **#{broadcast['id']}** {preview}")
+                        st.progress(done / total if total else 1.0,
+                                    text=f"{done}/{total} processed · {broadcast['sent_count']} sent · "
+                                         f"{broadcast['failed_count']} failed · {throughput:.1f} msg/s")
+                    
+                    with col2:
+                        st.write(f"Status: {broadcast['status']}")
+                        if broadcast['status'] == 'running' and throughput > 0:
+                            st.write(f"ETA: {(total - done) / throughput:.0f}s")
+                        if broadcast['status'] in ('queued', 'running'):
+                            if st.button("⏹️ Cancel", key=f"cancel_broadcast_{broadcast['id']}"):
+                                self.db.set_broadcast_status(broadcast['id'], 'cancelled')
+                                st.rerun(scope="fragment")
+            
+            except Exception as e:
+                st.error(f"Error loading broadcasts: {e}")
+        
+        broadcast_progress()
+        
+        st.subheader("⏰ Daily Reminder Runs")
+        
+        try:
+            runs = self.db.get_reminder_runs(limit=14)
+            
+            if runs:
+                df = pd.DataFrame(runs)
+                df['throughput'] = (df['sent_count'] / df['elapsed_seconds'].where(df['elapsed_seconds'] > 0)).fillna(0).round(2)
+                st.dataframe(
+                    df[['run_date', 'status', 'eligible_count', 'sent_count', 'failed_count',
+                        'skipped_count', 'elapsed_seconds', 'throughput']],
+                    column_config={
+                        'run_date': 'Date',
+                        'status': 'Status',
+                        'eligible_count': 'Eligible',
+                        'sent_count': 'Sent',
+                        'failed_count': 'Failed',
+                        'skipped_count': 'Checked in during run',
+                        'elapsed_seconds': st.column_config.NumberColumn('Duration (s)', format="%.0f"),
+                        'throughput': 'msg/s'
+                    },
+                    hide_index=True,
+                    use_container_width=True
+                )
+            else:
+                st.info("No reminder runs yet.")
+        
+        except Exception as e:
+            st.error(f"Error loading reminder runs: {e}")
+    
     def render_statistics(self):
         """통계"""
         st.subheader("📈 시스템 통계")
         
         try:
-            users = self.db.get_all_users()
+            # 집계는 DB 에서 (수 KB), 데이터 버전별로 캐시
+            stats = self.user_stats()
+            summary = stats['summary']
             
-            if not users:
+            if not summary['total_users']:
                 st.info("통계를 표시할 데이터가 없습니다.")
                 return
             
-            df = pd.DataFrame(users)
-            
             # 기본 통계
             col1, col2, col3 = st.columns(3)
             
             with col1:
-                st.metric("총 사용자", len(df))
-                st.metric("평균 보유 코인", f"{df['coins'].mean():.1f}")
+                st.metric("총 사용자", summary['total_users'])
+                st.metric("평균 보유 코인", f"{summary['avg_coins']:.1f}")
             
             with col2:
-                st.metric("총 발행 코인", f"{df['total_earned'].sum():,}")
-                st.metric("평균 연속 체크인", f"{df['consecutive_checkins'].mean():.1f}일")
+                st.metric("총 발행 코인", f"{summary['total_earned']:,}")
+                st.metric("평균 연속 체크인", f"{summary['avg_streak']:.1f}일")
             
             with col3:
-                active_users = len(df[df['consecutive_checkins'] > 0])
-                st.metric("활성 사용자", f"{active_users}")
-                st.metric("활성 비율", f"{active_users/len(df)*100:.1f}%")
+                # 이번 달 체크인한 사용자 (롤업)
+                engagement = self.engagement_report()
+                active_users = engagement['activity']['today']['mau']
+                st.metric("활성 사용자 (MAU)", f"{active_users}")
+                st.metric("활성 비율", f"{active_users/summary['total_users']*100:.1f}%")
             
             st.divider()
             
@@ -626,27 +833,21 @@ class AdminPanel:
             
             with col1:
                 # 코인 분포 히스토그램
-                fig_coins = px.histogram(
-                    df, x='coins', nbins=20,
-                    title="사용자별 보유 코인 분포",
-                    labels={'coins': '보유 코인', 'count': '사용자 수'}
-                )
-                st.plotly_chart(fig_coins, use_container_width=True)
+                st.plotly_chart(self.histogram_chart(stats['coins'], "사용자별 보유 코인 분포", '보유 코인'),
+                                use_container_width=True)
             
             with col2:
                 # 연속 체크인 분포
-                fig_checkins = px.histogram(
-                    df, x='consecutive_checkins', nbins=15,
-                    title="연속 체크인 일수 분포",
-                    labels={'consecutive_checkins': '연속 체크인 일수', 'count': '사용자 수'}
-                )
-                st.plotly_chart(fig_checkins, use_container_width=True)
+                st.plotly_chart(self.histogram_chart(stats['streak'], "연속 체크인 일수 분포", '연속 체크인 일수'),
+                                use_container_width=True)
+            
+            self.render_engagement(engagement)
+            
+            # 기간을 바꿔도 코인 흐름만 다시 그린다
+            st.fragment(self.render_coin_flow)()
             
             # 가입일별 사용자 증가 추이
-            df['joined_date'] = pd.to_datetime(df['joined_date'])
-            daily_signups = df.groupby(df['joined_date'].dt.date).size().reset_index()
-            daily_signups.columns = ['date', 'signups']
-            daily_signups['cumulative'] = daily_signups['signups'].cumsum()
+            daily_signups = pd.DataFrame(stats['growth'])
             
             fig_growth = go.Figure()
             fig_growth.add_trace(go.Scatter(
@@ -667,23 +868,197 @@ class AdminPanel:
             # 상위 사용자들
             st.subheader("🏆 상위 사용자")
             
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                st.write("**💰 코인 많이 보유한 사용자**")
-                top_coins = df.nlargest(10, 'coins')[['full_name', 'coins']]
-                for idx, row in top_coins.iterrows():
-                    st.write(f"{row.name + 1}. {row['full_name']}: {row['coins']} 코인")
-            
-            with col2:
-                st.write("**📅 연속 체크인 상위 사용자**")
-                top_checkins = df.nlargest(10, 'consecutive_checkins')[['full_name', 'consecutive_checkins']]
-                for idx, row in top_checkins.iterrows():
-                    st.write(f"{row.name + 1}. {row['full_name']}: {row['consecutive_checkins']}일")
+            # 인덱스 기반 상위 10명 (봇 /rank 와 같은 리더보드)
+            leaderboards = [
+                ('coins', "**💰 코인 많이 보유한 사용자**", " 코인"),
+                ('total_earned', "**⭐ 누적 획득 코인 상위 사용자**", " 코인"),
+                ('streak', "**📅 연속 체크인 상위 사용자**", "일"),
+                ('referrals', "**👥 추천 상위 사용자**", "명")
+            ]
+            
+            for i in range(0, len(leaderboards), 2):
+                for col, (metric, title, unit) in zip(st.columns(2), leaderboards[i:i + 2]):
+                    with col:
+                        st.write(title)
+                        top = self.cache.get('leaderboard', lambda: self.db.get_leaderboard(metric, 10), key=metric)
+                        for position, row in enumerate(top, 1):
+                            st.write(f"{position}. {row['full_name']}: {row['value']}{unit}")
         
         except Exception as e:
             st.error(f"통계 로딩 중 오류: {e}")
     
+    def render_engagement(self, engagement: Dict[str, Any]):
+        """DAU/WAU/MAU, 고착도, 주차별 리텐션"""
+        st.subheader("📊 참여 지표")
+        
+        activity = engagement['activity']
+        current = activity['today']
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("DAU (오늘)", current['dau'])
+        col2.metric("WAU (이번 주)", current['wau'])
+        col3.metric("MAU (이번 달)", current['mau'])
+        col4.metric("고착도 (DAU/MAU)", f"{current['stickiness'] * 100:.1f}%")
+        
+        fig_activity = go.Figure()
+        fig_activity.add_trace(go.Scatter(x=activity['dates'], y=activity['dau'], mode='lines', name='DAU'))
+        fig_activity.add_trace(go.Bar(x=activity['dates'], y=activity['new_users'], name='신규 가입', opacity=0.5))
+        fig_activity.update_layout(title="일별 활성 사용자 (최근 90일)", xaxis_title="날짜",
+                                   yaxis_title="사용자 수", hovermode='x unified')
+        st.plotly_chart(fig_activity, use_container_width=True)
+        
+        retention = engagement['retention']
+        if not len(retention['cohorts']):
+            return
+        
+        col1, col2 = st.columns(2)
+        weeks = [f"{n}주차" for n in range(retention['rates'].shape[1])]
+        
+        with col1:
+            fig_cohorts = go.Figure(go.Heatmap(
+                z=retention['rates'] * 100,
+                x=weeks,
+                y=[f"{cohort} ({size}명)" for cohort, size in zip(retention['cohorts'].astype(str), retention['sizes'])],
+                colorscale='Blues',
+                hovertemplate="%{y} %{x}: %{z:.1f}%<extra></extra>"
+            ))
+            fig_cohorts.update_layout(title="가입 주 코호트별 리텐션 (%)", yaxis_autorange='reversed')
+            st.plotly_chart(fig_cohorts, use_container_width=True)
+        
+        with col2:
+            fig_curve = go.Figure(go.Scatter(x=weeks, y=retention['curve'] * 100, mode='lines+markers'))
+            fig_curve.update_layout(title="평균 리텐션 곡선", yaxis_title="리텐션 (%)", yaxis_range=[0, 100])
+            st.plotly_chart(fig_curve, use_container_width=True)
+    
+    # 코인 출처 -> 표시 이름
+    COIN_SOURCE_LABELS = {
+        'checkin': "체크인",
+        'referral': "추천",
+        'raffle': "래플",
+        'shop': "상점",
+        'admin': "관리자 조정",
+        'other': "기타"
+    }
+    
+    def render_coin_flow(self):
+        """출처별 코인 유입/유출, 순발행량, 유통량 (coin_flow_daily 롤업만 사용)"""
+        st.subheader("💰 코인 흐름")
+        
+        period = st.date_input("기간", value=(date.today() - timedelta(days=30), date.today()), key="coin_flow_range")
+        if len(period) != 2:
+            return
+        start, end = period
+        
+        # 기간 이후 순발행량도 같은 키로 캐시 (유통량 계산용)
+        flow, net_after = self.cache.get(
+            'coin_flow',
+            lambda: (self.db.get_coin_flow(start, end), self.db.get_coin_net_since(end + timedelta(days=1))),
+            key=(start, end)
+        )
+        if not flow:
+            st.info("해당 기간의 코인 거래가 없습니다.")
+            return
+        
+        df = pd.DataFrame(flow)
+        df['source'] = df['source'].map(lambda source: self.COIN_SOURCE_LABELS.get(source, source))
+        days = pd.Index(sorted(df['day'].unique()))
+        inflow = df.pivot_table(index='day', columns='source', values='inflow', aggfunc='sum').reindex(days).fillna(0)
+        outflow = df.pivot_table(index='day', columns='source', values='outflow', aggfunc='sum').reindex(days).fillna(0)
+        net = inflow.sum(axis=1) - outflow.sum(axis=1)
+        
+        # 유통량: 현재 잔액 합계에서 기간 이후 순발행량을 거슬러 뺀다
+        supply_at_end = self.user_stats()['summary']['total_coins'] - net_after
+        circulation = supply_at_end - net[::-1].cumsum()[::-1] + net
+        
+        col1, col2, col3 = st.columns(3)
+        col1.metric("유입 (발행)", f"{int(inflow.values.sum()):,}")
+        col2.metric("유출 (소각)", f"{int(outflow.values.sum()):,}")
+        col3.metric("순발행 (인플레이션)", f"{int(net.sum()):+,}")
+        
+        fig = go.Figure()
+        for source in inflow.columns:
+            fig.add_trace(go.Bar(x=days, y=inflow[source], name=f"+ {source}"))
+        for source in outflow.columns:
+            if outflow[source].any():
+                fig.add_trace(go.Bar(x=days, y=-outflow[source], name=f"− {source}"))
+        fig.add_trace(go.Scatter(x=days, y=net, mode='lines+markers', name="순발행", line=dict(color='black')))
+        fig.add_trace(go.Scatter(x=days, y=circulation, mode='lines', name="유통량", yaxis='y2',
+                                 line=dict(color='orange', dash='dot')))
+        fig.update_layout(
+            title="출처별 일일 코인 유입/유출",
+            barmode='relative',
+            xaxis_title="날짜",
+            yaxis_title="코인",
+            yaxis2=dict(title="유통량", overlaying='y', side='right'),
+            hovermode='x unified'
+        )
+        st.plotly_chart(fig, use_container_width=True)
+    
+    @staticmethod
+    def histogram_chart(buckets: List[Dict[str, int]], title: str, label: str) -> go.Figure:
+        """Bar chart of Database.get_user_histogram buckets"""
+        fig = go.Figure(go.Bar(
+            x=[(bucket['start'] + bucket['end']) / 2 for bucket in buckets],
+            y=[bucket['users'] for bucket in buckets],
+            width=[bucket['end'] - bucket['start'] + 1 for bucket in buckets],
+            customdata=[(bucket['start'], bucket['end']) for bucket in buckets],
+            hovertemplate="%{customdata[0]}–%{customdata[1]}: %{y}<extra></extra>"
+        ))
+        fig.update_layout(title=title, xaxis_title=label, yaxis_title='사용자 수', bargap=0.05)
+        return fig
+    
+    def render_export(self):
+        """데이터 내보내기"""
+        st.subheader("📤 Data Export")
+        
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            table = st.selectbox("Table", list(Database.EXPORT_TABLES))
+            fmt = st.radio("Format", FORMATS, horizontal=True, format_func=str.upper)
+        
+        with col2:
+            use_range = st.checkbox(f"Filter by {Database.EXPORT_TABLES[table]}")
+            date_range = st.date_input("Date range", value=(date.today() - timedelta(days=30), date.today()),
+                                       disabled=not use_range)
+            after_id = st.number_input("Resume after id", min_value=0, value=0, step=1,
+                                       help="Cursor shown by an interrupted export; 0 exports from the start")
+        
+        if st.button("📤 Prepare Export", type="primary"):
+            start = end = None
+            if use_range and len(date_range) == 2:
+                start = date_range[0].isoformat()
+                end = (date_range[1] + timedelta(days=1)).isoformat()
+            
+            # 이전 파일 정리
+            previous = st.session_state.pop('export_file', None)
+            if previous and os.path.exists(previous['path']):
+                os.remove(previous['path'])
+            
+            # 청크 단위로 임시 파일에 기록 (메모리는 한 청크분)
+            job = ExportJob(self.db, table, start, end, int(after_id))
+            file_name = f"{table}_{datetime.now():%Y%m%d_%H%M%S}.{fmt}"
+            path = os.path.join(tempfile.gettempdir(), file_name)
+            try:
+                with open(path, 'wb') as out:
+                    job.write(out, fmt)
+            except Exception as e:
+                st.error(f"Export failed after {job.rows:,} rows: {e}")
+                st.info(f"Resume after id {job.last_id} to continue.")
+            else:
+                st.session_state['export_file'] = {'path': path, 'name': file_name, 'fmt': fmt, **job.metrics()}
+        
+        export_file = st.session_state.get('export_file')
+        if export_file and os.path.exists(export_file['path']):
+            st.success(f"✅ {export_file['rows']:,} {export_file['table']} rows ready "
+                       f"(last id {export_file['last_id']}, {os.path.getsize(export_file['path']):,} bytes)")
+            with open(export_file['path'], 'rb') as data:
+                st.download_button(
+                    "⬇️ Download",
+                    data=data,
+                    file_name=export_file['name'],
+                    mime="text/csv" if export_file['fmt'] == 'csv' else "application/octet-stream"
+                )
+    
     def render_settings(self):
         """설정"""
         st.subheader("⚙️ System Settings")
@@ -741,6 +1116,19 @@ class AdminPanel:
                     "Send Daily Reminders", 
                     value=current_settings.get('send_daily_reminder', True)
                 )
+                reminder_hour = st.number_input(
+                    "Reminder Hour (server time)",
+                    value=current_settings.get('reminder_hour', 18),
+                    min_value=0,
+                    max_value=23
+                )
+                reminder_window_minutes = st.number_input(
+                    "Reminder Window (minutes)",
+                    value=current_settings.get('reminder_window_minutes', 60),
+                    min_value=1,
+                    max_value=720,
+                    help="Reminders are spread evenly over this window to stay under Telegram's limits"
+                )
             
             with col2:
                 maintenance_mode = st.checkbox(
@@ -752,6 +1140,36 @@ class AdminPanel:
                     value=current_settings.get('debug_mode', False)
                 )
             
+            # Rate Limits (the bot re-reads these every 30 seconds)
+            st.write("### 🚦 Rate Limits")
+            
+            col1, col2 = st.columns(2)
+            
+            with col1:
+                rate_limit_enabled = st.checkbox(
+                    "Limit Incoming Requests",
+                    value=current_settings.get('rate_limit_enabled', True)
+                )
+                user_rate_per_minute = st.number_input(
+                    "Requests per User (per minute)",
+                    value=current_settings.get('user_rate_per_minute', 30),
+                    min_value=1,
+                    help="Button presses and messages beyond this get a 'slow down' notice"
+                )
+            
+            with col2:
+                user_burst = st.number_input(
+                    "User Burst",
+                    value=current_settings.get('user_burst', 10),
+                    min_value=1,
+                    help="Requests a user can make back to back before the per-minute rate applies"
+                )
+                global_rate_per_second = st.number_input(
+                    "Requests per Second (all users)",
+                    value=current_settings.get('global_rate_per_second', 30),
+                    min_value=1
+                )
+            
             # Notification Settings
             st.write("### 📱 Notification Settings")
             
@@ -805,6 +1223,12 @@ class AdminPanel:
                         'welcome_bonus': welcome_bonus,
                         'auto_raffle_draw': auto_raffle_draw,
                         'send_daily_reminder': send_daily_reminder,
+                        'reminder_hour': reminder_hour,
+                        'reminder_window_minutes': reminder_window_minutes,
+                        'rate_limit_enabled': rate_limit_enabled,
+                        'user_rate_per_minute': user_rate_per_minute,
+                        'user_burst': user_burst,
+                        'global_rate_per_second': global_rate_per_second,
                         'maintenance_mode': maintenance_mode,
                         'debug_mode': debug_mode,
                         'notify_new_user': notify_new_user,
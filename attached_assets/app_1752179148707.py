@@ -5,6 +5,7 @@ import signal
 import logging
 from admin_panel import AdminPanel
 from database import Database
+from query_cache import QueryCache
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -17,15 +18,24 @@ st.set_page_config(
     layout="wide"
 )
 
+@st.cache_resource
+def get_database() -> Database:
+    """One Database (one lock, one schema init) for every session in this process"""
+    return Database()
+
+@st.cache_resource
+def get_query_cache() -> QueryCache:
+    """Query results shared by every session, keyed by data versions"""
+    return QueryCache(get_database())
+
 # 세션 상태 초기화
 if 'bot_running' not in st.session_state:
     st.session_state.bot_running = False
 if 'bot_process' not in st.session_state:
     st.session_state.bot_process = None
-if 'db' not in st.session_state:
-    st.session_state.db = Database()
+st.session_state.db = get_database()
 if 'admin_panel' not in st.session_state:
-    st.session_state.admin_panel = AdminPanel(st.session_state.db)
+    st.session_state.admin_panel = AdminPanel(st.session_state.db, get_query_cache())
 
 def start_bot_process():
     """Start bot in separate process"""
@@ -152,7 +162,7 @@ def main():
         # Quick statistics
         st.header("📊 Quick Stats")
         try:
-            stats = st.session_state.db.get_quick_stats()
+            stats = st.session_state.admin_panel.quick_stats()
             st.metric("Total Users", stats['total_users'])
             st.metric("Today Logins", stats['today_logins'])
             st.metric("Active Raffles", stats['active_raffles'])
@@ -0,0 +1,1096 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for bot handlers
+Usage: python benchmarks.py [name ...]   (no name = run all)
+"""
+import os
+import string
+import sys
+import time
+import asyncio
+import logging
+import tempfile
+from types import SimpleNamespace
+from datetime import datetime, timedelta
+from database import Database
+
+# Keep handler logging out of the measurements
+logging.disable(logging.INFO)
+
+
+def make_database(users: int = 200, products: int = 30, raffles: int = 10) -> Database:
+    """Create a throwaway database with some catalog and users"""
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    db = Database(path)
+
+    for i in range(users):
+        db.register_user(user_id=1000 + i, username=f"user{i}", full_name=f"User {i}", chat_id=1000 + i)
+        db.add_coins(1000 + i, i % 120)
+
+    categories = ["Gift Cards", "Food & Drinks", "Digital Products"]
+    for i in range(products):
+        db.create_product(f"Product {i}", f"Description {i}", 10 + (i * 7) % 100, 50, categories[i % 3])
+
+    end = (datetime.now() + timedelta(days=7)).isoformat()
+    for i in range(raffles):
+        db.create_raffle(f"Raffle {i}", "", f"Prize {i}", 5 + i, end)
+
+    return db
+
+
+def insert_users(db: Database, count: int):
+    """Bulk-insert users directly (register_user commits once per user)"""
+    import sqlite3
+
+    conn = sqlite3.connect(db.db_path)
+    conn.executemany("""
+        INSERT INTO users (user_id, username, full_name, chat_id, coins, total_earned,
+                           consecutive_checkins, joined_date)
+        VALUES (?, ?, ?, ?, ?, ?, ?, datetime('now', ?))
+    """, ((1000 + i, f"user{i}", f"User {i} {'Kim' if i % 7 == 0 else 'Lee'}", 1000 + i, i % 977, i % 1931,
+           i % 45, f"-{i % 365} days") for i in range(count)))
+    conn.commit()
+    conn.close()
+
+
+class FakeQuery:
+    """Stands in for telegram.CallbackQuery; sends are no-ops"""
+
+    def __init__(self, user_id: int, data: str):
+        self.from_user = SimpleNamespace(id=user_id, full_name=f"User {user_id}", username=None)
+        self.data = data
+        self.message = SimpleNamespace(chat_id=user_id, message_id=1)
+
+    async def answer(self, *args, **kwargs):
+        pass
+
+    async def edit_message_text(self, *args, **kwargs):
+        pass
+
+
+class FakeMessage:
+    def __init__(self, text: str = "", chat_id: int = 0):
+        self.text = text
+        self.chat_id = chat_id
+
+    async def reply_text(self, *args, **kwargs):
+        pass
+
+
+def callback_update(user_id: int, data: str):
+    query = FakeQuery(user_id, data)
+    return SimpleNamespace(callback_query=query, effective_user=query.from_user,
+                           effective_chat=SimpleNamespace(id=user_id), message=None)
+
+
+def command_update(user_id: int, text: str = "/start"):
+    user = SimpleNamespace(id=user_id, full_name=f"User {user_id}", username=f"user{user_id}")
+    return SimpleNamespace(callback_query=None, effective_user=user,
+                           effective_chat=SimpleNamespace(id=user_id), message=FakeMessage(text, user_id))
+
+
+def fake_context():
+    return SimpleNamespace(args=[], user_data={}, bot=SimpleNamespace(username="bench_bot"))
+
+
+def make_bot(db: Database):
+    """TelegramBot whose outbound limits never throttle the benchmark"""
+    from bot import TelegramBot
+    from rate_limit import TelegramRateLimiter
+
+    bot = TelegramBot(db, token="bench")
+    bot.outbox.limiter = TelegramRateLimiter(global_rate=1e9, chat_rate=1e9, chat_burst=1e9)
+    return bot
+
+
+def cpu_per_call(func, calls: int) -> float:
+    """Average CPU microseconds per call"""
+    start = time.process_time()
+    for i in range(calls):
+        func(i)
+    return (time.process_time() - start) / calls * 1e6
+
+
+def bench_render(updates: int = 2000):
+    """Handler CPU time per update with and without the render cache"""
+    db = make_database()
+    bot = make_bot(db)
+    loop = asyncio.new_event_loop()
+
+    handlers = {
+        'start': lambda i: loop.run_until_complete(bot.start(command_update(1000 + i % 200), fake_context())),
+        'main_menu': lambda i: loop.run_until_complete(bot.main_menu(callback_update(1000 + i % 200, "main_menu"), fake_context())),
+        'coin_shop': lambda i: loop.run_until_complete(bot.coin_shop(callback_update(1000 + i % 200, "coin_shop"), fake_context())),
+        'raffle_list': lambda i: loop.run_until_complete(bot.raffle_list(callback_update(1000 + i % 200, "raffle_list"), fake_context())),
+    }
+
+    print(f"{'handler':<12} {'no cache (us)':>14} {'cached (us)':>12}")
+    for name, handler in handlers.items():
+        bot.render_cache.enabled = False
+        cold = cpu_per_call(handler, updates)
+        bot.render_cache.enabled = True
+        bot.render_cache.clear()
+        warm = cpu_per_call(handler, updates)
+        print(f"{name:<12} {cold:>14.1f} {warm:>12.1f}")
+
+    for namespace, stats in bot.render_cache.stats().items():
+        print(f"  {namespace}: hit rate {stats['hit_rate']:.1%} ({stats['hits']} hits / {stats['misses']} misses)")
+
+    loop.close()
+    os.remove(db.db_path)
+
+
+def legacy_monthly_calendar(checkin_dates: set, year: int, month: int, today) -> str:
+    """Per-day calendar builder that generate_monthly_calendar used before the template engine"""
+    from calendar_engine import MONTH_NAMES
+
+    calendar_text = f"📅 **{MONTH_NAMES[month-1]} {year}**\n\n"
+    first_day = datetime(year, month, 1).date()
+    if month == 12:
+        last_day = datetime(year + 1, 1, 1).date() - timedelta(days=1)
+    else:
+        last_day = datetime(year, month + 1, 1).date() - timedelta(days=1)
+    days_in_month = last_day.day
+    first_weekday = first_day.weekday()
+
+    calendar_text += "```\n"
+    calendar_text += "Mon Tue Wed Thu Fri Sat Sun\n"
+    calendar_text += "─" * 27 + "\n"
+
+    week_line = ""
+    for i in range(first_weekday):
+        week_line += "    "
+
+    for day in range(1, days_in_month + 1):
+        current_date = datetime(year, month, day).date()
+        if current_date in checkin_dates:
+            week_line += "✅ "
+        elif current_date == today:
+            week_line += "📍 "
+        elif current_date < today:
+            week_line += f"{day:2d} "
+        else:
+            week_line += "·· "
+        if (first_weekday + day) % 7 == 0:
+            calendar_text += week_line.rstrip() + "\n"
+            week_line = ""
+
+    if week_line.strip():
+        calendar_text += week_line.rstrip() + "\n"
+
+    calendar_text += "```\n"
+
+    monthly_checkins = len(checkin_dates)
+    if month == today.month and year == today.year:
+        days_so_far = today.day
+    elif datetime(year, month, 1).date() < today:
+        days_so_far = days_in_month
+    else:
+        days_so_far = 0
+
+    checkin_rate = (monthly_checkins / days_so_far * 100) if days_so_far > 0 else 0
+
+    calendar_text += f"📊 **Monthly Stats:**\n"
+    calendar_text += f"• Check-ins: {monthly_checkins}/{days_so_far} days\n"
+    calendar_text += f"• Success rate: {checkin_rate:.1f}%\n\n"
+    calendar_text += "**Legend:**\n"
+    calendar_text += "✅ = Checked in  📍 = Today  ·· = Future\n"
+    return calendar_text
+
+
+def bench_calendar(rounds: int = 500):
+    """Per-render cost of a 12-month browse sequence, legacy builder vs template engine"""
+    from datetime import date
+    from calendar_engine import checkin_mask, render_month
+
+    today = datetime.now().date()
+    months = []
+    year, month = today.year, today.month
+    for _ in range(12):
+        days = [d for d in range(1, 29) if d % 3 != 0]
+        months.append((year, month, days))
+        month -= 1
+        if month == 0:
+            year, month = year - 1, 12
+
+    for year, month, days in months:
+        dates = {date(year, month, d) for d in days}
+        assert legacy_monthly_calendar(dates, year, month, today) == render_month(year, month, checkin_mask(days), today)
+
+    def legacy(i):
+        for year, month, days in months:
+            legacy_monthly_calendar({date(year, month, d) for d in days}, year, month, today)
+
+    def engine(i):
+        for year, month, days in months:
+            render_month(year, month, checkin_mask(days), today)
+
+    legacy_us = cpu_per_call(legacy, rounds) / 12
+    engine_us = cpu_per_call(engine, rounds) / 12
+    print(f"legacy builder : {legacy_us:8.1f} us/render")
+    print(f"template engine: {engine_us:8.1f} us/render")
+
+    # End to end through the bot, including the indexed day query
+    db = make_database(users=1, products=0, raffles=0)
+    bot = make_bot(db)
+    db.process_daily_checkin(1000)
+    full_us = cpu_per_call(lambda i: [bot.generate_monthly_calendar(1000, y, m) for y, m, _ in months], rounds // 5) / 12
+    print(f"with DB lookup : {full_us:8.1f} us/render")
+    os.remove(db.db_path)
+
+
+LEGACY_PATTERNS = [
+    "^daily_checkin$", "^view_calendar$", "^calendar_[0-9]+_[0-9]+$", "^calendar_year_[0-9]+$",
+    "^raffle_list$", "^join_raffle_", "^coin_shop$", "^buy_product_", "^referral$", "^my_info$",
+    "^enter_invite_code$", "^main_menu$",
+]
+
+
+def bench_routing(rounds: int = 20000):
+    """Per-update cost of picking a callback handler: regex handler chain vs router"""
+    from telegram import CallbackQuery, Update, User
+    from telegram.ext import CallbackQueryHandler
+    from callback_router import Action, encode
+
+    async def noop(*args):
+        pass
+
+    db = make_database(users=1, products=0, raffles=0)
+    bot = make_bot(db)
+    user = User(id=1000, first_name="Bench", is_bot=False)
+
+    def updates(payloads):
+        return [Update(i, callback_query=CallbackQuery(str(i), user, "bench", data=data))
+                for i, data in enumerate(payloads)]
+
+    # Same mix of buttons in both formats; late patterns cost the chain the most
+    legacy = updates(["main_menu", "daily_checkin", "coin_shop", "buy_product_12",
+                      "raffle_list", "join_raffle_7", "calendar_2025_7", "my_info"])
+    compact = updates([encode(Action.MAIN_MENU), encode(Action.DAILY_CHECKIN), encode(Action.COIN_SHOP),
+                       encode(Action.BUY_PRODUCT, 12), encode(Action.RAFFLE_LIST), encode(Action.JOIN_RAFFLE, 7),
+                       encode(Action.CALENDAR_MONTH, 2025, 7), encode(Action.MY_INFO)])
+
+    chain = [CallbackQueryHandler(noop, pattern=pattern) for pattern in LEGACY_PATTERNS]
+
+    def chain_route(i):
+        update = legacy[i % len(legacy)]
+        for handler in chain:
+            match = handler.check_update(update)
+            if match is not None and match is not False:
+                # Handlers then re-parsed their arguments from the string
+                update.callback_query.data.split('_')
+                return
+
+    single = CallbackQueryHandler(bot.router.dispatch)
+
+    def router_route(i, pool=compact):
+        update = pool[i % len(pool)]
+        single.check_update(update)
+        bot.router.decode(update.callback_query.data)
+
+    chain_us = cpu_per_call(chain_route, rounds)
+    router_us = cpu_per_call(router_route, rounds)
+    legacy_us = cpu_per_call(lambda i: router_route(i, legacy), rounds)
+    print(f"handler chain  : {chain_us:6.2f} us/update")
+    print(f"router         : {router_us:6.2f} us/update")
+    print(f"router (legacy): {legacy_us:6.2f} us/update")
+    print(f"longest payload: {max(len(u.callback_query.data) for u in compact)} bytes")
+    os.remove(db.db_path)
+
+
+def bench_pages(updates: int = 1000):
+    """Shop and raffle page render cost as the catalog grows"""
+    from callback_router import Action, encode
+
+    loop = asyncio.new_event_loop()
+    print(f"{'catalog':>8} {'shop p1 (us)':>13} {'shop p3 (us)':>13} {'raffles (us)':>13} {'max chars':>10}")
+    for size in (30, 300, 3000):
+        db = make_database(users=50, products=size, raffles=size)
+        bot = make_bot(db)
+        longest = [0]
+
+        async def edit(query, text, reply_markup=None, parse_mode=None):
+            longest[0] = max(longest[0], len(text))
+        bot.outbox.edit = edit
+
+        def handler(data):
+            return lambda i: loop.run_until_complete(
+                bot.router.dispatch(callback_update(1000 + i % 50, data), fake_context()))
+
+        shop = cpu_per_call(handler(encode(Action.SHOP_PAGE, 0, 0)), updates)
+        deep = cpu_per_call(handler(encode(Action.SHOP_PAGE, 2, 2)), updates)
+        raffles = cpu_per_call(handler(encode(Action.RAFFLE_PAGE, 1)), updates)
+        print(f"{size:>8} {shop:>13.1f} {deep:>13.1f} {raffles:>13.1f} {longest[0]:>10}")
+        os.remove(db.db_path)
+
+    loop.close()
+
+
+def bench_users(updates: int = 2000):
+    """Handler CPU time per update with and without the per-user state cache"""
+    db = make_database()
+    bot = make_bot(db)
+    loop = asyncio.new_event_loop()
+
+    def with_sync(handler, make_update):
+        async def run(i):
+            bot.users.sync()
+            await handler(make_update(1000 + i % 200), fake_context())
+        return lambda i: loop.run_until_complete(run(i))
+
+    handlers = {
+        'start': with_sync(bot.start, command_update),
+        'main_menu': with_sync(bot.main_menu, lambda uid: callback_update(uid, "main_menu")),
+        'my_info': with_sync(bot.my_info, lambda uid: callback_update(uid, "my_info")),
+        'coin_shop': with_sync(bot.coin_shop, lambda uid: callback_update(uid, "coin_shop")),
+    }
+
+    print(f"{'handler':<12} {'no cache (us)':>14} {'cached (us)':>12}")
+    for name, handler in handlers.items():
+        bot.users.enabled = False
+        cold = cpu_per_call(handler, updates)
+        bot.users.enabled = True
+        bot.users.clear()
+        warm = cpu_per_call(handler, updates)
+        print(f"{name:<12} {cold:>14.1f} {warm:>12.1f}")
+
+    metrics = bot.users.metrics()
+    print(f"  hit rate {metrics['hit_rate']:.1%}, {metrics['write_through']} write-through, "
+          f"{metrics['evictions']} evictions, {metrics['invalidations']} invalidations")
+
+    loop.close()
+    os.remove(db.db_path)
+
+
+def bench_checkins(users: int = 1_000_000, lookups: int = 200_000):
+    """Memory and lookup cost of the in-memory check-in set for a million users"""
+    import random
+    import sqlite3
+    from datetime import date
+    from checkin_set import CheckinSet
+
+    db = make_database(users=0, products=0, raffles=0)
+    today = date.today()
+    # Telegram ids are sparse 10-digit numbers
+    ids = random.sample(range(10**9, 8 * 10**9), users)
+    conn = sqlite3.connect(db.db_path)
+    conn.executemany("""
+        INSERT INTO daily_checkins (user_id, checkin_date, coins_earned, consecutive_days)
+        VALUES (?, ?, 1, 1)
+    """, ((user_id, today.isoformat()) for user_id in ids))
+    conn.commit()
+    conn.close()
+
+    checkins = CheckinSet(db)
+    start = time.perf_counter()
+    checkins.load(today)
+    load_s = time.perf_counter() - start
+
+    python_set = set(ids)
+    set_bytes = python_set.__sizeof__() + sum(i.__sizeof__() for i in ids)
+    print(f"users          : {len(checkins):,}")
+    print(f"load           : {load_s * 1000:8.1f} ms")
+    print(f"memory         : {checkins.memory_bytes() / 2**20:8.1f} MiB (Python set of ints: {set_bytes / 2**20:.1f} MiB)")
+
+    probes = [random.choice(ids) if i % 2 else random.randrange(10**9, 8 * 10**9) for i in range(lookups)]
+    start = time.perf_counter()
+    for user_id in probes:
+        checkins.contains(user_id, today)
+    print(f"contains       : {(time.perf_counter() - start) / lookups * 1e9:8.0f} ns")
+
+    new_ids = random.sample(range(8 * 10**9, 9 * 10**9), 20_000)
+    start = time.perf_counter()
+    for user_id in new_ids:
+        checkins.add(user_id, today)
+    print(f"add (amortized): {(time.perf_counter() - start) / len(new_ids) * 1e6:8.1f} us")
+
+    start = time.perf_counter()
+    for user_id in probes[:2000]:
+        db.has_daily_checkin(user_id, today)
+    print(f"DB query       : {(time.perf_counter() - start) / 2000 * 1e6:8.1f} us (has_daily_checkin)")
+    os.remove(db.db_path)
+
+
+def bench_referrals(codes: int = 100_000, messages: int = 50_000):
+    """How much chat text the referral filter rejects before process_referral"""
+    import random
+    import sqlite3
+    from referral_filter import ReferralCodeFilter, REFERRAL_CODE_LENGTH
+
+    db = make_database(users=0, products=0, raffles=0)
+    alphabet = string.ascii_uppercase + string.digits
+    issued = {''.join(random.choices(alphabet, k=REFERRAL_CODE_LENGTH)) for _ in range(codes)}
+    conn = sqlite3.connect(db.db_path)
+    conn.executemany("INSERT INTO users (user_id, username, full_name, referral_code) VALUES (?, '', '', ?)",
+                     enumerate(issued, start=1))
+    conn.commit()
+    conn.close()
+
+    start = time.perf_counter()
+    referral_filter = ReferralCodeFilter(db, capacity=codes)
+    print(f"codes          : {len(issued):,} (filter {referral_filter.metrics()['filter_bytes'] / 1024:.0f} KiB, "
+          f"built in {(time.perf_counter() - start) * 1000:.0f} ms)")
+
+    # Chat noise plus well-formed codes that were never issued
+    words = ['hello', 'thanks!', 'how do I get coins', 'ok', '12345678', 'WHEN RAFFLE', 'good morning bot']
+    texts = [random.choice(words).upper() if i % 2 else ''.join(random.choices(alphabet, k=REFERRAL_CODE_LENGTH))
+             for i in range(messages)]
+    texts = [text for text in texts if text not in issued]
+
+    start = time.perf_counter()
+    passed = [text for text in texts if referral_filter.might_exist(text)]
+    filter_us = (time.perf_counter() - start) / len(texts) * 1e6
+    metrics = referral_filter.metrics()
+    print(f"rejected       : {len(texts) - len(passed):,} of {len(texts):,} "
+          f"(format {metrics['format_rejects']:,}, filter {metrics['filter_rejects']:,})")
+    print(f"false positives: {len(passed):,} ({len(passed) / len(texts):.4%})")
+    print(f"might_exist    : {filter_us:8.2f} us")
+
+    start = time.perf_counter()
+    for text in texts[:2000]:
+        db.process_referral(10**9, text)
+    print(f"process_referral: {(time.perf_counter() - start) / 2000 * 1e6:7.1f} us (unknown code)")
+    os.remove(db.db_path)
+
+
+def bench_throttle(updates: int = 5000):
+    """One scripted client hammering calendar buttons, with and without the update throttle"""
+    from telegram.ext import ApplicationHandlerStop
+    from callback_router import Action, encode
+
+    db = make_database()
+    bot = make_bot(db)
+    loop = asyncio.new_event_loop()
+    data = encode(Action.VIEW_CALENDAR)
+
+    async def run(i):
+        update = callback_update(1000, data)
+        context = fake_context()
+        try:
+            await bot.throttle.handle(update, context)
+        except ApplicationHandlerStop:
+            return
+        bot.users.sync()
+        await bot.router.dispatch(update, context)
+
+    print(f"{'throttle':<10} {'us/update':>10} {'handled':>8} {'throttled':>10}")
+    for enabled in (False, True):
+        db.save_settings({'rate_limit_enabled': enabled})
+        bot.throttle.reload()
+        before = dict(bot.throttle.counters)
+        per_update = cpu_per_call(lambda i: loop.run_until_complete(run(i)), updates)
+        handled = bot.throttle.counters['allowed'] - before['allowed']
+        print(f"{'on' if enabled else 'off':<10} {per_update:>10.1f} {handled:>8} {updates - handled:>10}")
+    print(f"  by handler: {bot.throttle.metrics()['by_handler']}")
+
+    loop.close()
+    os.remove(db.db_path)
+
+
+def bench_persistence(updates: int = 5000, users: int = 200, interval: int = 500):
+    """Application.process_update cost with and without the SQLite persistence"""
+    from telegram import Update, User
+    from telegram.ext import Application, MessageHandler, filters
+    from persistence import SQLitePersistence
+
+    db = make_database(users=0, products=0, raffles=0)
+
+    async def handler(update, context):
+        # Enter/leave the invite-code prompt like handle_text_message does
+        if update.message.text == "code":
+            context.user_data['expecting_invite_code'] = True
+        else:
+            context.user_data.pop('expecting_invite_code', None)
+
+    def make_update(i):
+        user_id = 1000 + i % users
+        return Update.de_json({
+            'update_id': i,
+            'message': {'message_id': i, 'date': 0, 'text': "code" if i % 3 else "hello",
+                        'chat': {'id': user_id, 'type': 'private'},
+                        'from': {'id': user_id, 'is_bot': False, 'first_name': "User"}}
+        }, None)
+
+    async def run(persistence):
+        builder = Application.builder().token("1:bench")
+        if persistence:
+            builder = builder.persistence(persistence)
+        app = builder.build()
+        # Skip getMe: no network in benchmarks
+        app.bot._bot_user = User(1, "bench", True, username="bench_bot")
+        app.bot._requests_initialized = app.bot._bot_initialized = True
+        app.add_handler(MessageHandler(filters.TEXT, handler))
+        await app.initialize()
+
+        batch = [make_update(i) for i in range(updates)]
+        start = time.perf_counter()
+        for i, update in enumerate(batch, start=1):
+            await app.process_update(update)
+            # Stands in for the update_interval timer
+            if i % interval == 0:
+                await app.update_persistence()
+        if persistence:
+            await persistence.flush()
+        return (time.perf_counter() - start) / updates * 1e6
+
+    # Best of three: both sides are dominated by PTB's own per-update work
+    loop = asyncio.new_event_loop()
+    baseline = min(loop.run_until_complete(run(None)) for _ in range(3))
+    persisted = float('inf')
+    for _ in range(3):
+        persistence = SQLitePersistence(db, batch_delay=0)
+        persisted = min(persisted, loop.run_until_complete(run(persistence)))
+    print(f"no persistence : {baseline:8.1f} us/update")
+    print(f"SQLite         : {persisted:8.1f} us/update (+{persisted - baseline:.1f})")
+    print(f"  {persistence.metrics()}")
+
+    loop.close()
+    os.remove(db.db_path)
+
+
+def bench_leaderboard(users: int = 200_000, lookups: int = 20_000):
+    """Rank lookups: in-memory rank counters vs a COUNT(*) over the coins index"""
+    import random
+    import sqlite3
+    from leaderboard import Leaderboard
+
+    db = make_database(users=0, products=0, raffles=0)
+    conn = sqlite3.connect(db.db_path)
+    conn.executemany("""
+        INSERT INTO users (user_id, username, full_name, coins, total_earned, consecutive_checkins, referral_count)
+        VALUES (?, '', 'User', ?, ?, ?, ?)
+    """, ((10**9 + i, int(random.paretovariate(1.2) * 10), int(random.paretovariate(1.1) * 20),
+           random.randrange(60), int(random.paretovariate(2))) for i in range(users)))
+    conn.commit()
+
+    start = time.perf_counter()
+    leaderboard = Leaderboard(db)
+    print(f"users          : {users:,} (loaded in {(time.perf_counter() - start) * 1000:.0f} ms)")
+
+    probes = [10**9 + random.randrange(users) for _ in range(lookups)]
+    start = time.perf_counter()
+    for user_id in probes:
+        leaderboard.rank('coins', user_id)
+    print(f"rank (memory)  : {(time.perf_counter() - start) / lookups * 1e6:8.2f} us")
+
+    start = time.perf_counter()
+    for user_id in probes[:500]:
+        conn.execute("""
+            SELECT COUNT(*) FROM users WHERE coins > (SELECT coins FROM users WHERE user_id = ?)
+        """, (user_id,)).fetchone()
+    print(f"rank (SQL)     : {(time.perf_counter() - start) / 500 * 1e6:8.2f} us (COUNT(*) over the index)")
+
+    start = time.perf_counter()
+    for _ in range(100):
+        db.get_leaderboard('coins', 10)
+    print(f"top 10 (index) : {(time.perf_counter() - start) / 100 * 1e6:8.2f} us")
+
+    start = time.perf_counter()
+    for i in range(10_000):
+        leaderboard._on_write([{'user_id': probes[i], 'coins': i, 'total_earned': i,
+                                'consecutive_checkins': 1, 'referral_count': 0}])
+    print(f"write-through  : {(time.perf_counter() - start) / 10_000 * 1e6:8.2f} us")
+
+    conn.close()
+    os.remove(db.db_path)
+
+
+def bench_dedup(updates: int = 200_000):
+    """Cost of the duplicate-update check and of one checkpoint batch"""
+    from telegram.ext import ApplicationHandlerStop
+    from dedup import UpdateDeduplicator
+
+    db = make_database(users=0, products=0, raffles=0)
+    dedup = UpdateDeduplicator(db)
+    loop = asyncio.new_event_loop()
+    first = 700_000_000
+    # Every tenth update is delivered twice
+    stream = [SimpleNamespace(update_id=first + i - (i % 10 == 9)) for i in range(updates)]
+
+    async def run():
+        for update in stream:
+            try:
+                await dedup.handle(update, None)
+            except ApplicationHandlerStop:
+                pass
+
+    start = time.perf_counter()
+    loop.run_until_complete(run())
+    elapsed = time.perf_counter() - start
+    metrics = dedup.metrics()
+    print(f"handle         : {elapsed / updates * 1e6:8.2f} us/update "
+          f"({metrics['duplicates']:,} duplicates dropped)")
+    print(f"window memory  : {metrics['window_bytes']:,} bytes for {dedup.window:,} ids")
+
+    dedup._pending = dedup._pending[-500:]
+    start = time.perf_counter()
+    loop.run_until_complete(dedup.checkpoint())
+    print(f"checkpoint     : {(time.perf_counter() - start) * 1000:8.2f} ms per 500 ids")
+
+    loop.close()
+    os.remove(db.db_path)
+
+
+def bench_admin_cache(sessions: int = 10, reruns: int = 20):
+    """DB time for N admin sessions rerunning the dashboard, with and without the shared query cache"""
+    import threading
+    from query_cache import QueryCache
+
+    db = make_database(users=5000)
+    cache = QueryCache(db)
+
+    def dashboard(cached: bool):
+        if cached:
+            cache.get('quick_stats', db.get_quick_stats, depends=('users', 'raffles'), ttl=60)
+            cache.get('all_users', db.get_all_users)
+            cache.get('all_raffles', db.get_all_raffles, depends=('raffles',))
+        else:
+            db.get_quick_stats()
+            db.get_all_users()
+            db.get_all_raffles()
+
+    for cached in (False, True):
+        def session():
+            for _ in range(reruns):
+                dashboard(cached)
+
+        threads = [threading.Thread(target=session) for _ in range(sessions)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        print(f"{'shared cache' if cached else 'no cache':<13}: {elapsed * 1000:8.1f} ms for "
+              f"{sessions} sessions x {reruns} reruns")
+    print(f"  {cache.metrics()}")
+    os.remove(db.db_path)
+
+
+def admin_script(db_path: str, lazy: bool):
+    """Admin panel as a Streamlit script: every section in tabs (before) or only the selected one"""
+    import streamlit as st
+    from database import Database
+    from admin_panel import AdminPanel
+
+    panel = AdminPanel(Database(db_path))
+    if lazy:
+        panel.render()
+    else:
+        for tab, method in zip(st.tabs(list(AdminPanel.SECTIONS)), AdminPanel.SECTIONS.values()):
+            with tab:
+                getattr(panel, method)()
+
+
+def bench_admin_render(reruns: int = 5):
+    """Server time and DB connections per admin interaction, all tabs vs. the selected section only.
+
+    AppTest always reruns the whole script; in a browser a click inside a
+    list row reruns only that row's fragment, which runs no queries at all.
+    """
+    import sqlite3
+    from streamlit.testing.v1 import AppTest
+    from admin_panel import AdminPanel
+
+    db = make_database(users=2000)
+    connect = sqlite3.connect
+    connects = [0]
+
+    def counting_connect(*args, **kwargs):
+        connects[0] += 1
+        return connect(*args, **kwargs)
+
+    sqlite3.connect = counting_connect
+    try:
+        for lazy in (False, True):
+            at = AppTest.from_function(admin_script, args=(db.db_path, lazy), default_timeout=120)
+            at.run()
+            sections = list(AdminPanel.SECTIONS) if lazy else [None]
+            for section in sections:
+                if section is not None:
+                    at.radio(key="admin_section").set_value(section).run()
+                connects[0] = 0
+                start = time.perf_counter()
+                for _ in range(reruns):
+                    at.run()
+                elapsed = (time.perf_counter() - start) / reruns
+                label = section.split(" ", 1)[1] if section else "all tabs (before)"
+                print(f"{label:<22}: {elapsed * 1000:8.1f} ms, {connects[0] / reruns:5.1f} DB connections per rerun")
+            if at.exception:
+                print(f"  exceptions: {[e.value for e in at.exception]}")
+    finally:
+        sqlite3.connect = connect
+    os.remove(db.db_path)
+
+
+def bench_user_search(users: int = 100_000, rounds: int = 20):
+    """Admin user table: every user into pandas vs. one FTS5-filtered, indexed page in SQL"""
+    import pandas as pd
+
+    db = make_database(users=0, products=0, raffles=0)
+    insert_users(db, users)
+
+    for search in ("", "kim", "user4242"):
+        start = time.perf_counter()
+        for _ in range(rounds):
+            df = pd.DataFrame(db.get_all_users())
+            if search:
+                df = df[df['full_name'].str.contains(search, case=False, na=False) |
+                        df['username'].str.contains(search, case=False, na=False)]
+            df.sort_values(by='coins', ascending=False).head(50)
+        legacy = (time.perf_counter() - start) / rounds
+
+        start = time.perf_counter()
+        for _ in range(rounds):
+            db.count_users(search)
+            db.get_users_page(search, 'coins', True, 50, 0)
+        paged = (time.perf_counter() - start) / rounds
+        print(f"search {search or '(none)':<10}: pandas {legacy * 1000:7.1f} ms, "
+              f"SQL page {paged * 1000:6.1f} ms ({legacy / paged:.0f}x)")
+    os.remove(db.db_path)
+
+
+def bench_statistics(users: int = 100_000, rounds: int = 10):
+    """Statistics tab: every user through pandas vs. SQL aggregates vs. a cached render"""
+    import pandas as pd
+    from admin_panel import AdminPanel
+
+    db = make_database(users=0, products=0, raffles=0)
+    insert_users(db, users)
+
+    def legacy():
+        df = pd.DataFrame(db.get_all_users())
+        df['coins'].mean(), df['total_earned'].sum(), (df['consecutive_checkins'] > 0).sum()
+        pd.cut(df['coins'], 20).value_counts(), pd.cut(df['consecutive_checkins'], 15).value_counts()
+        joined = pd.to_datetime(df['joined_date'])
+        df.groupby(joined.dt.date).size().cumsum()
+
+    panel = AdminPanel(db)
+    for name, func in (("pandas (before)", legacy),
+                       ("SQL aggregates", lambda: (panel.cache.invalidate(), panel.user_stats())),
+                       ("cached", panel.user_stats)):
+        func()
+        start = time.perf_counter()
+        for _ in range(rounds):
+            func()
+        elapsed = (time.perf_counter() - start) / rounds
+        print(f"{name:<16}: {elapsed * 1000:8.2f} ms per render of {users:,} users")
+    os.remove(db.db_path)
+
+
+def bench_raffle_admin(raffles: int = 2000, entries_per_raffle: int = 50, rounds: int = 10):
+    """Raffle management list: get_all_raffles + get_user_info per winner vs. one joined page"""
+    import sqlite3
+
+    db = make_database(users=0, products=0, raffles=0)
+    insert_users(db, entries_per_raffle * 4)
+    end = (datetime.now() + timedelta(days=7)).isoformat()
+    conn = sqlite3.connect(db.db_path)
+    conn.executemany(
+        "INSERT INTO raffles (id, name, description, prize, entry_cost, end_date, status, winner_id) "
+        "VALUES (?, ?, '', ?, 5, ?, ?, ?)",
+        ((i, f"Raffle {i}", f"Prize {i}", end, 'completed' if i % 2 else 'active', 1000 + i % 100 if i % 2 else None)
+         for i in range(1, raffles + 1))
+    )
+    conn.executemany(
+        "INSERT INTO raffle_entries (raffle_id, user_id, coins_spent) VALUES (?, ?, 5)",
+        ((raffle_id, 1000 + (raffle_id + j) % (entries_per_raffle * 4))
+         for raffle_id in range(1, raffles + 1) for j in range(entries_per_raffle))
+    )
+    conn.commit()
+    conn.close()
+
+    def legacy():
+        for raffle in db.get_all_raffles():
+            if raffle['winner_id']:
+                db.get_user_info(raffle['winner_id'])
+
+    for name, func in (("N+1 (before)", legacy),
+                       ("joined page", lambda: (db.count_raffles(), db.get_raffles_page(None, 20, 0))),
+                       ("joined page 50", lambda: db.get_raffles_page(None, 20, 49 * 20)),
+                       ("entries page", lambda: db.get_raffle_entries_page(raffles // 2, 50, 0))):
+        start = time.perf_counter()
+        for _ in range(rounds):
+            func()
+        elapsed = (time.perf_counter() - start) / rounds
+        print(f"{name:<15}: {elapsed * 1000:8.2f} ms")
+    os.remove(db.db_path)
+
+
+def bench_export(users: int = 200_000):
+    """Users export: get_all_users + pandas vs. the chunked ExportJob (time and peak Python memory)"""
+    import tracemalloc
+    import pandas as pd
+    from export import ExportJob, pa
+
+    db = make_database(users=0, products=0, raffles=0)
+    insert_users(db, users)
+
+    runs = [("pandas csv (before)", lambda out: pd.DataFrame(db.get_all_users()).to_csv(out, index=False)),
+            ("ExportJob csv", lambda out: ExportJob(db, 'users').write(out, 'csv'))]
+    if pa is not None:
+        runs.append(("ExportJob parquet", lambda out: ExportJob(db, 'users').write(out, 'parquet')))
+
+    for name, run in runs:
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        tracemalloc.start()
+        start = time.perf_counter()
+        with open(path, 'wb') as out:
+            run(out)
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"{name:<20}: {elapsed * 1000:8.1f} ms, peak {peak / 2**20:6.1f} MiB, "
+              f"file {os.path.getsize(path) / 2**20:5.1f} MiB")
+        os.remove(path)
+    os.remove(db.db_path)
+
+
+def bench_engagement(users: int = 20_000, days: int = 120, rate: float = 0.3):
+    """Engagement report: recomputed from raw check-ins vs. incremental rollups"""
+    import random
+    import sqlite3
+    import pandas as pd
+    from engagement import EngagementAnalytics
+
+    db = make_database(users=0, products=0, raffles=0)
+    today = datetime.now().date()
+    rng = random.Random(7)
+    joined = [today - timedelta(days=rng.randrange(days)) for _ in range(users)]
+    checkins = sorted(
+        ((1000 + i, (joined[i] + timedelta(days=d)).isoformat())
+         for i in range(users) for d in range((today - joined[i]).days + 1) if rng.random() < rate),
+        key=lambda checkin: checkin[1]
+    )
+    conn = sqlite3.connect(db.db_path)
+    conn.executemany("INSERT INTO users (user_id, username, full_name, joined_date) VALUES (?, ?, ?, ?)",
+                     ((1000 + i, f"user{i}", f"User {i}", f"{day} 12:00:00") for i, day in enumerate(joined)))
+    insert = "INSERT INTO daily_checkins (user_id, checkin_date, coins_earned, consecutive_days) VALUES (?, ?, 10, 1)"
+    today_rows = [row for row in checkins if row[1] == today.isoformat()]
+    conn.executemany(insert, checkins[:len(checkins) - len(today_rows)])
+    conn.commit()
+
+    def legacy():
+        raw = pd.read_sql_query("""
+            SELECT c.user_id, c.checkin_date, u.joined_date
+            FROM daily_checkins c JOIN users u ON u.user_id = c.user_id
+        """, sqlite3.connect(db.db_path), parse_dates=['checkin_date', 'joined_date'])
+        raw.groupby('checkin_date').size()
+        week = raw['checkin_date'].dt.to_period('W')
+        raw.groupby(week)['user_id'].nunique(), raw.groupby(raw['checkin_date'].dt.to_period('M'))['user_id'].nunique()
+        cohort = raw['joined_date'].dt.to_period('W')
+        raw.groupby([cohort, (week - cohort).apply(lambda offset: offset.n)])['user_id'].nunique()
+
+    analytics = EngagementAnalytics(db)
+    start = time.perf_counter()
+    analytics.refresh()
+    backfill = time.perf_counter() - start
+    conn.executemany(insert, today_rows)
+    conn.commit()
+    conn.close()
+
+    for name, func in (("raw pandas (before)", legacy),
+                       ("incremental refresh", analytics.refresh),
+                       ("report", analytics.report)):
+        start = time.perf_counter()
+        func()
+        print(f"{name:<20}: {(time.perf_counter() - start) * 1000:8.1f} ms")
+    print(f"  {len(checkins):,} check-ins, one-time backfill {backfill * 1000:.0f} ms, "
+          f"today's {len(today_rows):,} folded in incrementally")
+    os.remove(db.db_path)
+
+
+def bench_coin_flow(transactions: int = 1_000_000, days: int = 365):
+    """Coin flow for a date range: scanning and parsing the ledger vs. the coin_flow_daily rollup"""
+    import sqlite3
+    import pandas as pd
+
+    db = make_database(users=0, products=0, raffles=0)
+    descriptions = [("데일리 체크인 (연속 3일)", 'checkin', 10), ("래플 참여 (ID: 7)", 'raffle', -50),
+                    ("상품 구매 (ID: 3)", 'shop', -120), ("Friend referral bonus", 'referral', 100)]
+    today = datetime.now().date()
+    conn = sqlite3.connect(db.db_path)
+    conn.executemany("""
+        INSERT INTO coin_transactions (user_id, amount, transaction_type, description, source, created_at)
+        VALUES (?, ?, 'earn', ?, ?, ?)
+    """, ((1000 + i % 5000, amount, description, source, f"{today - timedelta(days=i % days)} 12:00:00")
+          for i, (description, source, amount) in ((i, descriptions[i % 4]) for i in range(transactions))))
+    conn.execute("""
+        INSERT INTO coin_flow_daily (day, source, inflow, outflow, transactions)
+        SELECT DATE(created_at), source, SUM(MAX(amount, 0)), SUM(MAX(-amount, 0)), COUNT(*)
+        FROM coin_transactions GROUP BY 1, 2
+    """)
+    conn.commit()
+    conn.close()
+    start_day, end_day = today - timedelta(days=90), today
+
+    def legacy():
+        ledger = pd.read_sql_query("SELECT amount, description, created_at FROM coin_transactions",
+                                   sqlite3.connect(db.db_path))
+        ledger['day'] = ledger['created_at'].str[:10]
+        ledger = ledger[(ledger['day'] >= start_day.isoformat()) & (ledger['day'] <= end_day.isoformat())]
+        ledger['source'] = ledger['description'].str.extract(r'^(데일리 체크인|래플 참여|상품 구매|Friend referral)')[0]
+        ledger.groupby(['day', 'source'])['amount'].agg(['sum', 'count'])
+
+    for name, func in (("ledger scan (before)", legacy),
+                       ("rollup", lambda: db.get_coin_flow(start_day, end_day))):
+        start = time.perf_counter()
+        func()
+        print(f"{name:<21}: {(time.perf_counter() - start) * 1000:8.1f} ms for 90 of {days} days")
+
+    db.register_user(1000, "user0", "User 0", 1000)
+    print(f"  add_coins with ledger + rollup: {cpu_per_call(lambda i: db.add_coins(1000, 1), 500):.0f} us CPU per call")
+    os.remove(db.db_path)
+
+
+def bench_draw(entries: int = 500_000):
+    """Raffle draw: entry list + random.choice vs. committed-seed OFFSET draw"""
+    import random
+    import sqlite3
+    import tracemalloc
+    import raffle_draw
+
+    db = make_database(users=0, products=0, raffles=0)
+    insert_users(db, entries)
+    raffle_id = db.create_raffle("Big raffle", "", "Prize", 5, (datetime.now() + timedelta(days=7)).isoformat())
+    conn = sqlite3.connect(db.db_path)
+    conn.executemany("INSERT INTO raffle_entries (raffle_id, user_id, coins_spent) VALUES (?, ?, 5)",
+                     ((raffle_id, 1000 + i) for i in range(entries)))
+    conn.commit()
+
+    def legacy():
+        entry_users = [row[0] for row in conn.execute(
+            "SELECT DISTINCT user_id FROM raffle_entries WHERE raffle_id = ?", (raffle_id,))]
+        return random.choice(entry_users)
+
+    for name, func in (("list + choice (before)", legacy),
+                       ("seeded offset draw", lambda: db.close_and_draw_raffle(raffle_id))):
+        tracemalloc.start()
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"{name:<22}: {elapsed * 1000:8.1f} ms, peak {peak / 1024:9.1f} KiB")
+
+    print(f"  verified: {raffle_draw.verify(result['draw_seed'], result['draw_commitment'], raffle_id, result['draw_entries'], result['draw_index'])}")
+    conn.close()
+    os.remove(db.db_path)
+
+
+def bench_tickets(entries: int = 200_000, max_tickets: int = 9, winners: int = 100):
+    """K winners from ~1M weighted tickets: per-draw rescans vs. one Fenwick tree"""
+    import random
+    import sqlite3
+    import numpy as np
+    import raffle_draw
+
+    rng = random.Random(7)
+    tickets = [rng.randint(1, max_tickets) for _ in range(entries)]
+    total = sum(tickets)
+    db = make_database(users=0, products=0, raffles=0)
+    insert_users(db, entries)
+    raffle_id = db.create_raffle("Big raffle", "", "Prize", 1, (datetime.now() + timedelta(days=7)).isoformat(),
+                                 winners=winners)
+    conn = sqlite3.connect(db.db_path)
+    conn.executemany("INSERT INTO raffle_entries (raffle_id, user_id, coins_spent, tickets) VALUES (?, ?, ?, ?)",
+                     ((raffle_id, 1000 + i, count, count) for i, count in enumerate(tickets)))
+    conn.execute("UPDATE raffles SET tickets_sold = ? WHERE id = ?", (total, raffle_id))
+    conn.commit()
+    conn.close()
+    seed = raffle_draw.new_seed()
+    print(f"{entries:,} entries, {total:,} tickets, {winners} winners")
+
+    def expanded(k):
+        # 티켓마다 한 칸인 목록에서 뽑고, 당첨자 티켓을 지우고 다시 뽑는다
+        pool = [entry for entry, count in enumerate(tickets) for _ in range(count)]
+        for _ in range(k):
+            winner = rng.choice(pool)
+            pool = [entry for entry in pool if entry != winner]
+
+    def rescan(k):
+        weights = np.array(tickets, dtype=np.int64)
+        for _ in range(k):
+            entry = int(np.searchsorted(np.cumsum(weights), rng.randrange(int(weights.sum())), side='right'))
+            weights[entry] = 0
+
+    for name, func, k in (("expanded list (before)", expanded, 10),
+                          ("cumsum per draw", rescan, winners),
+                          ("fenwick tree", lambda k: raffle_draw.draw_winners(seed, raffle_id, tickets, k), winners),
+                          ("fenwick tree", lambda k: raffle_draw.draw_winners(seed, raffle_id, tickets, k), 10_000)):
+        start = time.perf_counter()
+        func(k)
+        print(f"{name:<22}: {(time.perf_counter() - start) * 1000:9.1f} ms for {k:,} winners")
+
+    start = time.perf_counter()
+    result = db.close_and_draw_raffle(raffle_id)
+    print(f"close_and_draw_raffle : {(time.perf_counter() - start) * 1000:9.1f} ms for {len(result['winners'])} "
+          f"winners (load + draw + {len(result['winners'])} inserts)")
+
+    raffle_id = db.create_raffle("Limited", "", "Prize", 1, (datetime.now() + timedelta(days=7)).isoformat(),
+                                 max_entries=10 ** 9)
+    db.add_coins(1000, 10 ** 6)
+    print(f"  join_raffle with counter: {cpu_per_call(lambda i: db.join_raffle(1000, raffle_id, 1, 1), 500):.0f} us CPU per call")
+    os.remove(db.db_path)
+
+
+def bench_scheduler_idle(seconds: float = 2.0):
+    """Raffle scheduler with an expired raffle and auto draw off: the loop must stay asleep"""
+    from raffle_scheduler import RaffleScheduler
+
+    db = make_database(users=0, products=0, raffles=0)
+    db.create_raffle("Expired", "", "Prize", 1, (datetime.now() - timedelta(hours=1)).isoformat())
+    calls = []
+    get_settings = db.get_settings
+    db.get_settings = lambda: calls.append(1) or get_settings()
+    scheduler = RaffleScheduler(db, SimpleNamespace(enqueue=lambda *args, **kwargs: None))
+
+    async def run():
+        task = asyncio.create_task(scheduler.run())
+        await asyncio.sleep(seconds)
+        task.cancel()
+
+    asyncio.run(run())
+    print(f"get_settings calls in {seconds:.0f}s: {len(calls)}")
+    # 마감 지난 래플이 타임아웃을 0 으로 만들면 루프가 DB 락을 잡고 돈다
+    assert len(calls) == 1, "scheduler loop is spinning on a past-due deadline"
+    os.remove(db.db_path)
+
+
+BENCHMARKS = {
+    'render': bench_render,
+    'calendar': bench_calendar,
+    'routing': bench_routing,
+    'pages': bench_pages,
+    'users': bench_users,
+    'checkins': bench_checkins,
+    'referrals': bench_referrals,
+    'throttle': bench_throttle,
+    'persistence': bench_persistence,
+    'leaderboard': bench_leaderboard,
+    'dedup': bench_dedup,
+    'admin_cache': bench_admin_cache,
+    'admin_render': bench_admin_render,
+    'user_search': bench_user_search,
+    'statistics': bench_statistics,
+    'raffle_admin': bench_raffle_admin,
+    'export': bench_export,
+    'engagement': bench_engagement,
+    'coin_flow': bench_coin_flow,
+    'draw': bench_draw,
+    'tickets': bench_tickets,
+    'scheduler_idle': bench_scheduler_idle,
+}
+
+
+def main():
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        print(f"=== {name} ===")
+        BENCHMARKS[name]()
+
+
+if __name__ == "__main__":
+    main()
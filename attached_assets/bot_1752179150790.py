@@ -1,11 +1,40 @@
 import os
+import asyncio
 import logging
+from bisect import bisect_right
 from datetime import datetime, timedelta, date
+from typing import Optional
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import Application, CommandHandler, CallbackQueryHandler, ContextTypes
+from telegram.ext import Application, CommandHandler, CallbackQueryHandler, ContextTypes, TypeHandler
 from database import Database
+from render_cache import RenderCache
+from calendar_engine import MONTH_NAMES, checkin_mask, render_month
+from rate_limit import TelegramRateLimiter
+from outbox import Outbox
+from broadcast import BroadcastEngine
+from raffle_scheduler import RaffleScheduler
+from reminders import ReminderScheduler
+from callback_router import Action, CallbackRouter, encode
+from user_cache import UserCache
+from checkin_set import CheckinSet
+from referral_filter import InvalidReferralCode, ReferralCodeFilter
+from throttle import UpdateThrottle
+from persistence import SQLitePersistence
+from leaderboard import Leaderboard
+from dedup import UpdateDeduplicator
 from utils import generate_referral_code
 
+# 상점/래플 목록 한 페이지당 항목 수
+PAGE_SIZE = 6
+
+# 리더보드 지표별 표시 (아이콘, 이름, 단위)
+LEADERBOARD_LABELS = {
+    'coins': ("💰", "Coins", "coins"),
+    'total_earned': ("⭐", "Total Earned", "coins"),
+    'streak': ("🔥", "Streak", "days"),
+    'referrals': ("👥", "Referrals", "friends")
+}
+
 # 로깅 설정
 logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
@@ -17,7 +46,302 @@ class TelegramBot:
     def __init__(self, database: Database, token: str = ""):
         self.db = database
         self.token = token or os.getenv("TELEGRAM_BOT_TOKEN", "")
+        self.render_cache = RenderCache(database)
+        self.rate_limiter = TelegramRateLimiter()
+        self.outbox = Outbox(self.rate_limiter)
+        self.broadcaster = BroadcastEngine(database, self.outbox)
+        self.raffle_scheduler = RaffleScheduler(database, self.outbox)
+        self.reminders = ReminderScheduler(database, self.outbox)
+        self.router = self._build_router()
+        self.users = UserCache(database)
+        self.checkins = CheckinSet(database)
+        self.referral_filter = ReferralCodeFilter(database)
+        self.throttle = UpdateThrottle(database, self.outbox, classify=self._handler_name)
+        self.persistence = SQLitePersistence(database)
+        self.leaderboard = Leaderboard(database)
+        self.dedup = UpdateDeduplicator(database)
+        self._background_tasks = []
+    
+    async def _post_init(self, application: Application):
+        """Start background workers once the bot is initialized"""
+        await asyncio.to_thread(self.dedup.load)
+        self._background_tasks.append(asyncio.create_task(self.dedup.run()))
+        self._background_tasks.append(asyncio.create_task(self.outbox.run(application.bot)))
+        self._background_tasks.append(asyncio.create_task(self.broadcaster.run(application.bot)))
+        self._background_tasks.append(asyncio.create_task(self.raffle_scheduler.run()))
+        self._background_tasks.append(asyncio.create_task(self.reminders.run(application.bot)))
+    
+    async def _post_stop(self, application: Application):
+        """Stop background workers before the bot shuts down"""
+        for task in self._background_tasks:
+            task.cancel()
+        await asyncio.gather(*self._background_tasks, return_exceptions=True)
+        self._background_tasks = []
+    
+    async def _sync_caches(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Pick up user changes made by other processes before handling an update"""
+        changes = self.users.sync()
+        if changes:
+            self.leaderboard.refresh(changes)
+    
+    def _handler_name(self, update: Update) -> str:
+        """Name of the handler an update would reach (throttle counters)"""
+        if update.callback_query:
+            route = self.router.decode(update.callback_query.data)
+            return route[0].__name__ if route else 'unknown_callback'
+        if update.message and update.message.text:
+            if update.message.text.startswith('/'):
+                return update.message.text.split()[0][1:]
+            return 'handle_text_message'
+        return 'other'
+    
+    def _apply_referral(self, user_id: int, code: str):
+        """process_referral; a refused code raises InvalidReferralCode"""
+        if self.db.process_referral(user_id, code):
+            return
+        state = self.users.get(user_id)
+        if code != state.get('referral_code') and not state.get('referred_by'):
+            # Not the user's own code and no earlier referral: the code does not exist
+            self.referral_filter.record_false_positive()
+        raise InvalidReferralCode(f"Referral code not accepted: {code}")
+    
+    def _redeem_referral(self, user_id: int, code: str):
+        """Apply a referral code; text that cannot be an issued code is rejected without DB access"""
+        if not self.referral_filter.might_exist(code):
+            raise InvalidReferralCode(f"Unknown referral code: {code}")
+        self._apply_referral(user_id, code)
+    
+    def _build_router(self) -> CallbackRouter:
+        """Map callback actions (and their pre-router names) to handlers"""
+        router = CallbackRouter()
+        router.add(Action.MAIN_MENU, self.main_menu, legacy="main_menu")
+        router.add(Action.DAILY_CHECKIN, self.daily_checkin, legacy="daily_checkin")
+        router.add(Action.VIEW_CALENDAR, self.view_calendar, legacy="view_calendar")
+        router.add(Action.CALENDAR_MONTH, self.show_calendar_month, arity=2, legacy="calendar_")
+        router.add(Action.CALENDAR_YEAR, self.show_calendar_year, arity=1, legacy="calendar_year_")
+        router.add(Action.RAFFLE_LIST, self.raffle_list, legacy="raffle_list")
+        router.add(Action.JOIN_RAFFLE, self.join_raffle, arity=1, legacy="join_raffle_")
+        router.add(Action.BUY_TICKETS, self.buy_tickets, arity=2)
+        router.add(Action.RAFFLE_PAGE, self.raffle_page, arity=1)
+        router.add(Action.COIN_SHOP, self.coin_shop, legacy="coin_shop")
+        router.add(Action.SHOP_PAGE, self.shop_page, arity=2)
+        router.add(Action.BUY_PRODUCT, self.buy_product, arity=1, legacy="buy_product_")
+        router.add(Action.REFERRAL, self.referral, legacy="referral")
+        router.add(Action.ENTER_INVITE_CODE, self.enter_invite_code, legacy="enter_invite_code")
+        router.add(Action.MY_INFO, self.my_info, legacy="my_info")
+        return router
+    
+    def _main_menu_keyboard(self, settings: dict, checked_in: bool, show_invite: bool) -> InlineKeyboardMarkup:
+        """Main menu keyboard; only four variants exist per settings version"""
+        def build():
+            referral_bonus_amount = settings.get('referral_bonus', 1)
+            if checked_in:
+                daily_button_text = "✅ Daily Check-in (Completed)"
+            else:
+                base_coin = settings.get('daily_coin_base', 1)
+                # No consecutive bonus - only base coin
+                daily_button_text = f"📅 Daily Check-in (+{base_coin} coins)"
+            
+            keyboard = [
+                [InlineKeyboardButton(daily_button_text, callback_data=encode(Action.DAILY_CHECKIN))],
+                [InlineKeyboardButton("🎰 Join Raffle", callback_data=encode(Action.RAFFLE_LIST))],
+                [InlineKeyboardButton("🛍️ Coin Shop", callback_data=encode(Action.COIN_SHOP))],
+                [InlineKeyboardButton(f"👥 Invite Friends (+{referral_bonus_amount} coins each)", callback_data=encode(Action.REFERRAL))],
+                [InlineKeyboardButton("💰 My Info", callback_data=encode(Action.MY_INFO))]
+            ]
+            
+            # Add invitation code entry option for existing users without referral
+            if show_invite:
+                keyboard.append([InlineKeyboardButton(f"🎁 Enter Invitation Code (+{referral_bonus_amount} coins)", callback_data=encode(Action.ENTER_INVITE_CODE))])
+            
+            return InlineKeyboardMarkup(keyboard)
+        
+        return self.render_cache.get('main_keyboard', (checked_in, show_invite), build, depends=('settings',))
+    
+    def _welcome_template(self, settings: dict, referral_bonus: bool) -> str:
+        """Welcome message with {name}, {coins} and {days} left for the send"""
+        def build():
+            referral_bonus_amount = settings.get('referral_bonus', 1)
+            base_daily = settings.get('daily_coin_base', 1)
+            
+            if referral_bonus:
+                return f"""Hello {{name}}! Welcome to the Coin Reward System!
+
+🎉 **You've received {referral_bonus_amount} bonus coins for using an invitation code!**
+
+💰 **Current Balance:** {{coins}} coins
+🔥 **Consecutive Check-ins:** {{days}} days
+
+**Daily Rewards:**
+• Daily check-in: {base_daily} coins (same amount every day)
+• Referral bonus: {referral_bonus_amount} coins per friend"""
+            
+            return f"""Hello {{name}}! Welcome to the Coin Reward System!
+
+💰 **Current Balance:** {{coins}} coins
+🔥 **Consecutive Check-ins:** {{days}} days
+
+**How to Earn Coins:**
+• Daily check-in: {base_daily} coins (same amount every day)
+• Invite friends: {referral_bonus_amount} coins per referral
+• Use invitation codes: {referral_bonus_amount} coins bonus
+
+Click buttons below to start earning!"""
+        
+        return self.render_cache.get('welcome_text', referral_bonus, build, depends=('settings',))
+    
+    def _main_menu_template(self, settings: dict) -> str:
+        """Main menu message with {coins} and {days} left for the send"""
+        def build():
+            referral_bonus_amount = settings.get('referral_bonus', 1)
+            base_daily = settings.get('daily_coin_base', 1)
+            
+            return f"""🪙 **Coin Reward System**
+
+💰 **Your Balance:** {{coins}} coins
+🔥 **Consecutive Days:** {{days}} days
+
+**How to Earn More Coins:**
+• Daily check-in: {base_daily} coins (same amount every day)
+• Invite friends: {referral_bonus_amount} coins per referral
+• Use invitation codes: {referral_bonus_amount} coins bonus
+
+Choose an option below:"""
+        
+        return self.render_cache.get('main_text', None, build, depends=('settings',))
+    
+    def _page_nav_row(self, page: int, pages: int, encode_page) -> list:
+        """◀️/▶️ buttons for a paged listing (empty when there is one page)"""
+        row = []
+        if page > 0:
+            row.append(InlineKeyboardButton("◀️ Prev", callback_data=encode_page(page - 1)))
+        if page + 1 < pages:
+            row.append(InlineKeyboardButton("Next ▶️", callback_data=encode_page(page + 1)))
+        return row
+    
+    def _raffle_page(self, page: int) -> dict:
+        """One page of the raffle list, identical for every user"""
+        # Page boundaries are computed once per catalog version; each page is
+        # then one indexed LIMIT query from its start cursor
+        starts = self.render_cache.get('raffle_page_starts', None,
+                                       lambda: self.db.get_raffle_page_starts(PAGE_SIZE), depends=('catalog',))
+        if not starts:
+            return {'message': None, 'reply_markup': None}
+        page = min(max(page, 0), len(starts) - 1)
+        
+        def build():
+            raffles = self.db.get_raffle_page(starts[page], PAGE_SIZE)
+            logger.info(f"Raffle page {page + 1}/{len(starts)}: {len(raffles)} raffles")
+            
+            if not raffles:
+                return {'message': None, 'reply_markup': None}
+            
+            message = "🎰 **Active Raffles**"
+            if len(starts) > 1:
+                message += f" (page {page + 1}/{len(starts)})"
+            message += "\n\n"
+            keyboard = []
+            
+            for raffle in raffles:
+                message += f"🎁 **{raffle['name']}**\n"
+                message += f"💰 Entry Cost: {raffle['entry_cost']} coins per ticket\n"
+                message += f"🏆 Prize: {raffle['prize']}\n"
+                if raffle['winners'] > 1:
+                    message += f"🎉 Winners: {raffle['winners']}\n"
+                if raffle['max_entries']:
+                    message += f"🎟️ Ticket limit: {raffle['max_entries']}\n"
+                message += f"📅 Ends: {raffle['end_date']}\n"
+                if raffle['draw_commitment']:
+                    # 추첨 시드의 해시: 마감 후 공개되는 시드로 검증 가능
+                    message += f"🔐 Draw hash: `{raffle['draw_commitment']}`\n"
+                message += "\n"
+                
+                keyboard.append([InlineKeyboardButton(
+                    f"🎯 Join {raffle['name']}", 
+                    callback_data=encode(Action.JOIN_RAFFLE, raffle['id'])
+                )])
+            
+            nav = self._page_nav_row(page, len(starts), lambda p: encode(Action.RAFFLE_PAGE, p))
+            if nav:
+                keyboard.append(nav)
+            keyboard.append([InlineKeyboardButton("🔙 Main Menu", callback_data=encode(Action.MAIN_MENU))])
+            return {'message': message, 'reply_markup': InlineKeyboardMarkup(keyboard)}
+        
+        # Raffles also drop out of the list when they pass end_date, so the
+        # TTL bounds how long an expired raffle can stay visible
+        return self.render_cache.get('raffle_list', page, build, depends=('catalog',))
+    
+    def _shop_page(self, category_index: int, page: int) -> Optional[dict]:
+        """Products on one shop page, pre-rendered once per catalog version"""
+        categories = self.render_cache.get('shop_categories', None, self.db.get_shop_categories,
+                                           depends=('catalog',))
+        # Index 0 is "All"; 1.. are the categories in name order
+        if not 0 <= category_index <= len(categories):
+            category_index = 0
+        category = categories[category_index - 1]['category'] if category_index else None
+        
+        starts = self.render_cache.get('shop_page_starts', category,
+                                       lambda: self.db.get_shop_page_starts(PAGE_SIZE, category),
+                                       depends=('catalog',))
+        if not starts:
+            return None
+        page = min(max(page, 0), len(starts) - 1)
+        
+        def build():
+            products = self.db.get_shop_page(starts[page], PAGE_SIZE, category)
+            blocks = []
+            for product in products:
+                body = (f"**{product['name']}**\n"
+                        f"💰 Price: {product['price']} coins\n"
+                        f"📦 Stock: {product['stock']} items\n"
+                        f"📝 {product['description']}\n\n")
+                blocks.append((product, "✅ " + body, "❌ " + body))
+            
+            filters = [InlineKeyboardButton(("• " if category_index == 0 else "") + "📂 All",
+                                            callback_data=encode(Action.SHOP_PAGE, 0, 0))]
+            for i, entry in enumerate(categories, start=1):
+                filters.append(InlineKeyboardButton(
+                    ("• " if category_index == i else "") + f"{entry['category']} ({entry['count']})",
+                    callback_data=encode(Action.SHOP_PAGE, i, 0)
+                ))
+            
+            return {
+                'key': (category, page),
+                'title': f"📂 {category or 'All'}" + (f" · Page {page + 1}/{len(starts)}" if len(starts) > 1 else ""),
+                'blocks': blocks,
+                'prices': sorted(p['price'] for p in products),
+                'nav': self._page_nav_row(page, len(starts), lambda p: encode(Action.SHOP_PAGE, category_index, p)),
+                'filters': [filters[i:i + 2] for i in range(0, len(filters), 2)]
+            }
+        
+        return self.render_cache.get('shop_page', (category, page), build, depends=('catalog',))
+    
+    def _shop_listing(self, shop_page: dict, user_coins: int) -> dict:
+        """Shop page body and keyboard for a balance; only the number of affordable prices matters"""
+        affordable = bisect_right(shop_page['prices'], user_coins)
+        
+        # Every balance with the same bisect position affords the same products
+        def build():
+            body = ""
+            keyboard = []
+            for product, ok_block, no_block in shop_page['blocks']:
+                can_buy = user_coins >= product['price']
+                body += ok_block if can_buy else no_block
+                
+                if can_buy and product['stock'] > 0:
+                    keyboard.append([InlineKeyboardButton(
+                        f"🛒 Buy {product['name']}", 
+                        callback_data=encode(Action.BUY_PRODUCT, product['id'])
+                    )])
+            
+            if shop_page['nav']:
+                keyboard.append(shop_page['nav'])
+            keyboard.extend(shop_page['filters'])
+            keyboard.append([InlineKeyboardButton("🔙 Main Menu", callback_data=encode(Action.MAIN_MENU))])
+            return {'body': body, 'reply_markup': InlineKeyboardMarkup(keyboard)}
         
+        return self.render_cache.get('shop_listing', (shop_page['key'], affordable), build, depends=('catalog',))
+    
     async def start(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Bot start command handler"""
         logger.info(f"Start command received from user: {update.effective_user.id}")
@@ -37,76 +361,37 @@ class TelegramBot:
         if context.args:
             referral_code = context.args[0]
             try:
-                self.db.process_referral(user.id, referral_code)
+                self._redeem_referral(user.id, referral_code)
                 referral_bonus = True
             except Exception as e:
                 logger.warning(f"Failed to process referral code {referral_code}: {e}")
         
-        # Get user info for reward preview
-        user_info = self.db.get_user_info(user.id)
-        consecutive_days = self.db.get_consecutive_checkins(user.id)
-        current_coins = self.db.get_user_coins(user.id)
-        
-        # Get settings from database
-        settings = self.db.get_settings()
+        # Get user info for reward preview (written through by the calls above)
+        user_info = self.users.get(user.id)
+        consecutive_days = user_info.get('consecutive_checkins', 0)
+        current_coins = user_info.get('coins', 0)
         
-        # Calculate potential daily reward
-        today = datetime.now().date()
-        if self.db.has_daily_checkin(user.id, today):
-            daily_button_text = "✅ Daily Check-in (Completed)"
-        else:
-            base_coin = settings.get('daily_coin_base', 1)  # Default to 1 instead of 10
-            # No consecutive bonus - only base coin
-            daily_button_text = f"📅 Daily Check-in (+{base_coin} coins)"
+        # Get settings (cached per settings version)
+        settings = self.render_cache.settings()
         
         # Welcome message with coin preview
-        keyboard = [
-            [InlineKeyboardButton(daily_button_text, callback_data="daily_checkin")],
-            [InlineKeyboardButton("🎰 Join Raffle", callback_data="raffle_list")],
-            [InlineKeyboardButton("🛍️ Coin Shop", callback_data="coin_shop")],
-            [InlineKeyboardButton(f"👥 Invite Friends (+{settings.get('referral_bonus', 1)} coins each)", callback_data="referral")],
-            [InlineKeyboardButton("💰 My Info", callback_data="my_info")]
-        ]
-        
-        # Add invitation code entry option for existing users without referral
-        if not user_info.get('referred_by') and not referral_bonus:
-            keyboard.append([InlineKeyboardButton(f"🎁 Enter Invitation Code (+{settings.get('referral_bonus', 1)} coins)", callback_data="enter_invite_code")])
-        
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
-        referral_bonus_amount = settings.get('referral_bonus', 1)
-        base_daily = settings.get('daily_coin_base', 1)
+        today = datetime.now().date()
+        reply_markup = self._main_menu_keyboard(
+            settings,
+            checked_in=self.checkins.contains(user.id, today),
+            show_invite=not user_info.get('referred_by') and not referral_bonus
+        )
         
-        if referral_bonus:
-            welcome_msg = f"""Hello {user.full_name}! Welcome to the Coin Reward System!
-
-🎉 **You've received {referral_bonus_amount} bonus coins for using an invitation code!**
-
-💰 **Current Balance:** {current_coins} coins
-🔥 **Consecutive Check-ins:** {consecutive_days} days
-
-**Daily Rewards:**
-• Daily check-in: {base_daily} coins (same amount every day)
-• Referral bonus: {referral_bonus_amount} coins per friend"""
-        else:
-            welcome_msg = f"""Hello {user.full_name}! Welcome to the Coin Reward System!
-
-💰 **Current Balance:** {current_coins} coins
-🔥 **Consecutive Check-ins:** {consecutive_days} days
-
-**How to Earn Coins:**
-• Daily check-in: {base_daily} coins (same amount every day)
-• Invite friends: {referral_bonus_amount} coins per referral
-• Use invitation codes: {referral_bonus_amount} coins bonus
-
-Click buttons below to start earning!"""
+        welcome_msg = self._welcome_template(settings, referral_bonus).format(
+            name=user.full_name, coins=current_coins, days=consecutive_days
+        )
         
         try:
-            await update.message.reply_text(welcome_msg, reply_markup=reply_markup)
+            await self.outbox.reply(update.message, welcome_msg, reply_markup=reply_markup)
             logger.info(f"Welcome message sent to user {user.id}")
         except Exception as e:
             logger.error(f"Error sending welcome message: {e}")
-            await update.message.reply_text("Hello! Bot has started.")
+            await self.outbox.reply(update.message, "Hello! Bot has started.")
     
     async def daily_checkin(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Daily check-in handler"""
@@ -117,11 +402,12 @@ Click buttons below to start earning!"""
         today = datetime.now().date()
         
         # Check if already checked in today
-        if self.db.has_daily_checkin(user_id, today):
+        if self.checkins.contains(user_id, today):
             # Generate monthly calendar to show their progress
             calendar_text = self.generate_monthly_calendar(user_id, today.year, today.month)
-            consecutive_days = self.db.get_consecutive_checkins(user_id)
-            current_coins = self.db.get_user_coins(user_id)
+            user_info = self.users.get(user_id)
+            consecutive_days = user_info.get('consecutive_checkins', 0)
+            current_coins = user_info.get('coins', 0)
             
             message = f"""
 ❌ **Already Checked In Today!**
@@ -137,12 +423,12 @@ See you tomorrow for another check-in! 😊
             """
             
             keyboard = [
-                [InlineKeyboardButton("📅 View Other Months", callback_data="view_calendar")],
-                [InlineKeyboardButton("🔙 Main Menu", callback_data="main_menu")]
+                [InlineKeyboardButton("📅 View Other Months", callback_data=encode(Action.VIEW_CALENDAR))],
+                [InlineKeyboardButton("🔙 Main Menu", callback_data=encode(Action.MAIN_MENU))]
             ]
             reply_markup = InlineKeyboardMarkup(keyboard)
             
-            await query.edit_message_text(message, reply_markup=reply_markup, parse_mode='Markdown')
+            await self.outbox.edit(query, message, reply_markup=reply_markup, parse_mode='Markdown')
             return
         
         # Get settings for coin calculation
@@ -166,7 +452,7 @@ See you tomorrow for another check-in! 😊
 
 🪙 **Coins Earned:** {total_coin} coins
 📅 **Consecutive Days:** {consecutive_days} days
-💰 **Current Balance:** {self.db.get_user_coins(user_id)} coins
+💰 **Current Balance:** {self.users.get(user_id).get('coins', 0)} coins
 
 {calendar_text}
 
@@ -174,12 +460,12 @@ Thank you for your daily visit! ✨
         """
         
         keyboard = [
-            [InlineKeyboardButton("📅 View Other Months", callback_data="view_calendar")],
-            [InlineKeyboardButton("🔙 Main Menu", callback_data="main_menu")]
+            [InlineKeyboardButton("📅 View Other Months", callback_data=encode(Action.VIEW_CALENDAR))],
+            [InlineKeyboardButton("🔙 Main Menu", callback_data=encode(Action.MAIN_MENU))]
         ]
         reply_markup = InlineKeyboardMarkup(keyboard)
         
-        await query.edit_message_text(message, reply_markup=reply_markup, parse_mode='Markdown')
+        await self.outbox.edit(query, message, reply_markup=reply_markup, parse_mode='Markdown')
     
     def generate_monthly_calendar(self, user_id: int, year: int = None, month: int = None) -> str:
         """Generate a clean monthly calendar view"""
@@ -190,80 +476,9 @@ Thank you for your daily visit! ✨
         if month is None:
             month = today.month
         
-        # Get check-in dates for the month
-        checkin_dates = set(self.db.get_monthly_checkins(user_id, year, month))
-        
-        # Month names
-        month_names = [
-            "January", "February", "March", "April", "May", "June",
-            "July", "August", "September", "October", "November", "December"
-        ]
-        
-        calendar_text = f"📅 **{month_names[month-1]} {year}**\n\n"
-        
-        # Get first day and days in month
-        first_day = datetime(year, month, 1).date()
-        if month == 12:
-            last_day = datetime(year + 1, 1, 1).date() - timedelta(days=1)
-        else:
-            last_day = datetime(year, month + 1, 1).date() - timedelta(days=1)
-        days_in_month = last_day.day
-        
-        # Start from Monday (0) to Sunday (6)
-        first_weekday = first_day.weekday()
-        
-        # Calendar header
-        calendar_text += "```\n"
-        calendar_text += "Mon Tue Wed Thu Fri Sat Sun\n"
-        calendar_text += "─" * 27 + "\n"
-        
-        # Add leading spaces for first week
-        week_line = ""
-        for i in range(first_weekday):
-            week_line += "    "
-        
-        # Add all days of the month
-        for day in range(1, days_in_month + 1):
-            current_date = datetime(year, month, day).date()
-            
-            if current_date in checkin_dates:
-                week_line += "✅ "
-            elif current_date == today:
-                week_line += "📍 "
-            elif current_date < today:
-                week_line += f"{day:2d} "
-            else:
-                week_line += "·· "
-            
-            # New line after Sunday
-            if (first_weekday + day) % 7 == 0:
-                calendar_text += week_line.rstrip() + "\n"
-                week_line = ""
-        
-        # Add remaining days if any
-        if week_line.strip():
-            calendar_text += week_line.rstrip() + "\n"
-        
-        calendar_text += "```\n"
-        
-        # Month statistics
-        monthly_checkins = len(checkin_dates)
-        if month == today.month and year == today.year:
-            days_so_far = today.day
-        elif datetime(year, month, 1).date() < today:
-            days_so_far = days_in_month
-        else:
-            days_so_far = 0
-        
-        checkin_rate = (monthly_checkins / days_so_far * 100) if days_so_far > 0 else 0
-        
-        calendar_text += f"📊 **Monthly Stats:**\n"
-        calendar_text += f"• Check-ins: {monthly_checkins}/{days_so_far} days\n"
-        calendar_text += f"• Success rate: {checkin_rate:.1f}%\n\n"
-        calendar_text += "**Legend:**\n"
-        calendar_text += "✅ = Checked in  📍 = Today  ·· = Future\n"
-        
-        return calendar_text
+        # Check-in days as a bitmask overlaid on the cached month layout
+        mask = checkin_mask(self.db.get_monthly_checkin_days(user_id, year, month))
+        return render_month(year, month, mask, today)
     
     async def view_calendar(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Show calendar month selection menu"""
@@ -280,43 +495,32 @@ Select a month to view your check-in history:
         """
         
         # Create month selection buttons
-        month_names = [
-            "January", "February", "March", "April", "May", "June",
-            "July", "August", "September", "October", "November", "December"
-        ]
-        
         keyboard = []
         for i in range(0, 12, 3):  # 3 months per row
             row = []
             for j in range(3):
                 if i + j < 12:
                     month_num = i + j + 1
-                    month_name = month_names[i + j][:3]  # Short name
-                    row.append(InlineKeyboardButton(f"{month_name} {year}", callback_data=f"calendar_{year}_{month_num}"))
+                    month_name = MONTH_NAMES[i + j][:3]  # Short name
+                    row.append(InlineKeyboardButton(f"{month_name} {year}", callback_data=encode(Action.CALENDAR_MONTH, year, month_num)))
             keyboard.append(row)
         
         # Add navigation buttons
         keyboard.append([
-            InlineKeyboardButton("◀️ Previous Year", callback_data=f"calendar_year_{year-1}"),
-            InlineKeyboardButton("Next Year ▶️", callback_data=f"calendar_year_{year+1}")
+            InlineKeyboardButton("◀️ Previous Year", callback_data=encode(Action.CALENDAR_YEAR, year-1)),
+            InlineKeyboardButton("Next Year ▶️", callback_data=encode(Action.CALENDAR_YEAR, year+1))
         ])
-        keyboard.append([InlineKeyboardButton("🔙 Main Menu", callback_data="main_menu")])
+        keyboard.append([InlineKeyboardButton("🔙 Main Menu", callback_data=encode(Action.MAIN_MENU))])
         
         reply_markup = InlineKeyboardMarkup(keyboard)
-        await query.edit_message_text(message, reply_markup=reply_markup, parse_mode='Markdown')
+        await self.outbox.edit(query, message, reply_markup=reply_markup, parse_mode='Markdown')
     
-    async def show_calendar_month(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+    async def show_calendar_month(self, update: Update, context: ContextTypes.DEFAULT_TYPE, year: int, month: int):
         """Show calendar for specific month"""
         query = update.callback_query
         await query.answer()
         
-        # Parse callback data: calendar_year_month
-        data_parts = query.data.split('_')
-        if len(data_parts) >= 3:
-            year = int(data_parts[1])
-            month = int(data_parts[2])
-        else:
-            year = datetime.now().year
+        if not 1 <= month <= 12:
             month = datetime.now().month
         
         user_id = query.from_user.id
@@ -338,28 +542,21 @@ Select a month to view your check-in history:
         
         keyboard = [
             [
-                InlineKeyboardButton("◀️ Previous", callback_data=f"calendar_{prev_year}_{prev_month}"),
-                InlineKeyboardButton("Next ▶️", callback_data=f"calendar_{next_year}_{next_month}")
+                InlineKeyboardButton("◀️ Previous", callback_data=encode(Action.CALENDAR_MONTH, prev_year, prev_month)),
+                InlineKeyboardButton("Next ▶️", callback_data=encode(Action.CALENDAR_MONTH, next_year, next_month))
             ],
-            [InlineKeyboardButton("📅 Select Different Month", callback_data="view_calendar")],
-            [InlineKeyboardButton("🔙 Main Menu", callback_data="main_menu")]
+            [InlineKeyboardButton("📅 Select Different Month", callback_data=encode(Action.VIEW_CALENDAR))],
+            [InlineKeyboardButton("🔙 Main Menu", callback_data=encode(Action.MAIN_MENU))]
         ]
         
         reply_markup = InlineKeyboardMarkup(keyboard)
-        await query.edit_message_text(calendar_text, reply_markup=reply_markup, parse_mode='Markdown')
+        await self.outbox.edit(query, calendar_text, reply_markup=reply_markup, parse_mode='Markdown')
     
-    async def show_calendar_year(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+    async def show_calendar_year(self, update: Update, context: ContextTypes.DEFAULT_TYPE, year: int):
         """Show calendar for different year"""
         query = update.callback_query
         await query.answer()
         
-        # Parse callback data: calendar_year_YYYY
-        data_parts = query.data.split('_')
-        if len(data_parts) >= 3:
-            year = int(data_parts[2])
-        else:
-            year = datetime.now().year
-        
         message = f"""
 📅 **Calendar View - {year}**
 
@@ -367,185 +564,165 @@ Select a month to view your check-in history:
         """
         
         # Create month selection buttons
-        month_names = [
-            "January", "February", "March", "April", "May", "June",
-            "July", "August", "September", "October", "November", "December"
-        ]
-        
         keyboard = []
         for i in range(0, 12, 3):  # 3 months per row
             row = []
             for j in range(3):
                 if i + j < 12:
                     month_num = i + j + 1
-                    month_name = month_names[i + j][:3]  # Short name
-                    row.append(InlineKeyboardButton(f"{month_name} {year}", callback_data=f"calendar_{year}_{month_num}"))
+                    month_name = MONTH_NAMES[i + j][:3]  # Short name
+                    row.append(InlineKeyboardButton(f"{month_name} {year}", callback_data=encode(Action.CALENDAR_MONTH, year, month_num)))
             keyboard.append(row)
         
         # Add navigation buttons
         keyboard.append([
-            InlineKeyboardButton("◀️ Previous Year", callback_data=f"calendar_year_{year-1}"),
-            InlineKeyboardButton("Next Year ▶️", callback_data=f"calendar_year_{year+1}")
+            InlineKeyboardButton("◀️ Previous Year", callback_data=encode(Action.CALENDAR_YEAR, year-1)),
+            InlineKeyboardButton("Next Year ▶️", callback_data=encode(Action.CALENDAR_YEAR, year+1))
         ])
-        keyboard.append([InlineKeyboardButton("🔙 Main Menu", callback_data="main_menu")])
+        keyboard.append([InlineKeyboardButton("🔙 Main Menu", callback_data=encode(Action.MAIN_MENU))])
         
         reply_markup = InlineKeyboardMarkup(keyboard)
-        await query.edit_message_text(message, reply_markup=reply_markup, parse_mode='Markdown')
+        await self.outbox.edit(query, message, reply_markup=reply_markup, parse_mode='Markdown')
     
     async def raffle_list(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Display raffle list"""
+        await self.raffle_page(update, context, 0)
+    
+    async def raffle_page(self, update: Update, context: ContextTypes.DEFAULT_TYPE, page: int):
+        """Display one page of the raffle list"""
         query = update.callback_query
         await query.answer()
         
-        active_raffles = self.db.get_active_raffles()
-        
-        # Debug logging
-        logger.info(f"Found {len(active_raffles)} active raffles")
-        for raffle in active_raffles:
-            logger.info(f"Raffle: {raffle}")
+        self.render_cache.refresh()
+        listing = self._raffle_page(page)
         
-        if not active_raffles:
-            keyboard = [[InlineKeyboardButton("🔙 Main Menu", callback_data="main_menu")]]
+        if listing['message'] is None:
+            keyboard = [[InlineKeyboardButton("🔙 Main Menu", callback_data=encode(Action.MAIN_MENU))]]
             reply_markup = InlineKeyboardMarkup(keyboard)
             
-            await query.edit_message_text(
+            await self.outbox.edit(query, 
                 "❌ No active raffles at the moment.\nPlease wait for the admin to add new raffles!",
                 reply_markup=reply_markup
             )
             return
         
-        message = "🎰 **Active Raffles**\n\n"
-        keyboard = []
-        
-        for raffle in active_raffles:
-            message += f"🎁 **{raffle['name']}**\n"
-            message += f"💰 Entry Cost: {raffle['entry_cost']} coins\n"
-            message += f"🏆 Prize: {raffle['prize']}\n"
-            message += f"📅 Ends: {raffle['end_date']}\n\n"
-            
-            keyboard.append([InlineKeyboardButton(
-                f"🎯 Join {raffle['name']}", 
-                callback_data=f"join_raffle_{raffle['id']}"
-            )])
-        
-        keyboard.append([InlineKeyboardButton("🔙 Main Menu", callback_data="main_menu")])
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
-        await query.edit_message_text(message, reply_markup=reply_markup, parse_mode='Markdown')
+        await self.outbox.edit(query, listing['message'], reply_markup=listing['reply_markup'], parse_mode='Markdown')
     
-    async def join_raffle(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Handle raffle entry"""
+    # 추가 구매 버튼의 티켓 수
+    TICKET_QUANTITIES = (1, 5, 10)
+    
+    async def join_raffle(self, update: Update, context: ContextTypes.DEFAULT_TYPE, raffle_id: int):
+        """Handle raffle entry (one ticket)"""
+        await self.buy_tickets(update, context, raffle_id, 1)
+    
+    async def buy_tickets(self, update: Update, context: ContextTypes.DEFAULT_TYPE, raffle_id: int, quantity: int):
+        """Buy `quantity` raffle tickets"""
         query = update.callback_query
         await query.answer()
         
-        raffle_id = int(query.data.split('_')[2])
         user_id = query.from_user.id
         
         # Get raffle information
         raffle = self.db.get_raffle(raffle_id)
         if not raffle:
-            await query.edit_message_text("❌ Raffle not found.")
+            await self.outbox.edit(query, "❌ Raffle not found.")
             return
         
         # Check user coins
-        user_coins = self.db.get_user_coins(user_id)
-        if user_coins < raffle['entry_cost']:
+        cost = raffle['entry_cost'] * quantity
+        user_coins = self.users.get(user_id).get('coins', 0)
+        if user_coins < cost:
             message = f"""
 ❌ **Insufficient coins!**
 
-Required: {raffle['entry_cost']} coins
+Required: {cost} coins
 You have: {user_coins} coins
-Missing: {raffle['entry_cost'] - user_coins} coins
+Missing: {cost - user_coins} coins
 
 Collect coins through daily check-ins!
             """
             
             keyboard = [
-                [InlineKeyboardButton("📅 Daily Check-in", callback_data="daily_checkin")],
-                [InlineKeyboardButton("🔙 Raffle List", callback_data="raffle_list")]
+                [InlineKeyboardButton("📅 Daily Check-in", callback_data=encode(Action.DAILY_CHECKIN))],
+                [InlineKeyboardButton("🔙 Raffle List", callback_data=encode(Action.RAFFLE_LIST))]
             ]
             reply_markup = InlineKeyboardMarkup(keyboard)
             
-            await query.edit_message_text(message, reply_markup=reply_markup, parse_mode='Markdown')
+            await self.outbox.edit(query, message, reply_markup=reply_markup, parse_mode='Markdown')
             return
         
-        # Check if already entered
-        if self.db.has_raffle_entry(user_id, raffle_id):
-            await query.edit_message_text("❌ You have already entered this raffle!")
-            return
+        # Process raffle entry (sold-out and balance are re-checked atomically)
+        result = self.db.join_raffle(user_id, raffle_id, raffle['entry_cost'], quantity)
         
-        # Process raffle entry
-        self.db.join_raffle(user_id, raffle_id, raffle['entry_cost'])
-        
-        message = f"""
+        keyboard = []
+        if result['success']:
+            limit = f" / {raffle['max_entries']}" if raffle['max_entries'] else ""
+            message = f"""
 🎉 **Raffle Entry Complete!**
 
 🎁 Raffle: {raffle['name']}
-💰 Coins Used: {raffle['entry_cost']} coins
-💰 Remaining: {user_coins - raffle['entry_cost']} coins
+🎟️ Tickets Bought: {quantity} (you hold {result['tickets']})
+📊 Tickets Sold: {result['tickets_sold']}{limit}
+💰 Coins Used: {result['coins_spent']} coins
+💰 Remaining: {result['remaining_coins']} coins
 
-Good luck! 🍀
-        """
+More tickets, better odds. Good luck! 🍀
+            """
+            keyboard.append([
+                InlineKeyboardButton(f"🎟️ +{amount}", callback_data=encode(Action.BUY_TICKETS, raffle_id, amount))
+                for amount in self.TICKET_QUANTITIES
+            ])
+        else:
+            message = f"❌ Entry failed: {result['error']}"
         
-        keyboard = [
-            [InlineKeyboardButton("🎰 View Other Raffles", callback_data="raffle_list")],
-            [InlineKeyboardButton("🔙 Main Menu", callback_data="main_menu")]
+        keyboard += [
+            [InlineKeyboardButton("🎰 View Other Raffles", callback_data=encode(Action.RAFFLE_LIST))],
+            [InlineKeyboardButton("🔙 Main Menu", callback_data=encode(Action.MAIN_MENU))]
         ]
         reply_markup = InlineKeyboardMarkup(keyboard)
         
-        await query.edit_message_text(message, reply_markup=reply_markup, parse_mode='Markdown')
+        await self.outbox.edit(query, message, reply_markup=reply_markup, parse_mode='Markdown')
     
     async def coin_shop(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Display coin shop"""
+        await self.shop_page(update, context, 0, 0)
+    
+    async def shop_page(self, update: Update, context: ContextTypes.DEFAULT_TYPE, category_index: int, page: int):
+        """Display one page of the coin shop, optionally filtered by category"""
         query = update.callback_query
         await query.answer()
         
-        products = self.db.get_shop_products()
-        user_coins = self.db.get_user_coins(query.from_user.id)
+        self.render_cache.refresh()
+        user_coins = self.users.get(query.from_user.id).get('coins', 0)
+        shop_page = self._shop_page(category_index, page)
         
-        if not products:
-            keyboard = [[InlineKeyboardButton("🔙 Main Menu", callback_data="main_menu")]]
+        if shop_page is None:
+            keyboard = [[InlineKeyboardButton("🔙 Main Menu", callback_data=encode(Action.MAIN_MENU))]]
             reply_markup = InlineKeyboardMarkup(keyboard)
             
-            await query.edit_message_text(
+            await self.outbox.edit(query, 
                 "🛍️ No products available for sale.\nPlease wait for the admin to add products!",
                 reply_markup=reply_markup
             )
             return
         
-        message = f"🛍️ **Coin Shop**\n💰 Your Coins: {user_coins} coins\n\n"
-        keyboard = []
-        
-        for product in products:
-            status = "✅" if user_coins >= product['price'] else "❌"
-            message += f"{status} **{product['name']}**\n"
-            message += f"💰 Price: {product['price']} coins\n"
-            message += f"📦 Stock: {product['stock']} items\n"
-            message += f"📝 {product['description']}\n\n"
-            
-            if user_coins >= product['price'] and product['stock'] > 0:
-                keyboard.append([InlineKeyboardButton(
-                    f"🛒 Buy {product['name']}", 
-                    callback_data=f"buy_product_{product['id']}"
-                )])
+        listing = self._shop_listing(shop_page, user_coins)
+        message = (f"🛍️ **Coin Shop**\n💰 Your Coins: {user_coins} coins\n"
+                   f"{shop_page['title']}\n\n" + listing['body'])
         
-        keyboard.append([InlineKeyboardButton("🔙 Main Menu", callback_data="main_menu")])
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
-        await query.edit_message_text(message, reply_markup=reply_markup, parse_mode='Markdown')
+        await self.outbox.edit(query, message, reply_markup=listing['reply_markup'], parse_mode='Markdown')
     
-    async def buy_product(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+    async def buy_product(self, update: Update, context: ContextTypes.DEFAULT_TYPE, product_id: int):
         """Handle product purchase"""
         query = update.callback_query
         await query.answer()
         
-        product_id = int(query.data.split('_')[2])
         user_id = query.from_user.id
         
         # Get product information
         product = self.db.get_product(product_id)
         if not product:
-            await query.edit_message_text("❌ Product not found.")
+            await self.outbox.edit(query, "❌ Product not found.")
             return
         
         # Process purchase
@@ -565,12 +742,12 @@ Thank you for your purchase! 🎉
             message = f"❌ Purchase failed: {result['error']}"
         
         keyboard = [
-            [InlineKeyboardButton("🛍️ Continue Shopping", callback_data="coin_shop")],
-            [InlineKeyboardButton("🔙 Main Menu", callback_data="main_menu")]
+            [InlineKeyboardButton("🛍️ Continue Shopping", callback_data=encode(Action.COIN_SHOP))],
+            [InlineKeyboardButton("🔙 Main Menu", callback_data=encode(Action.MAIN_MENU))]
         ]
         reply_markup = InlineKeyboardMarkup(keyboard)
         
-        await query.edit_message_text(message, reply_markup=reply_markup, parse_mode='Markdown')
+        await self.outbox.edit(query, message, reply_markup=reply_markup, parse_mode='Markdown')
     
     async def referral(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Referral system"""
@@ -578,7 +755,7 @@ Thank you for your purchase! 🎉
         await query.answer()
         
         user_id = query.from_user.id
-        user_info = self.db.get_user_info(user_id)
+        user_info = self.users.get(user_id)
         
         # Generate referral code if not exists
         if not user_info['referral_code']:
@@ -617,12 +794,36 @@ Thank you for your purchase! 🎉
         
         # Add invitation code entry option if user hasn't been referred
         if not user_info.get('referred_by'):
-            keyboard.append([InlineKeyboardButton("🎁 Enter Invitation Code", callback_data="enter_invite_code")])
+            keyboard.append([InlineKeyboardButton("🎁 Enter Invitation Code", callback_data=encode(Action.ENTER_INVITE_CODE))])
         
-        keyboard.append([InlineKeyboardButton("🔙 Main Menu", callback_data="main_menu")])
+        keyboard.append([InlineKeyboardButton("🔙 Main Menu", callback_data=encode(Action.MAIN_MENU))])
         reply_markup = InlineKeyboardMarkup(keyboard)
         
-        await query.edit_message_text(message, reply_markup=reply_markup, parse_mode='Markdown')
+        await self.outbox.edit(query, message, reply_markup=reply_markup, parse_mode='Markdown')
+    
+    async def rank(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """/rank: the user's position on every leaderboard"""
+        user_id = update.effective_user.id
+        ranks = self.leaderboard.ranks(user_id)
+        if not ranks:
+            await self.outbox.reply(update.message, "Please use /start first.")
+            return
+        
+        lines = ["🏆 **Your Rankings**", ""]
+        for metric, (position, total, value) in ranks.items():
+            icon, label, unit = LEADERBOARD_LABELS[metric]
+            lines.append(f"{icon} {label}: #{position} of {total} ({value} {unit})")
+        
+        # Top list is shared by everyone, so a short TTL is enough
+        top = self.render_cache.get('leaderboard_top', 'coins',
+                                    lambda: self.db.get_leaderboard('coins', 5), depends=(), ttl=30)
+        lines += ["", "🥇 **Top 5 by Coins**"]
+        for position, row in enumerate(top, 1):
+            lines.append(f"{position}. {row['full_name']} - {row['value']} coins")
+        
+        keyboard = [[InlineKeyboardButton("🔙 Main Menu", callback_data=encode(Action.MAIN_MENU))]]
+        await self.outbox.reply(update.message, "\n".join(lines),
+                                reply_markup=InlineKeyboardMarkup(keyboard), parse_mode='Markdown')
     
     async def my_info(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Display user information"""
@@ -630,11 +831,13 @@ Thank you for your purchase! 🎉
         await query.answer()
         
         user_id = query.from_user.id
-        user_info = self.db.get_user_info(user_id)
+        user_info = self.users.get(user_id)
         referral_stats = self.db.get_referral_stats(user_id)
         
         # Calculate consecutive check-ins
-        consecutive_days = self.db.get_consecutive_checkins(user_id)
+        consecutive_days = user_info['consecutive_checkins']
+        coin_rank = self.leaderboard.rank('coins', user_id)
+        rank_line = f"\n• Coin Rank: #{coin_rank[0]} of {coin_rank[1]}" if coin_rank else ""
         
         message = f"""
 👤 **My Profile**
@@ -645,7 +848,7 @@ Thank you for your purchase! 🎉
 
 💰 **Coin Information:**
 • Current Coins: {user_info['coins']} coins
-• Total Earned: {user_info['total_earned']} coins
+• Total Earned: {user_info['total_earned']} coins{rank_line}
 
 📅 **Check-in Information:**
 • Consecutive Days: {consecutive_days} days
@@ -660,10 +863,10 @@ Thank you for your purchase! 🎉
 • Wins: {user_info['raffle_wins']} times
         """
         
-        keyboard = [[InlineKeyboardButton("🔙 Main Menu", callback_data="main_menu")]]
+        keyboard = [[InlineKeyboardButton("🔙 Main Menu", callback_data=encode(Action.MAIN_MENU))]]
         reply_markup = InlineKeyboardMarkup(keyboard)
         
-        await query.edit_message_text(message, reply_markup=reply_markup, parse_mode='Markdown')
+        await self.outbox.edit(query, message, reply_markup=reply_markup, parse_mode='Markdown')
     
     async def main_menu(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Return to main menu"""
@@ -673,52 +876,23 @@ Thank you for your purchase! 🎉
         user_id = query.from_user.id
         
         # Get user info for reward preview
-        user_info = self.db.get_user_info(user_id)
-        consecutive_days = self.db.get_consecutive_checkins(user_id)
-        current_coins = self.db.get_user_coins(user_id)
+        user_info = self.users.get(user_id)
+        consecutive_days = user_info.get('consecutive_checkins', 0)
+        current_coins = user_info.get('coins', 0)
         
-        # Get settings from database
-        settings = self.db.get_settings()
+        # Get settings (cached per settings version)
+        settings = self.render_cache.settings()
         
-        # Calculate potential daily reward
         today = datetime.now().date()
-        if self.db.has_daily_checkin(user_id, today):
-            daily_button_text = "✅ Daily Check-in (Completed)"
-        else:
-            base_coin = settings.get('daily_coin_base', 1)
-            # No consecutive bonus - only base coin
-            daily_button_text = f"📅 Daily Check-in (+{base_coin} coins)"
-        
-        referral_bonus_amount = settings.get('referral_bonus', 1)
-        base_daily = settings.get('daily_coin_base', 1)
-        
-        keyboard = [
-            [InlineKeyboardButton(daily_button_text, callback_data="daily_checkin")],
-            [InlineKeyboardButton("🎰 Join Raffle", callback_data="raffle_list")],
-            [InlineKeyboardButton("🛍️ Coin Shop", callback_data="coin_shop")],
-            [InlineKeyboardButton(f"👥 Invite Friends (+{referral_bonus_amount} coins each)", callback_data="referral")],
-            [InlineKeyboardButton("💰 My Info", callback_data="my_info")]
-        ]
-        
-        # Add invitation code entry option for existing users without referral
-        if not user_info.get('referred_by'):
-            keyboard.append([InlineKeyboardButton(f"🎁 Enter Invitation Code (+{referral_bonus_amount} coins)", callback_data="enter_invite_code")])
+        reply_markup = self._main_menu_keyboard(
+            settings,
+            checked_in=self.checkins.contains(user_id, today),
+            show_invite=not user_info.get('referred_by')
+        )
         
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        message = self._main_menu_template(settings).format(coins=current_coins, days=consecutive_days)
         
-        message = f"""🪙 **Coin Reward System**
-
-💰 **Your Balance:** {current_coins} coins
-🔥 **Consecutive Days:** {consecutive_days} days
-
-**How to Earn More Coins:**
-• Daily check-in: {base_daily} coins (same amount every day)
-• Invite friends: {referral_bonus_amount} coins per referral
-• Use invitation codes: {referral_bonus_amount} coins bonus
-
-Choose an option below:"""
-        
-        await query.edit_message_text(message, reply_markup=reply_markup, parse_mode='Markdown')
+        await self.outbox.edit(query, message, reply_markup=reply_markup, parse_mode='Markdown')
     
     async def enter_invite_code(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle invitation code entry"""
@@ -735,17 +909,17 @@ Choose an option below:"""
 Do you have an invitation code from a friend?
 
 Please send the invitation code as a message.
-For example, if your friend gave you code "ABC123", just type:
+For example, if your friend gave you code "AB12CD34", just type:
 
-`ABC123`
+`AB12CD34`
 
 After sending the code, you'll receive **{referral_bonus} bonus coins** if the code is valid!
         """
         
-        keyboard = [[InlineKeyboardButton("🔙 Main Menu", callback_data="main_menu")]]
+        keyboard = [[InlineKeyboardButton("🔙 Main Menu", callback_data=encode(Action.MAIN_MENU))]]
         reply_markup = InlineKeyboardMarkup(keyboard)
         
-        await query.edit_message_text(message, reply_markup=reply_markup, parse_mode='Markdown')
+        await self.outbox.edit(query, message, reply_markup=reply_markup, parse_mode='Markdown')
         
         # Store that user is expecting invitation code input
         context.user_data['expecting_invite_code'] = True
@@ -761,7 +935,7 @@ After sending the code, you'll receive **{referral_bonus} bonus coins** if the c
             
             try:
                 # Process the invitation code
-                self.db.process_referral(user_id, invitation_code)
+                self._redeem_referral(user_id, invitation_code)
                 
                 # Get settings for bonus amount
                 settings = self.db.get_settings()
@@ -779,8 +953,8 @@ Thank you for joining through a friend's invitation!
                 """
                 
                 keyboard = [
-                    [InlineKeyboardButton("💰 Check My Info", callback_data="my_info")],
-                    [InlineKeyboardButton("🔙 Main Menu", callback_data="main_menu")]
+                    [InlineKeyboardButton("💰 Check My Info", callback_data=encode(Action.MY_INFO))],
+                    [InlineKeyboardButton("🔙 Main Menu", callback_data=encode(Action.MAIN_MENU))]
                 ]
                 
             except Exception as e:
@@ -798,25 +972,24 @@ Try again or ask your friend for the correct code.
                 """
                 
                 keyboard = [
-                    [InlineKeyboardButton("🎁 Try Again", callback_data="enter_invite_code")],
-                    [InlineKeyboardButton("🔙 Main Menu", callback_data="main_menu")]
+                    [InlineKeyboardButton("🎁 Try Again", callback_data=encode(Action.ENTER_INVITE_CODE))],
+                    [InlineKeyboardButton("🔙 Main Menu", callback_data=encode(Action.MAIN_MENU))]
                 ]
             
             reply_markup = InlineKeyboardMarkup(keyboard)
-            await update.message.reply_text(message, reply_markup=reply_markup, parse_mode='Markdown')
+            await self.outbox.reply(update.message, message, reply_markup=reply_markup, parse_mode='Markdown')
             
-            # Clear the expectation flag
-            context.user_data['expecting_invite_code'] = False
+            # Clear the expectation flag (an empty user_data is not stored)
+            context.user_data.pop('expecting_invite_code', None)
             
         else:
             # Handle general text messages - could be invitation code without pressing button
-            if len(message_text) >= 6 and message_text.replace('_', '').isalnum():
-                # Looks like it could be an invitation code
-                invitation_code = message_text.upper()
-                
+            invitation_code = message_text.upper()
+            if self.referral_filter.might_exist(invitation_code):
+                # Format matches and the code may have been issued
                 try:
                     # Try to process it as an invitation code
-                    self.db.process_referral(user_id, invitation_code)
+                    self._apply_referral(user_id, invitation_code)
                     
                     # Get settings for bonus amount
                     settings = self.db.get_settings()
@@ -834,12 +1007,12 @@ Thank you for joining through a friend's invitation!
                     """
                     
                     keyboard = [
-                        [InlineKeyboardButton("💰 Check My Info", callback_data="my_info")],
-                        [InlineKeyboardButton("🔙 Main Menu", callback_data="main_menu")]
+                        [InlineKeyboardButton("💰 Check My Info", callback_data=encode(Action.MY_INFO))],
+                        [InlineKeyboardButton("🔙 Main Menu", callback_data=encode(Action.MAIN_MENU))]
                     ]
                     
                     reply_markup = InlineKeyboardMarkup(keyboard)
-                    await update.message.reply_text(message, reply_markup=reply_markup, parse_mode='Markdown')
+                    await self.outbox.reply(update.message, message, reply_markup=reply_markup, parse_mode='Markdown')
                     
                 except Exception:
                     # If it's not a valid invitation code, provide helpful message
@@ -856,12 +1029,12 @@ Or you can send me your invitation code directly - just type it as a message!
                     """
                     
                     keyboard = [
-                        [InlineKeyboardButton("🎁 Enter Invitation Code", callback_data="enter_invite_code")],
-                        [InlineKeyboardButton("🔙 Main Menu", callback_data="main_menu")]
+                        [InlineKeyboardButton("🎁 Enter Invitation Code", callback_data=encode(Action.ENTER_INVITE_CODE))],
+                        [InlineKeyboardButton("🔙 Main Menu", callback_data=encode(Action.MAIN_MENU))]
                     ]
                     
                     reply_markup = InlineKeyboardMarkup(keyboard)
-                    await update.message.reply_text(message, reply_markup=reply_markup, parse_mode='Markdown')
+                    await self.outbox.reply(update.message, message, reply_markup=reply_markup, parse_mode='Markdown')
             else:
                 # General help message for other text
                 message = """
@@ -878,12 +1051,12 @@ Use the buttons below to get started!
                 """
                 
                 keyboard = [
-                    [InlineKeyboardButton("🎁 Enter Invitation Code", callback_data="enter_invite_code")],
-                    [InlineKeyboardButton("🔙 Main Menu", callback_data="main_menu")]
+                    [InlineKeyboardButton("🎁 Enter Invitation Code", callback_data=encode(Action.ENTER_INVITE_CODE))],
+                    [InlineKeyboardButton("🔙 Main Menu", callback_data=encode(Action.MAIN_MENU))]
                 ]
                 
                 reply_markup = InlineKeyboardMarkup(keyboard)
-                await update.message.reply_text(message, reply_markup=reply_markup, parse_mode='Markdown')
+                await self.outbox.reply(update.message, message, reply_markup=reply_markup, parse_mode='Markdown')
     
     def run(self):
         """Run the bot"""
@@ -901,24 +1074,25 @@ Use the buttons below to get started!
             logger.warning(f"Webhook deletion failed: {e}")
         
         # Create application
-        application = Application.builder().token(self.token).build()
+        application = (
+            Application.builder()
+            .token(self.token)
+            .persistence(self.persistence)
+            .post_init(self._post_init)
+            .post_stop(self._post_stop)
+            .build()
+        )
         
         # Register handlers
         from telegram.ext import MessageHandler, filters
         
+        # Run before every other handler (duplicates, throttle, then cache sync)
+        application.add_handler(TypeHandler(Update, self.dedup.handle), group=-3)
+        application.add_handler(TypeHandler(Update, self.throttle.handle), group=-2)
+        application.add_handler(TypeHandler(Update, self._sync_caches), group=-1)
         application.add_handler(CommandHandler("start", self.start))
-        application.add_handler(CallbackQueryHandler(self.daily_checkin, pattern="^daily_checkin$"))
-        application.add_handler(CallbackQueryHandler(self.view_calendar, pattern="^view_calendar$"))
-        application.add_handler(CallbackQueryHandler(self.show_calendar_month, pattern="^calendar_[0-9]+_[0-9]+$"))
-        application.add_handler(CallbackQueryHandler(self.show_calendar_year, pattern="^calendar_year_[0-9]+$"))
-        application.add_handler(CallbackQueryHandler(self.raffle_list, pattern="^raffle_list$"))
-        application.add_handler(CallbackQueryHandler(self.join_raffle, pattern="^join_raffle_"))
-        application.add_handler(CallbackQueryHandler(self.coin_shop, pattern="^coin_shop$"))
-        application.add_handler(CallbackQueryHandler(self.buy_product, pattern="^buy_product_"))
-        application.add_handler(CallbackQueryHandler(self.referral, pattern="^referral$"))
-        application.add_handler(CallbackQueryHandler(self.my_info, pattern="^my_info$"))
-        application.add_handler(CallbackQueryHandler(self.enter_invite_code, pattern="^enter_invite_code$"))
-        application.add_handler(CallbackQueryHandler(self.main_menu, pattern="^main_menu$"))
+        application.add_handler(CommandHandler("rank", self.rank))
+        application.add_handler(CallbackQueryHandler(self.router.dispatch))
         application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, self.handle_text_message))
         
         logger.info("Handler registration complete. Starting polling...")
@@ -0,0 +1,101 @@
+import asyncio
+import logging
+from typing import Optional, Tuple
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter, TelegramError
+from database import Database
+from outbox import Outbox
+
+logger = logging.getLogger(__name__)
+
+
+class BroadcastEngine:
+    """Sends admin broadcasts to every user from inside the bot process.
+
+    Recipients are paged out of `users` by user_id (keyset), written to
+    `broadcast_recipients` as pending, and marked sent/failed/blocked after
+    each batch. A restarted bot picks the broadcast up again and only sends to
+    recipients that are still pending. Batches default to about one second
+    of sends, which bounds what a crash mid-batch can deliver twice.
+    Flood waits and network errors leave a recipient pending for the next
+    pass, up to `max_attempts` sends; after that, and on any other Telegram
+    error, the recipient is marked failed so one bad chat can't hold the
+    broadcast up.
+    """
+
+    def __init__(self, database: Database, outbox: Outbox,
+                 batch_size: int = 30, poll_interval: float = 5.0, max_attempts: int = 5):
+        self.db = database
+        self.outbox = outbox
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+
+    async def run(self, bot):
+        """Wait for queued broadcasts and deliver them one at a time"""
+        while True:
+            try:
+                broadcast = await asyncio.to_thread(self.db.get_next_broadcast)
+                if broadcast:
+                    await self.deliver(bot, broadcast['id'], broadcast['message'])
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Broadcast worker error: {e}")
+
+            await asyncio.sleep(self.poll_interval)
+
+    async def deliver(self, bot, broadcast_id: int, message: str):
+        """Send one broadcast to all remaining recipients"""
+        logger.info(f"Broadcast {broadcast_id}: starting")
+        await asyncio.to_thread(self.db.set_broadcast_status, broadcast_id, 'running')
+
+        while True:
+            # The admin panel cancels by flipping the status
+            status = await asyncio.to_thread(self.db.get_broadcast_status, broadcast_id)
+            if status != 'running':
+                logger.info(f"Broadcast {broadcast_id}: stopped ({status})")
+                return
+
+            recipients = await asyncio.to_thread(self.db.get_pending_recipients, broadcast_id, self.batch_size)
+            if not recipients:
+                added = await asyncio.to_thread(self.db.enqueue_broadcast_batch, broadcast_id, self.batch_size)
+                if added == 0:
+                    break
+                continue
+
+            outcomes = await asyncio.gather(*(
+                self._send(bot, chat_id, message) for _, chat_id, _ in recipients
+            ))
+
+            # Transient failures stay pending and are retried on the next pass
+            # until they run out of attempts
+            results = []
+            for (user_id, _, attempts), (status, error) in zip(recipients, outcomes):
+                if status == 'retry' and attempts + 1 >= self.max_attempts:
+                    status = 'failed'
+                results.append((user_id, status, error))
+            await asyncio.to_thread(self.db.record_broadcast_results, broadcast_id, results)
+            if all(status == 'retry' for _, status, _ in results):
+                await asyncio.sleep(self.poll_interval)
+
+        await asyncio.to_thread(self.db.set_broadcast_status, broadcast_id, 'completed')
+        logger.info(f"Broadcast {broadcast_id}: completed")
+
+    async def _send(self, bot, chat_id: int, message: str) -> Tuple[str, Optional[str]]:
+        """Send to one chat and classify the outcome (sent/blocked/failed/retry)"""
+        try:
+            await self.outbox.send(bot, chat_id, message)
+            return ('sent', None)
+        except Forbidden as e:
+            # User blocked the bot or deleted the chat
+            return ('blocked', str(e))
+        except BadRequest as e:
+            return ('failed', str(e))
+        except (RetryAfter, NetworkError) as e:
+            logger.warning(f"Broadcast send to {chat_id} will be retried: {e}")
+            return ('retry', str(e))
+        except TelegramError as e:
+            # ChatMigrated, unexpected server errors, ...
+            logger.warning(f"Broadcast send to {chat_id} failed: {e}")
+            return ('failed', str(e))
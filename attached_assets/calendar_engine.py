@@ -0,0 +1,105 @@
+import calendar
+from datetime import date
+from functools import lru_cache
+from typing import List, Tuple
+
+MONTH_NAMES = [
+    "January", "February", "March", "April", "May", "June",
+    "July", "August", "September", "October", "November", "December"
+]
+
+LEGEND = (
+    "**Legend:**\n"
+    "✅ = Checked in  📍 = Today  ·· = Future\n"
+)
+
+
+class MonthTemplate:
+    """Static layout of one month: header, day labels and week boundaries"""
+
+    def __init__(self, year: int, month: int):
+        self.year = year
+        self.month = month
+        self.first_weekday, self.days_in_month = calendar.monthrange(year, month)
+        self.first_day = date(year, month, 1)
+
+        self.header = (
+            f"📅 **{MONTH_NAMES[month-1]} {year}**\n\n"
+            "```\n"
+            "Mon Tue Wed Thu Fri Sat Sun\n"
+            + "─" * 27 + "\n"
+        )
+
+        # Index 0 unused so day numbers index directly
+        self.day_labels = [""] + [f"{day:2d}" for day in range(1, self.days_in_month + 1)]
+
+        # (leading padding, first day, last day) for each week row
+        self.rows: List[Tuple[str, int, int]] = []
+        day = 1
+        pad = "    " * self.first_weekday
+        while day <= self.days_in_month:
+            last = min(day + 6 - (self.first_weekday if day == 1 else 0), self.days_in_month)
+            self.rows.append((pad, day, last))
+            pad = ""
+            day = last + 1
+
+
+@lru_cache(maxsize=256)
+def get_month_template(year: int, month: int) -> MonthTemplate:
+    """Build a month layout once and reuse it for every render"""
+    return MonthTemplate(year, month)
+
+
+def checkin_mask(days) -> int:
+    """Pack day-of-month numbers into a bitmask (bit N = day N)"""
+    mask = 0
+    for day in days:
+        mask |= 1 << day
+    return mask
+
+
+def render_month(year: int, month: int, mask: int, today: date) -> str:
+    """Render a month calendar by overlaying the check-in bitmask on the cached layout"""
+    template = get_month_template(year, month)
+    days_in_month = template.days_in_month
+
+    # Days before `past_limit` are in the past, `today_day` gets the marker
+    if year == today.year and month == today.month:
+        today_day = today.day
+        past_limit = today.day
+        days_so_far = today.day
+    elif template.first_day < today:
+        today_day = 0
+        past_limit = days_in_month + 1
+        days_so_far = days_in_month
+    else:
+        today_day = 0
+        past_limit = 1
+        days_so_far = 0
+
+    labels = template.day_labels
+    cells = [""]
+    for day in range(1, days_in_month + 1):
+        if mask >> day & 1:
+            cells.append("✅")
+        elif day == today_day:
+            cells.append("📍")
+        elif day < past_limit:
+            cells.append(labels[day])
+        else:
+            cells.append("··")
+
+    grid = "".join(pad + " ".join(cells[first:last + 1]) + "\n" for pad, first, last in template.rows)
+
+    monthly_checkins = bin(mask).count("1")
+    checkin_rate = (monthly_checkins / days_so_far * 100) if days_so_far > 0 else 0
+
+    return (
+        template.header
+        + grid
+        + "```\n"
+        + "📊 **Monthly Stats:**\n"
+        + f"• Check-ins: {monthly_checkins}/{days_so_far} days\n"
+        + f"• Success rate: {checkin_rate:.1f}%\n\n"
+        + LEGEND
+    )
@@ -0,0 +1,127 @@
+import re
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# callback_data 형식: "<version>:<action>[:<arg>...]", 정수 인자는 base36
+CALLBACK_VERSION = "1"
+SEPARATOR = ":"
+MAX_CALLBACK_BYTES = 64  # Telegram limit for callback_data
+
+_DIGITS = "0123456789abcdefghijklmnopqrstuvwxyz"
+# int(arg, 36) 는 부호, 공백, 0x 같은 접두사도 받으므로 먼저 형식을 확인한다
+_PACKED_ARG = re.compile(r"[0-9a-z]+")
+_LEGACY_ARG = re.compile(r"[0-9]+")
+
+
+class Action:
+    """Short action codes used in callback_data"""
+    MAIN_MENU = "m"
+    DAILY_CHECKIN = "d"
+    VIEW_CALENDAR = "c"
+    CALENDAR_MONTH = "cm"
+    CALENDAR_YEAR = "cy"
+    RAFFLE_LIST = "r"
+    RAFFLE_PAGE = "rp"
+    JOIN_RAFFLE = "rj"
+    BUY_TICKETS = "rt"
+    COIN_SHOP = "s"
+    SHOP_PAGE = "sp"
+    BUY_PRODUCT = "sb"
+    REFERRAL = "f"
+    ENTER_INVITE_CODE = "fi"
+    MY_INFO = "i"
+
+
+def pack_int(value: int) -> str:
+    """Non-negative int to base36"""
+    if value < 0:
+        raise ValueError(f"Callback arguments must be non-negative: {value}")
+    if value == 0:
+        return "0"
+    digits = []
+    while value:
+        value, rem = divmod(value, 36)
+        digits.append(_DIGITS[rem])
+    return "".join(reversed(digits))
+
+
+def encode(action: str, *args: int) -> str:
+    """Build callback_data for an action and its integer arguments"""
+    data = SEPARATOR.join([CALLBACK_VERSION, action, *map(pack_int, args)])
+    if len(data.encode()) > MAX_CALLBACK_BYTES:
+        raise ValueError(f"callback_data too long: {data}")
+    return data
+
+
+Handler = Callable[..., Awaitable[None]]
+
+
+class CallbackRouter:
+    """Dispatches callback queries through one dict lookup.
+
+    Handlers are called as handler(update, context, *args) with the decoded
+    integer arguments, so they no longer parse query.data themselves.
+    Payloads from before the compact format ("join_raffle_12",
+    "calendar_2025_7", ...) are still decoded for buttons already sitting in
+    users' chats.
+    """
+
+    def __init__(self):
+        self._routes: Dict[str, Tuple[Handler, int]] = {}
+        self._legacy_names: Dict[str, str] = {}
+        self._legacy_prefixes: List[Tuple[str, str]] = []
+
+    def add(self, action: str, handler: Handler, arity: int = 0, legacy: Optional[str] = None):
+        """Register a handler; `legacy` is the old exact name, or the old prefix when arity > 0"""
+        self._routes[action] = (handler, arity)
+        if legacy:
+            if arity:
+                self._legacy_prefixes.append((legacy, action))
+                # Longest prefix first, so "calendar_year_" wins over "calendar_"
+                self._legacy_prefixes.sort(key=lambda item: len(item[0]), reverse=True)
+            else:
+                self._legacy_names[legacy] = action
+
+    def decode(self, data: Optional[str]) -> Optional[Tuple[Handler, tuple]]:
+        """(handler, args) for callback_data, or None if it is not recognised"""
+        if not data:
+            return None
+
+        parts = data.split(SEPARATOR)
+        if len(parts) >= 2 and parts[0] == CALLBACK_VERSION:
+            route = self._routes.get(parts[1])
+            if route is None or len(parts) - 2 != route[1]:
+                return None
+            if not all(_PACKED_ARG.fullmatch(arg) for arg in parts[2:]):
+                return None
+            return route[0], tuple(int(arg, 36) for arg in parts[2:])
+
+        return self._decode_legacy(data)
+
+    def _decode_legacy(self, data: str) -> Optional[Tuple[Handler, tuple]]:
+        action = self._legacy_names.get(data)
+        if action is not None:
+            return self._routes[action][0], ()
+
+        for prefix, action in self._legacy_prefixes:
+            if data.startswith(prefix):
+                handler, arity = self._routes[action]
+                args = data[len(prefix):].split('_')
+                if len(args) != arity or not all(_LEGACY_ARG.fullmatch(arg) for arg in args):
+                    return None
+                return handler, tuple(int(arg) for arg in args)
+        return None
+
+    async def dispatch(self, update, context):
+        """Single CallbackQueryHandler callback for every button"""
+        query = update.callback_query
+        route = self.decode(query.data)
+        if route is None:
+            logger.warning(f"Unknown callback data from user {query.from_user.id}: {query.data!r}")
+            await query.answer()
+            return
+
+        handler, args = route
+        await handler(update, context, *args)
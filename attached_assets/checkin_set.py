@@ -0,0 +1,88 @@
+import threading
+from array import array
+from bisect import bisect_left
+from itertools import chain
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional
+from database import Database
+
+
+class CheckinSet:
+    """User ids that have checked in today, kept in memory by the bot.
+
+    Ids live in a sorted array('q') (8 bytes each) searched with bisect.
+    New check-ins go to a small pending set first and are merged into the
+    array in one linear pass once it reaches `merge_threshold`, so a
+    check-in never has to shift the whole array. The set reloads itself
+    from daily_checkins when the date changes, and is kept current through
+    the Database user listener (a write that sets last_checkin to today).
+    """
+
+    def __init__(self, database: Database, merge_threshold: int = 4096):
+        self.db = database
+        self.merge_threshold = merge_threshold
+        self.lock = threading.Lock()
+        self.day: Optional[date] = None
+        self._ids = array('q')
+        self._pending = set()
+        database.add_user_listener(self._on_write)
+
+    def load(self, day: date):
+        """Replace the set with the check-ins recorded for `day`"""
+        ids = array('q', self.db.get_checkin_user_ids(day))
+        with self.lock:
+            self.day = day
+            self._ids = ids
+            self._pending = set()
+
+    def _current(self, day: Optional[date]) -> date:
+        day = day or datetime.now().date()
+        if day != self.day:
+            self.load(day)
+        return day
+
+    def _in_array(self, user_id: int) -> bool:
+        i = bisect_left(self._ids, user_id)
+        return i < len(self._ids) and self._ids[i] == user_id
+
+    def contains(self, user_id: int, day: Optional[date] = None) -> bool:
+        """Whether the user has checked in on `day` (default today)"""
+        self._current(day)
+        with self.lock:
+            return user_id in self._pending or self._in_array(user_id)
+
+    def add(self, user_id: int, day: Optional[date] = None):
+        """Record a check-in for `day` (default today)"""
+        self._current(day)
+        with self.lock:
+            if self._in_array(user_id):
+                return
+            self._pending.add(user_id)
+            if len(self._pending) >= self.merge_threshold:
+                self._merge()
+
+    def _merge(self):
+        if not self._pending:
+            return
+        # The array is already one sorted run, so timsort folds the pending ids in about linear time
+        self._ids = array('q', sorted(chain(self._ids, self._pending)))
+        self._pending = set()
+
+    def _on_write(self, states: List[Dict[str, Any]]):
+        if self.day is None:
+            return
+        today = self.day.isoformat()
+        for state in states:
+            if state.get('last_checkin') == today:
+                self.add(state['user_id'], self.day)
+
+    def __len__(self) -> int:
+        with self.lock:
+            self._merge()
+            return len(self._ids)
+
+    def memory_bytes(self) -> int:
+        """Approximate memory held: the id array plus the pending set"""
+        with self.lock:
+            return (self._ids.buffer_info()[1] * self._ids.itemsize
+                    + self._pending.__sizeof__() + 32 * len(self._pending))
@@ -1,13 +1,18 @@
 import sqlite3
+import time
 import threading
 from datetime import datetime, date, timedelta
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 import json
+import raffle_draw
 
 class Database:
     def __init__(self, db_path: str = "coin_reward_system.db"):
         self.db_path = db_path
         self.lock = threading.Lock()
+        self.user_listeners = []
+        # 이 프로세스에서 버전/변경 로그를 올린 쓰기 횟수 (QueryCache 즉시 갱신용)
+        self.write_count = 0
         self.init_database()
     
     def init_database(self):
@@ -33,10 +38,21 @@ class Database:
                     consecutive_checkins INTEGER DEFAULT 0,
                     total_checkins INTEGER DEFAULT 0,
                     raffle_entries INTEGER DEFAULT 0,
-                    raffle_wins INTEGER DEFAULT 0
+                    raffle_wins INTEGER DEFAULT 0,
+                    referral_count INTEGER DEFAULT 0
                 )
             """)
             
+            # 기존 DB 마이그레이션: 추천 수 컬럼 (리더보드용)
+            cursor.execute("PRAGMA table_info(users)")
+            if 'referral_count' not in [row[1] for row in cursor.fetchall()]:
+                cursor.execute("ALTER TABLE users ADD COLUMN referral_count INTEGER DEFAULT 0")
+                cursor.execute("""
+                    UPDATE users SET referral_count = (
+                        SELECT COUNT(*) FROM referrals WHERE referrals.referrer_id = users.user_id
+                    )
+                """)
+            
             # 데일리 체크인 테이블
             cursor.execute("""
                 CREATE TABLE IF NOT EXISTS daily_checkins (
@@ -63,10 +79,27 @@ class Database:
                     end_date TIMESTAMP NOT NULL,
                     winner_id INTEGER,
                     status TEXT DEFAULT 'active',
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    draw_seed TEXT,
+                    draw_commitment TEXT,
+                    draw_entries INTEGER,
+                    draw_index INTEGER,
+                    tickets_sold INTEGER NOT NULL DEFAULT 0,
+                    winners INTEGER NOT NULL DEFAULT 1
                 )
             """)
             
+            # 기존 DB 마이그레이션: 검증 가능한 추첨 (진행 중인 래플은 지금 시드를 정한다)
+            cursor.execute("PRAGMA table_info(raffles)")
+            if 'draw_commitment' not in [row[1] for row in cursor.fetchall()]:
+                for column in ('draw_seed TEXT', 'draw_commitment TEXT', 'draw_entries INTEGER', 'draw_index INTEGER'):
+                    cursor.execute(f"ALTER TABLE raffles ADD COLUMN {column}")
+                cursor.execute("SELECT id FROM raffles WHERE status = 'active'")
+                for (raffle_id,) in cursor.fetchall():
+                    seed = raffle_draw.new_seed()
+                    cursor.execute("UPDATE raffles SET draw_seed = ?, draw_commitment = ? WHERE id = ?",
+                                   (seed, raffle_draw.commitment(seed), raffle_id))
+            
             # 래플 참여 테이블
             cursor.execute("""
                 CREATE TABLE IF NOT EXISTS raffle_entries (
@@ -75,12 +108,47 @@ class Database:
                     user_id INTEGER NOT NULL,
                     entry_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     coins_spent INTEGER NOT NULL,
+                    tickets INTEGER NOT NULL DEFAULT 1,
                     UNIQUE(raffle_id, user_id),
                     FOREIGN KEY (raffle_id) REFERENCES raffles (id),
                     FOREIGN KEY (user_id) REFERENCES users (user_id)
                 )
             """)
             
+            # 기존 DB 마이그레이션: 참여당 티켓 수, 래플별 판매 티켓 카운터와 당첨자 수
+            cursor.execute("PRAGMA table_info(raffle_entries)")
+            if 'tickets' not in [row[1] for row in cursor.fetchall()]:
+                cursor.execute("ALTER TABLE raffle_entries ADD COLUMN tickets INTEGER NOT NULL DEFAULT 1")
+            cursor.execute("PRAGMA table_info(raffles)")
+            if 'tickets_sold' not in [row[1] for row in cursor.fetchall()]:
+                cursor.execute("ALTER TABLE raffles ADD COLUMN tickets_sold INTEGER NOT NULL DEFAULT 0")
+                cursor.execute("ALTER TABLE raffles ADD COLUMN winners INTEGER NOT NULL DEFAULT 1")
+                cursor.execute("""
+                    UPDATE raffles SET tickets_sold = (
+                        SELECT COALESCE(SUM(tickets), 0) FROM raffle_entries e WHERE e.raffle_id = raffles.id
+                    )
+                """)
+            
+            # 래플 당첨자 (place 1 = raffles.winner_id), ticket 은 그 추첨에서 뽑힌 티켓 번호
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'raffle_winners'")
+            winners_exist = cursor.fetchone() is not None
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS raffle_winners (
+                    raffle_id INTEGER NOT NULL,
+                    place INTEGER NOT NULL,
+                    user_id INTEGER NOT NULL,
+                    ticket INTEGER,
+                    PRIMARY KEY (raffle_id, place),
+                    FOREIGN KEY (raffle_id) REFERENCES raffles (id),
+                    FOREIGN KEY (user_id) REFERENCES users (user_id)
+                )
+            """)
+            if not winners_exist:
+                cursor.execute("""
+                    INSERT INTO raffle_winners (raffle_id, place, user_id, ticket)
+                    SELECT id, 1, winner_id, draw_index FROM raffles WHERE winner_id IS NOT NULL
+                """)
+            
             # 상품 테이블
             cursor.execute("""
                 CREATE TABLE IF NOT EXISTS products (
@@ -133,12 +201,588 @@ class Database:
                     transaction_type TEXT NOT NULL,
                     description TEXT,
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    source TEXT,
+                    ref_id INTEGER,
                     FOREIGN KEY (user_id) REFERENCES users (user_id)
                 )
             """)
             
+            # 기존 DB 마이그레이션: 거래 출처/참조 (설명 문자열에서 한 번 채운다)
+            cursor.execute("PRAGMA table_info(coin_transactions)")
+            if 'source' not in [row[1] for row in cursor.fetchall()]:
+                cursor.execute("ALTER TABLE coin_transactions ADD COLUMN source TEXT")
+                cursor.execute("ALTER TABLE coin_transactions ADD COLUMN ref_id INTEGER")
+                cursor.execute("""
+                    UPDATE coin_transactions SET
+                        source = CASE
+                            WHEN description LIKE '데일리 체크인%' THEN 'checkin'
+                            WHEN description LIKE '래플 참여%' THEN 'raffle'
+                            WHEN description LIKE '상품 구매%' THEN 'shop'
+                            WHEN description IN ('Friend referral bonus', 'Invitation code bonus') THEN 'referral'
+                            ELSE 'other'
+                        END,
+                        ref_id = CASE
+                            WHEN description LIKE '래플 참여%' OR description LIKE '상품 구매%'
+                            THEN CAST(substr(description, instr(description, 'ID: ') + 4) AS INTEGER)
+                        END
+                """)
+            
+            # 출처별 일일 코인 유입/유출 (거래 기록 시 함께 갱신)
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'coin_flow_daily'")
+            flow_exists = cursor.fetchone() is not None
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS coin_flow_daily (
+                    day DATE NOT NULL,
+                    source TEXT NOT NULL,
+                    inflow INTEGER NOT NULL DEFAULT 0,
+                    outflow INTEGER NOT NULL DEFAULT 0,
+                    transactions INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (day, source)
+                ) WITHOUT ROWID
+            """)
+            if not flow_exists:
+                cursor.execute("""
+                    INSERT INTO coin_flow_daily (day, source, inflow, outflow, transactions)
+                    SELECT DATE(created_at), source,
+                           SUM(MAX(amount, 0)), SUM(MAX(-amount, 0)), COUNT(*)
+                    FROM coin_transactions
+                    GROUP BY 1, 2
+                """)
+            
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_raffles_status_end
+                ON raffles (status, end_date)
+            """)
+            
+            # 래플별 참여 목록 (참여 순서 = rowid)
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_raffle_entries_raffle
+                ON raffle_entries (raffle_id)
+            """)
+            
+            # 관리자 래플 목록 (상태 필터 + 최신순 페이지)
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_raffles_status_id
+                ON raffles (status, id)
+            """)
+            
+            # 날짜별 체크인 사용자 조회용
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_daily_checkins_date
+                ON daily_checkins (checkin_date, user_id)
+            """)
+            
+            # 리더보드 인덱스 (ORDER BY <지표> DESC, user_id LIMIT n)
+            for column in self.LEADERBOARD_COLUMNS.values():
+                cursor.execute(f"""
+                    CREATE INDEX IF NOT EXISTS idx_users_{column}
+                    ON users ({column} DESC, user_id)
+                """)
+            
+            # 관리자 사용자 목록 가입일 정렬
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_users_joined_date
+                ON users (joined_date DESC, user_id)
+            """)
+            
+            # 사용자 이름/아이디 검색 (trigram FTS5: 대소문자 무시 부분 문자열 검색)
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'users_fts'")
+            fts_exists = cursor.fetchone() is not None
+            cursor.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS users_fts USING fts5(
+                    full_name, username,
+                    content='users', content_rowid='id', tokenize='trigram'
+                )
+            """)
+            cursor.execute("""
+                CREATE TRIGGER IF NOT EXISTS users_fts_insert AFTER INSERT ON users BEGIN
+                    INSERT INTO users_fts (rowid, full_name, username)
+                    VALUES (new.id, new.full_name, new.username);
+                END
+            """)
+            cursor.execute("""
+                CREATE TRIGGER IF NOT EXISTS users_fts_delete AFTER DELETE ON users BEGIN
+                    INSERT INTO users_fts (users_fts, rowid, full_name, username)
+                    VALUES ('delete', old.id, old.full_name, old.username);
+                END
+            """)
+            # register_user 는 매번 이름을 다시 쓰므로 실제로 바뀐 경우만 재색인
+            cursor.execute("""
+                CREATE TRIGGER IF NOT EXISTS users_fts_update AFTER UPDATE OF full_name, username ON users
+                WHEN old.full_name IS NOT new.full_name OR old.username IS NOT new.username BEGIN
+                    INSERT INTO users_fts (users_fts, rowid, full_name, username)
+                    VALUES ('delete', old.id, old.full_name, old.username);
+                    INSERT INTO users_fts (rowid, full_name, username)
+                    VALUES (new.id, new.full_name, new.username);
+                END
+            """)
+            if not fts_exists:
+                cursor.execute("INSERT INTO users_fts (users_fts) VALUES ('rebuild')")
+            
+            # 상점 페이지 keyset 인덱스 (전체 / 카테고리별)
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_products_price
+                ON products (price, id)
+            """)
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_products_category_price
+                ON products (category, price, id)
+            """)
+            
+            # 브로드캐스트 테이블
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS broadcasts (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    message TEXT NOT NULL,
+                    status TEXT DEFAULT 'queued',
+                    total_recipients INTEGER DEFAULT 0,
+                    sent_count INTEGER DEFAULT 0,
+                    failed_count INTEGER DEFAULT 0,
+                    cursor_user_id INTEGER DEFAULT 0,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    started_at TIMESTAMP,
+                    updated_at TIMESTAMP,
+                    finished_at TIMESTAMP
+                )
+            """)
+            
+            # 브로드캐스트 수신자별 상태 테이블
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS broadcast_recipients (
+                    broadcast_id INTEGER NOT NULL,
+                    user_id INTEGER NOT NULL,
+                    chat_id INTEGER NOT NULL,
+                    status TEXT DEFAULT 'pending',
+                    error TEXT,
+                    sent_at TIMESTAMP,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (broadcast_id, user_id),
+                    FOREIGN KEY (broadcast_id) REFERENCES broadcasts (id)
+                )
+            """)
+            
+            # 기존 DB 마이그레이션: 일시적 오류 재시도 횟수
+            cursor.execute("PRAGMA table_info(broadcast_recipients)")
+            if 'attempts' not in [row[1] for row in cursor.fetchall()]:
+                cursor.execute("ALTER TABLE broadcast_recipients ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0")
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_broadcast_recipients_status
+                ON broadcast_recipients (broadcast_id, status, user_id)
+            """)
+            
+            # 데이터 버전 테이블 (캐시 무효화용)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS data_versions (
+                    name TEXT PRIMARY KEY,
+                    version INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            
+            # 사용자 변경 로그 (다른 프로세스의 캐시 무효화용)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS user_changes (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id INTEGER NOT NULL,
+                    changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            
+            # 데일리 리마인더 실행 기록 (하루 1회)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS reminder_runs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    run_date DATE UNIQUE NOT NULL,
+                    status TEXT DEFAULT 'running',
+                    eligible_count INTEGER DEFAULT 0,
+                    max_user_id INTEGER DEFAULT 0,
+                    cursor_user_id INTEGER DEFAULT 0,
+                    sent_count INTEGER DEFAULT 0,
+                    failed_count INTEGER DEFAULT 0,
+                    skipped_count INTEGER DEFAULT 0,
+                    started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP,
+                    finished_at TIMESTAMP
+                )
+            """)
+            
+            # 봇 대화 상태 (python-telegram-bot user_data/chat_data, pickle BLOB)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS bot_state (
+                    kind TEXT NOT NULL,
+                    id INTEGER NOT NULL,
+                    data BLOB NOT NULL,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (kind, id)
+                ) WITHOUT ROWID
+            """)
+            
+            # 처리한 update_id 체크포인트 (중복 업데이트 방지)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS processed_updates (
+                    update_id INTEGER PRIMARY KEY,
+                    processed_at REAL NOT NULL
+                )
+            """)
+            
+            # 참여 지표 롤업 (engagement.py; daily_checkins/users 에서 증분 집계)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS engagement_daily (
+                    day DATE PRIMARY KEY,
+                    active_users INTEGER NOT NULL DEFAULT 0,
+                    new_users INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS engagement_periods (
+                    period TEXT NOT NULL,
+                    start_day DATE NOT NULL,
+                    active_users INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (period, start_day)
+                ) WITHOUT ROWID
+            """)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS cohort_sizes (
+                    cohort_week DATE PRIMARY KEY,
+                    users INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS cohort_activity (
+                    cohort_week DATE NOT NULL,
+                    week_number INTEGER NOT NULL,
+                    active_users INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (cohort_week, week_number)
+                ) WITHOUT ROWID
+            """)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS rollup_watermarks (
+                    name TEXT PRIMARY KEY,
+                    last_id INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            
+            conn.commit()
+            conn.close()
+    
+    def _bump_version(self, cursor, *names: str):
+        """데이터 버전 증가 (호출자 트랜잭션 안에서)"""
+        self.write_count += 1
+        cursor.executemany("""
+            INSERT INTO data_versions (name, version) VALUES (?, 1)
+            ON CONFLICT(name) DO UPDATE SET version = version + 1
+        """, [(name,) for name in names])
+    
+    # 코인 거래 출처 (ref_id: checkin -> daily_checkins.id, referral -> referrals.id,
+    # raffle -> raffles.id, shop -> products.id, admin -> 없음)
+    COIN_SOURCES = ('checkin', 'referral', 'raffle', 'shop', 'admin')
+    
+    def _record_coins(self, cursor, user_id: int, amount: int, source: str, description: str,
+                      ref_id: Optional[int] = None):
+        """코인 거래 기록 + coin_flow_daily 롤업 (호출자 트랜잭션 안에서)"""
+        cursor.execute("""
+            INSERT INTO coin_transactions
+            (user_id, amount, transaction_type, description, source, ref_id)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (user_id, amount, 'earn' if amount >= 0 else 'spend', description, source, ref_id))
+        cursor.execute("""
+            INSERT INTO coin_flow_daily (day, source, inflow, outflow, transactions)
+            VALUES (DATE('now'), ?, ?, ?, 1)
+            ON CONFLICT(day, source) DO UPDATE SET
+                inflow = inflow + excluded.inflow,
+                outflow = outflow + excluded.outflow,
+                transactions = transactions + 1
+        """, (source, max(amount, 0), max(-amount, 0)))
+    
+    # 리더보드 지표 -> users 컬럼
+    LEADERBOARD_COLUMNS = {
+        'coins': 'coins',
+        'total_earned': 'total_earned',
+        'streak': 'consecutive_checkins',
+        'referrals': 'referral_count'
+    }
+    
+    def get_leaderboard(self, metric: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """리더보드 상위 사용자 조회 (인덱스 순회)"""
+        column = self.LEADERBOARD_COLUMNS[metric]
+        with self.lock:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute(f"""
+                SELECT user_id, username, full_name, {column}
+                FROM users
+                ORDER BY {column} DESC, user_id
+                LIMIT ?
+            """, (limit,))
+            
+            results = cursor.fetchall()
+            conn.close()
+            
+            return [
+                {'user_id': row[0], 'username': row[1], 'full_name': row[2], 'value': row[3]}
+                for row in results
+            ]
+    
+    def get_leaderboard_values(self) -> List[tuple]:
+        """전체 사용자 리더보드 값 조회 (user_id, coins, total_earned, streak, referrals)"""
+        columns = ", ".join(self.LEADERBOARD_COLUMNS.values())
+        with self.lock:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute(f"SELECT user_id, {columns} FROM users")
+            results = cursor.fetchall()
+            conn.close()
+            
+            return results
+    
+    def get_leaderboard_rows(self, user_ids: List[int]) -> Tuple[int, List[tuple]]:
+        """일부 사용자 리더보드 값 조회 (변경 로그 위치, 행 목록)"""
+        columns = ", ".join(self.LEADERBOARD_COLUMNS.values())
+        with self.lock:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute("SELECT COALESCE(MAX(seq), 0) FROM user_changes")
+            seq = cursor.fetchone()[0]
+            results = []
+            for start in range(0, len(user_ids), 500):
+                chunk = user_ids[start:start + 500]
+                cursor.execute(f"""
+                    SELECT user_id, {columns} FROM users
+                    WHERE user_id IN ({', '.join('?' * len(chunk))})
+                """, chunk)
+                results.extend(cursor.fetchall())
+            conn.close()
+            
+            return seq, results
+    
+    def get_data_versions(self) -> Dict[str, int]:
+        """모든 데이터 버전 조회"""
+        with self.lock:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute("SELECT name, version FROM data_versions")
+            results = cursor.fetchall()
+            conn.close()
+            
+            return dict(results)
+    
+    _USER_STATE_COLUMNS = """
+        user_id, username, full_name, coins, total_earned, referral_code,
+        joined_date, consecutive_checkins, total_checkins, raffle_entries,
+        raffle_wins, referred_by, last_checkin, chat_id, referral_count,
+        (SELECT COALESCE(MAX(seq), 0) FROM user_changes)
+    """
+    
+    def _read_user_state(self, cursor, user_id: int) -> Dict[str, Any]:
+        cursor.execute(f"SELECT {self._USER_STATE_COLUMNS} FROM users WHERE user_id = ?", (user_id,))
+        row = cursor.fetchone()
+        if not row:
+            return {}
+        return {
+            'user_id': row[0],
+            'username': row[1],
+            'full_name': row[2],
+            'coins': row[3],
+            'total_earned': row[4],
+            'referral_code': row[5],
+            'joined_date': row[6],
+            'consecutive_checkins': row[7],
+            'total_checkins': row[8],
+            'raffle_entries': row[9],
+            'raffle_wins': row[10],
+            'referred_by': row[11],
+            'last_checkin': row[12],
+            'chat_id': row[13],
+            'referral_count': row[14],
+            'seq': row[15]
+        }
+    
+    def add_user_listener(self, callback):
+        """사용자 변경 리스너 등록 (커밋 후 callback(states) 호출)"""
+        self.user_listeners.append(callback)
+    
+    def _user_changed(self, cursor, *user_ids: int) -> List[Dict[str, Any]]:
+        """사용자 변경 기록 (호출자 트랜잭션 안에서, 리스너용 최신 행 반환)"""
+        cursor.executemany("INSERT INTO user_changes (user_id) VALUES (?)", [(uid,) for uid in user_ids])
+        self.write_count += 1
+        if not self.user_listeners:
+            return []
+        return [state for state in (self._read_user_state(cursor, uid) for uid in user_ids) if state]
+    
+    def _notify_user_listeners(self, states: List[Dict[str, Any]]):
+        for callback in self.user_listeners:
+            callback(states)
+    
+    def get_user_state(self, user_id: int) -> Dict[str, Any]:
+        """사용자 상태 조회 (변경 로그 위치 포함)"""
+        with self.lock:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            state = self._read_user_state(cursor, user_id)
+            conn.close()
+            
+            return state
+    
+    def get_user_changes(self, after_seq: int, limit: int = 10000) -> List[tuple]:
+        """변경 로그 위치 이후의 사용자 변경 조회 (seq, user_id)"""
+        with self.lock:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                SELECT seq, user_id FROM user_changes
+                WHERE seq > ?
+                ORDER BY seq
+                LIMIT ?
+            """, (after_seq, limit))
+            
+            results = cursor.fetchall()
+            conn.close()
+            
+            return results
+    
+    def get_user_change_seq(self) -> int:
+        """최신 변경 로그 위치 조회"""
+        with self.lock:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute("SELECT COALESCE(MAX(seq), 0) FROM user_changes")
+            result = cursor.fetchone()[0]
+            conn.close()
+            
+            return result
+    
+    def get_data_token(self) -> Dict[str, int]:
+        """데이터 버전 + 사용자 변경 로그 위치('users') 조회"""
+        with self.lock:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            # sqlite_sequence keeps the last seq even after old log rows are pruned
+            cursor.execute("""
+                SELECT name, version FROM data_versions
+                UNION ALL
+                SELECT 'users', COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'user_changes'), 0)
+            """)
+            results = cursor.fetchall()
+            conn.close()
+            
+            return dict(results)
+    
+    def prune_user_changes(self, max_age_hours: int = 24) -> int:
+        """오래된 변경 로그 삭제 (삭제된 행 수 반환)"""
+        with self.lock:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                DELETE FROM user_changes
+                WHERE changed_at < datetime('now', ?)
+            """, (f"-{max_age_hours} hours",))
+            
+            removed = cursor.rowcount
+            conn.commit()
+            conn.close()
+            
+            return removed
+    
+    def load_bot_state(self, kind: str) -> Dict[int, tuple]:
+        """봇 상태 조회 ('user'/'chat', id -> (data, updated_at))"""
+        with self.lock:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute("SELECT id, data, updated_at FROM bot_state WHERE kind = ?", (kind,))
+            rows = {row[0]: (row[1], row[2]) for row in cursor.fetchall()}
+            conn.close()
+            return rows
+    
+    def save_bot_state(self, upserts: List[tuple], deletes: List[tuple] = ()):
+        """봇 상태 일괄 저장/삭제 (한 트랜잭션)"""
+        with self.lock:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            try:
+                cursor.executemany("""
+                    INSERT INTO bot_state (kind, id, data, updated_at) VALUES (?, ?, ?, ?)
+                    ON CONFLICT(kind, id) DO UPDATE SET
+                        data = excluded.data,
+                        updated_at = excluded.updated_at
+                """, upserts)
+                cursor.executemany("DELETE FROM bot_state WHERE kind = ? AND id = ?", deletes)
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                raise e
+            finally:
+                conn.close()
+    
+    def prune_bot_state(self, before: float) -> int:
+        """`before` 이후 갱신되지 않은 봇 상태 삭제 (삭제된 행 수 반환)"""
+        with self.lock:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute("DELETE FROM bot_state WHERE updated_at < ?", (before,))
+            
+            removed = cursor.rowcount
             conn.commit()
             conn.close()
+            
+            return removed
+    
+    def save_processed_updates(self, update_ids: List[int], prune_before: float):
+        """처리한 update_id 기록 (`prune_before` 이전 기록은 삭제)"""
+        now = time.time()
+        with self.lock:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            try:
+                cursor.executemany("""
+                    INSERT OR REPLACE INTO processed_updates (update_id, processed_at) VALUES (?, ?)
+                """, [(update_id, now) for update_id in update_ids])
+                cursor.execute("DELETE FROM processed_updates WHERE processed_at < ?", (prune_before,))
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                raise e
+            finally:
+                conn.close()
+    
+    def get_processed_updates(self, since: float) -> List[int]:
+        """`since` 이후 처리한 update_id 조회 (오래된 순)"""
+        with self.lock:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                SELECT update_id FROM processed_updates
+                WHERE processed_at >= ?
+                ORDER BY processed_at, update_id
+            """, (since,))
+            
+            results = [row[0] for row in cursor.fetchall()]
+            conn.close()
+            return results
+    
+    def is_update_processed(self, update_id: int) -> bool:
+        """update_id 처리 기록 여부"""
+        with self.lock:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute("SELECT 1 FROM processed_updates WHERE update_id = ?", (update_id,))
+            
+            result = cursor.fetchone() is not None
+            conn.close()
+            return result
     
     def register_user(self, user_id: int, username: str, full_name: str, chat_id: int):
         """사용자 등록 또는 업데이트"""
@@ -147,12 +791,18 @@ class Database:
             cursor = conn.cursor()
             
             try:
+                # INSERT OR REPLACE 는 기존 행을 지우고 새로 넣어 코인/출석/추천 정보가 초기화됨
                 cursor.execute("""
-                    INSERT OR REPLACE INTO users 
-                    (user_id, username, full_name, chat_id)
+                    INSERT INTO users (user_id, username, full_name, chat_id)
                     VALUES (?, ?, ?, ?)
+                    ON CONFLICT(user_id) DO UPDATE SET
+                        username = excluded.username,
+                        full_name = excluded.full_name,
+                        chat_id = excluded.chat_id
                 """, (user_id, username, full_name, chat_id))
+                states = self._user_changed(cursor, user_id)
                 conn.commit()
+                self._notify_user_listeners(states)
             except Exception as e:
                 conn.rollback()
                 raise e
@@ -216,6 +866,7 @@ class Database:
                     (user_id, checkin_date, coins_earned, consecutive_days)
                     VALUES (?, ?, ?, ?)
                 """, (user_id, today, total_coin, consecutive_days))
+                checkin_id = cursor.lastrowid
                 
                 # 사용자 정보 업데이트
                 cursor.execute("""
@@ -235,13 +886,12 @@ class Database:
                 """, (total_coin, total_coin, user_id))
                 
                 # 코인 거래 기록
-                cursor.execute("""
-                    INSERT INTO coin_transactions 
-                    (user_id, amount, transaction_type, description)
-                    VALUES (?, ?, 'earn', ?)
-                """, (user_id, total_coin, f"데일리 체크인 (연속 {consecutive_days}일)"))
+                self._record_coins(cursor, user_id, total_coin, 'checkin',
+                                   f"데일리 체크인 (연속 {consecutive_days}일)", checkin_id)
                 
+                states = self._user_changed(cursor, user_id)
                 conn.commit()
+                self._notify_user_listeners(states)
                 return total_coin
                 
             except Exception as e:
@@ -250,8 +900,8 @@ class Database:
             finally:
                 conn.close()
     
-    def add_coins(self, user_id: int, amount: int):
-        """코인 추가"""
+    def add_coins(self, user_id: int, amount: int, reason: str = ""):
+        """코인 추가 (관리자 조정, 거래 기록 포함)"""
         with self.lock:
             conn = sqlite3.connect(self.db_path)
             cursor = conn.cursor()
@@ -263,7 +913,11 @@ class Database:
                         total_earned = total_earned + ?
                     WHERE user_id = ?
                 """, (amount, amount, user_id))
+                if cursor.rowcount:
+                    self._record_coins(cursor, user_id, amount, 'admin', reason or "관리자 조정")
+                states = self._user_changed(cursor, user_id)
                 conn.commit()
+                self._notify_user_listeners(states)
             except Exception as e:
                 conn.rollback()
                 raise e
@@ -282,6 +936,23 @@ class Database:
             
             return result[0] if result else 0
     
+    def get_checkin_user_ids(self, day: date) -> List[int]:
+        """날짜별 체크인 사용자 ID 조회 (정렬)"""
+        with self.lock:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                SELECT user_id FROM daily_checkins
+                WHERE checkin_date = ?
+                ORDER BY user_id
+            """, (day.isoformat(),))
+            
+            results = [row[0] for row in cursor.fetchall()]
+            conn.close()
+            
+            return results
+    
     def get_monthly_checkins(self, user_id: int, year: int, month: int) -> List[date]:
         """월별 체크인 기록 조회"""
         with self.lock:
@@ -299,8 +970,27 @@ class Database:
             
             return [datetime.strptime(row[0], '%Y-%m-%d').date() for row in results]
     
-    def get_active_raffles(self) -> List[Dict[str, Any]]:
-        """활성 래플 목록 조회"""
+    def get_monthly_checkin_days(self, user_id: int, year: int, month: int) -> List[int]:
+        """월별 체크인 일자(일) 조회 - (user_id, checkin_date) 인덱스 범위 검색"""
+        month_start = date(year, month, 1)
+        next_month = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+        
+        with self.lock:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                SELECT CAST(strftime('%d', checkin_date) AS INTEGER) FROM daily_checkins 
+                WHERE user_id = ? AND checkin_date >= ? AND checkin_date < ?
+            """, (user_id, month_start.isoformat(), next_month.isoformat()))
+            
+            results = cursor.fetchall()
+            conn.close()
+            
+            return [row[0] for row in results]
+    
+    def get_active_raffles(self) -> List[Dict[str, Any]]:
+        """활성 래플 목록 조회"""
         with self.lock:
             conn = sqlite3.connect(self.db_path)
             cursor = conn.cursor()
@@ -328,6 +1018,62 @@ class Database:
             
             return raffles
     
+    def get_raffle_page_starts(self, page_size: int) -> List[tuple]:
+        """활성 래플 페이지별 시작 커서 조회 (end_date, id)"""
+        with self.lock:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                SELECT end_date, id FROM (
+                    SELECT end_date, id, ROW_NUMBER() OVER (ORDER BY end_date, id) AS rn
+                    FROM raffles
+                    WHERE status = 'active' AND end_date > datetime('now')
+                )
+                WHERE (rn - 1) % ? = 0
+                ORDER BY end_date, id
+            """, (page_size,))
+            
+            results = cursor.fetchall()
+            conn.close()
+            
+            return results
+    
+    def get_raffle_page(self, start: tuple, limit: int) -> List[Dict[str, Any]]:
+        """활성 래플 한 페이지 조회 ((end_date, id) 커서부터)"""
+        with self.lock:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                SELECT id, name, description, prize, entry_cost, end_date, draw_commitment,
+                       max_entries, winners
+                FROM raffles
+                WHERE status = 'active' AND end_date > datetime('now')
+                  AND (end_date, id) >= (?, ?)
+                ORDER BY end_date, id
+                LIMIT ?
+            """, (start[0], start[1], limit))
+            
+            results = cursor.fetchall()
+            conn.close()
+            
+            raffles = []
+            for row in results:
+                raffles.append({
+                    'id': row[0],
+                    'name': row[1],
+                    'description': row[2],
+                    'prize': row[3],
+                    'entry_cost': row[4],
+                    'end_date': row[5],
+                    'draw_commitment': row[6],
+                    'max_entries': row[7],
+                    'winners': row[8]
+                })
+            
+            return raffles
+    
     def get_raffle(self, raffle_id: int) -> Optional[Dict[str, Any]]:
         """특정 래플 정보 조회"""
         with self.lock:
@@ -335,7 +1081,8 @@ class Database:
             cursor = conn.cursor()
             
             cursor.execute("""
-                SELECT id, name, description, prize, entry_cost, end_date, status
+                SELECT id, name, description, prize, entry_cost, end_date, status,
+                       max_entries, tickets_sold, winners
                 FROM raffles WHERE id = ?
             """, (raffle_id,))
             
@@ -350,7 +1097,10 @@ class Database:
                     'prize': result[3],
                     'entry_cost': result[4],
                     'end_date': result[5],
-                    'status': result[6]
+                    'status': result[6],
+                    'max_entries': result[7],
+                    'tickets_sold': result[8],
+                    'winners': result[9]
                 }
             return None
     
@@ -369,34 +1119,67 @@ class Database:
             conn.close()
             return result
     
-    def join_raffle(self, user_id: int, raffle_id: int, entry_cost: int):
-        """래플 참여"""
+    def join_raffle(self, user_id: int, raffle_id: int, entry_cost: int, tickets: int = 1) -> Dict[str, Any]:
+        """래플 참여 (티켓 `tickets` 장, 장당 entry_cost 코인)"""
+        if tickets < 1:
+            return {'success': False, 'error': '티켓 수가 올바르지 않습니다.'}
+        cost = entry_cost * tickets
         with self.lock:
             conn = sqlite3.connect(self.db_path)
             cursor = conn.cursor()
             
             try:
-                # 래플 참여 기록
+                # 판매 카운터를 조건부로 올려 max_entries 를 넘기지 않는다 (한 문장이라 원자적)
                 cursor.execute("""
-                    INSERT INTO raffle_entries (raffle_id, user_id, coins_spent)
-                    VALUES (?, ?, ?)
-                """, (raffle_id, user_id, entry_cost))
+                    UPDATE raffles SET tickets_sold = tickets_sold + ?
+                    WHERE id = ? AND status = 'active'
+                      AND (max_entries IS NULL OR tickets_sold + ? <= max_entries)
+                """, (tickets, raffle_id, tickets))
+                if cursor.rowcount == 0:
+                    conn.rollback()
+                    return {'success': False, 'error': '래플이 마감되었거나 남은 티켓이 부족합니다.'}
                 
-                # 코인 차감
+                # 코인 차감 (잔액이 부족하면 아무것도 바뀌지 않는다)
                 cursor.execute("""
-                    UPDATE users SET coins = coins - ?, raffle_entries = raffle_entries + 1
-                    WHERE user_id = ?
-                """, (entry_cost, user_id))
+                    UPDATE users SET coins = coins - ?, raffle_entries = raffle_entries + ?
+                    WHERE user_id = ? AND coins >= ?
+                """, (cost, tickets, user_id, cost))
+                if cursor.rowcount == 0:
+                    conn.rollback()
+                    return {'success': False, 'error': '코인이 부족합니다.'}
                 
-                # 코인 거래 기록
+                # 래플 참여 기록: 사용자당 한 행, 추가 구매는 티켓 수에 더한다
                 cursor.execute("""
-                    INSERT INTO coin_transactions 
-                    (user_id, amount, transaction_type, description)
-                    VALUES (?, ?, 'spend', ?)
-                """, (user_id, -entry_cost, f"래플 참여 (ID: {raffle_id})"))
+                    INSERT INTO raffle_entries (raffle_id, user_id, coins_spent, tickets)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT (raffle_id, user_id) DO UPDATE SET
+                        coins_spent = coins_spent + excluded.coins_spent,
+                        tickets = tickets + excluded.tickets
+                """, (raffle_id, user_id, cost, tickets))
+                
+                # 코인 거래 기록
+                self._record_coins(cursor, user_id, -cost, 'raffle', f"래플 참여 (ID: {raffle_id})", raffle_id)
                 
+                cursor.execute("SELECT tickets FROM raffle_entries WHERE raffle_id = ? AND user_id = ?",
+                               (raffle_id, user_id))
+                user_tickets = cursor.fetchone()[0]
+                cursor.execute("SELECT coins FROM users WHERE user_id = ?", (user_id,))
+                remaining_coins = cursor.fetchone()[0]
+                cursor.execute("SELECT tickets_sold FROM raffles WHERE id = ?", (raffle_id,))
+                tickets_sold = cursor.fetchone()[0]
+                
+                states = self._user_changed(cursor, user_id)
                 conn.commit()
+                self._notify_user_listeners(states)
                 
+                return {
+                    'success': True,
+                    'coins_spent': cost,
+                    'tickets': user_tickets,
+                    'tickets_sold': tickets_sold,
+                    'remaining_coins': remaining_coins
+                }
+            
             except Exception as e:
                 conn.rollback()
                 raise e
@@ -432,6 +1215,87 @@ class Database:
             
             return products
     
+    def get_shop_categories(self) -> List[Dict[str, Any]]:
+        """판매 중인 상품 카테고리 조회 (상품 수 포함)"""
+        with self.lock:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                SELECT category, COUNT(*) FROM products
+                WHERE is_active = 1 AND stock > 0 AND category IS NOT NULL
+                GROUP BY category
+                ORDER BY category
+            """)
+            
+            results = cursor.fetchall()
+            conn.close()
+            
+            return [{'category': row[0], 'count': row[1]} for row in results]
+    
+    def get_shop_page_starts(self, page_size: int, category: Optional[str] = None) -> List[tuple]:
+        """상점 페이지별 시작 커서 조회 (price, id / category None 이면 전체)"""
+        where = "is_active = 1 AND stock > 0"
+        params = []
+        if category is not None:
+            where += " AND category = ?"
+            params.append(category)
+        
+        with self.lock:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute(f"""
+                SELECT price, id FROM (
+                    SELECT price, id, ROW_NUMBER() OVER (ORDER BY price, id) AS rn
+                    FROM products
+                    WHERE {where}
+                )
+                WHERE (rn - 1) % ? = 0
+                ORDER BY price, id
+            """, (*params, page_size))
+            
+            results = cursor.fetchall()
+            conn.close()
+            
+            return results
+    
+    def get_shop_page(self, start: tuple, limit: int, category: Optional[str] = None) -> List[Dict[str, Any]]:
+        """판매 상품 한 페이지 조회 ((price, id) 커서부터)"""
+        where = "is_active = 1 AND stock > 0"
+        params = []
+        if category is not None:
+            where += " AND category = ?"
+            params.append(category)
+        
+        with self.lock:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute(f"""
+                SELECT id, name, description, price, stock, category
+                FROM products
+                WHERE {where} AND (price, id) >= (?, ?)
+                ORDER BY price, id
+                LIMIT ?
+            """, (*params, start[0], start[1], limit))
+            
+            results = cursor.fetchall()
+            conn.close()
+            
+            products = []
+            for row in results:
+                products.append({
+                    'id': row[0],
+                    'name': row[1],
+                    'description': row[2],
+                    'price': row[3],
+                    'stock': row[4],
+                    'category': row[5]
+                })
+            
+            return products
+    
     def get_product(self, product_id: int) -> Optional[Dict[str, Any]]:
         """특정 상품 정보 조회"""
         with self.lock:
@@ -503,17 +1367,16 @@ class Database:
                     UPDATE products SET stock = stock - 1
                     WHERE id = ?
                 """, (product_id,))
+                self._bump_version(cursor, 'catalog')
                 
                 # 코인 거래 기록
-                cursor.execute("""
-                    INSERT INTO coin_transactions 
-                    (user_id, amount, transaction_type, description)
-                    VALUES (?, ?, 'spend', ?)
-                """, (user_id, -price, f"상품 구매 (ID: {product_id})"))
+                self._record_coins(cursor, user_id, -price, 'shop', f"상품 구매 (ID: {product_id})", product_id)
                 
                 remaining_coins = user_coins[0] - price
                 
+                states = self._user_changed(cursor, user_id)
                 conn.commit()
+                self._notify_user_listeners(states)
                 return {'success': True, 'remaining_coins': remaining_coins}
                 
             except Exception as e:
@@ -564,8 +1427,22 @@ class Database:
                 UPDATE users SET referral_code = ? WHERE user_id = ?
             """, (referral_code, user_id))
             
+            states = self._user_changed(cursor, user_id)
             conn.commit()
             conn.close()
+            self._notify_user_listeners(states)
+    
+    def get_referral_codes(self) -> List[str]:
+        """발급된 추천 코드 전체 조회"""
+        with self.lock:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute("SELECT referral_code FROM users WHERE referral_code IS NOT NULL")
+            results = [row[0] for row in cursor.fetchall()]
+            conn.close()
+            
+            return results
     
     def process_referral(self, new_user_id: int, referral_code: str):
         """추천 처리"""
@@ -606,12 +1483,14 @@ class Database:
                     INSERT INTO referrals (referrer_id, referee_id, referral_code, bonus_coins)
                     VALUES (?, ?, ?, ?)
                 """, (referrer_id, new_user_id, referral_code, referral_bonus))
+                referral_id = cursor.lastrowid
                 
                 # 추천인에게 보너스 코인 지급
                 cursor.execute("""
                     UPDATE users SET 
                         coins = coins + ?,
-                        total_earned = total_earned + ?
+                        total_earned = total_earned + ?,
+                        referral_count = referral_count + 1
                     WHERE user_id = ?
                 """, (referral_bonus, referral_bonus, referrer_id))
                 
@@ -624,21 +1503,13 @@ class Database:
                     WHERE user_id = ?
                 """, (referral_bonus, referral_bonus, referrer_id, new_user_id))
                 
-                # 코인 거래 기록 (referrer)
-                cursor.execute("""
-                    INSERT INTO coin_transactions 
-                    (user_id, amount, transaction_type, description)
-                    VALUES (?, ?, 'earn', ?)
-                """, (referrer_id, referral_bonus, "Friend referral bonus"))
-                
-                # 코인 거래 기록 (new user)
-                cursor.execute("""
-                    INSERT INTO coin_transactions 
-                    (user_id, amount, transaction_type, description)
-                    VALUES (?, ?, 'earn', ?)
-                """, (new_user_id, referral_bonus, "Invitation code bonus"))
+                # 코인 거래 기록 (referrer, new user)
+                self._record_coins(cursor, referrer_id, referral_bonus, 'referral', "Friend referral bonus", referral_id)
+                self._record_coins(cursor, new_user_id, referral_bonus, 'referral', "Invitation code bonus", referral_id)
                 
+                states = self._user_changed(cursor, referrer_id, new_user_id)
                 conn.commit()
+                self._notify_user_listeners(states)
                 return True
                 
             except Exception as e:
@@ -714,196 +1585,842 @@ class Database:
                 'active_raffles': active_raffles
             }
     
-    def get_all_users(self) -> List[Dict[str, Any]]:
-        """모든 사용자 조회 (관리용)"""
+    def get_coin_flow(self, start: date, end: date) -> List[Dict[str, Any]]:
+        """일별·출처별 코인 유입/유출 (롤업만 읽는다, end 포함)"""
         with self.lock:
             conn = sqlite3.connect(self.db_path)
             cursor = conn.cursor()
             
             cursor.execute("""
-                SELECT user_id, username, full_name, coins, total_earned,
-                       joined_date, consecutive_checkins, total_checkins
-                FROM users
-                ORDER BY joined_date DESC
-            """)
-            
+                SELECT day, source, inflow, outflow, transactions
+                FROM coin_flow_daily
+                WHERE day >= ? AND day <= ?
+                ORDER BY day, source
+            """, (start.isoformat(), end.isoformat()))
             results = cursor.fetchall()
             conn.close()
             
-            users = []
-            for row in results:
-                users.append({
-                    'user_id': row[0],
-                    'username': row[1],
-                    'full_name': row[2],
-                    'coins': row[3],
-                    'total_earned': row[4],
-                    'joined_date': row[5],
-                    'consecutive_checkins': row[6],
-                    'total_checkins': row[7]
-                })
-            
-            return users
+            return [
+                {'day': row[0], 'source': row[1], 'inflow': row[2], 'outflow': row[3], 'transactions': row[4]}
+                for row in results
+            ]
     
-    def create_raffle(self, name: str, description: str, prize: str, entry_cost: int, end_date: str) -> int:
-        """래플 생성"""
+    def get_coin_net_since(self, day: date) -> int:
+        """`day` 이후 순 코인 발행량 조회"""
         with self.lock:
             conn = sqlite3.connect(self.db_path)
             cursor = conn.cursor()
             
             cursor.execute("""
-                INSERT INTO raffles (name, description, prize, entry_cost, end_date)
-                VALUES (?, ?, ?, ?, ?)
-            """, (name, description, prize, entry_cost, end_date))
-            
-            raffle_id = cursor.lastrowid
-            conn.commit()
+                SELECT COALESCE(SUM(inflow - outflow), 0) FROM coin_flow_daily WHERE day >= ?
+            """, (day.isoformat(),))
+            net = cursor.fetchone()[0]
             conn.close()
             
-            return raffle_id
+            return net
     
-    def create_product(self, name: str, description: str, price: int, stock: int, category: str) -> int:
-        """상품 생성"""
+    def get_user_summary(self) -> Dict[str, Any]:
+        """사용자 집계 통계 (한 번의 스캔)"""
         with self.lock:
             conn = sqlite3.connect(self.db_path)
             cursor = conn.cursor()
             
             cursor.execute("""
-                INSERT INTO products (name, description, price, stock, category)
-                VALUES (?, ?, ?, ?, ?)
-            """, (name, description, price, stock, category))
-            
-            product_id = cursor.lastrowid
-            conn.commit()
+                SELECT COUNT(*), AVG(coins), SUM(total_earned), AVG(consecutive_checkins),
+                       SUM(consecutive_checkins > 0), SUM(coins)
+                FROM users
+            """)
+            row = cursor.fetchone()
             conn.close()
             
-            return product_id
+            return {
+                'total_users': row[0],
+                'avg_coins': row[1] or 0.0,
+                'total_earned': row[2] or 0,
+                'avg_streak': row[3] or 0.0,
+                'active_users': row[4] or 0,
+                'total_coins': row[5] or 0
+            }
     
-    def get_all_raffles(self) -> List[Dict[str, Any]]:
-        """모든 래플 조회 (관리용)"""
+    def get_user_histogram(self, column: str, bins: int = 20) -> List[Dict[str, int]]:
+        """사용자 컬럼 히스토그램 (등간격, GROUP BY)"""
+        if column not in self.LEADERBOARD_COLUMNS.values():
+            raise ValueError(f"Unknown histogram column: {column}")
         with self.lock:
             conn = sqlite3.connect(self.db_path)
             cursor = conn.cursor()
             
-            cursor.execute("""
-                SELECT id, name, description, prize, entry_cost, 
-                       start_date, end_date, status, winner_id
-                FROM raffles
-                ORDER BY created_at DESC
-            """)
+            # (컬럼 DESC, user_id) 인덱스로 양 끝값만 읽는다
+            cursor.execute(f"SELECT MIN({column}), MAX({column}) FROM users WHERE {column} IS NOT NULL")
+            low, high = cursor.fetchone()
+            if low is None:
+                conn.close()
+                return []
             
+            width = max(1, -(-(high - low + 1) // bins))
+            cursor.execute(f"""
+                SELECT ({column} - ?) / ? AS bucket, COUNT(*)
+                FROM users
+                WHERE {column} IS NOT NULL
+                GROUP BY bucket
+                ORDER BY bucket
+            """, (low, width))
             results = cursor.fetchall()
             conn.close()
             
-            raffles = []
-            for row in results:
-                raffles.append({
-                    'id': row[0],
-                    'name': row[1],
-                    'description': row[2],
-                    'prize': row[3],
-                    'entry_cost': row[4],
-                    'start_date': row[5],
-                    'end_date': row[6],
-                    'status': row[7],
-                    'winner_id': row[8]
-                })
-            
-            return raffles
+            return [
+                {'start': low + bucket * width, 'end': low + (bucket + 1) * width - 1, 'users': count}
+                for bucket, count in results
+            ]
     
-    def get_all_products(self) -> List[Dict[str, Any]]:
-        """모든 상품 조회 (관리용)"""
+    def get_signup_growth(self) -> List[Dict[str, Any]]:
+        """가입일별 신규/누적 사용자 (윈도 함수)"""
         with self.lock:
             conn = sqlite3.connect(self.db_path)
             cursor = conn.cursor()
             
             cursor.execute("""
-                SELECT id, name, description, price, stock, category, is_active
-                FROM products
-                WHERE is_active = 1
-                ORDER BY created_at DESC
+                SELECT day, signups, SUM(signups) OVER (ORDER BY day)
+                FROM (
+                    SELECT DATE(joined_date) AS day, COUNT(*) AS signups
+                    FROM users
+                    GROUP BY day
+                )
+                ORDER BY day
             """)
-            
             results = cursor.fetchall()
             conn.close()
             
-            products = []
-            for row in results:
-                products.append({
-                    'id': row[0],
-                    'name': row[1],
-                    'description': row[2],
-                    'price': row[3],
-                    'stock': row[4],
-                    'category': row[5],
-                    'is_active': row[6]
-                })
-            
-            return products
+            return [{'date': row[0], 'signups': row[1], 'cumulative': row[2]} for row in results]
     
-    def get_raffle_entries(self, raffle_id: int) -> List[int]:
-        """Get all user IDs who entered a specific raffle"""
+    # 내보내기 가능한 테이블 -> 기간 필터 컬럼
+    EXPORT_TABLES = {
+        'users': 'joined_date',
+        'coin_transactions': 'created_at',
+        'daily_checkins': 'checkin_date',
+        'purchases': 'purchase_date',
+        'raffle_entries': 'entry_date'
+    }
+    
+    def get_export_schema(self, table: str) -> List[tuple]:
+        """내보내기 테이블 컬럼 조회 (컬럼명, 타입)"""
+        if table not in self.EXPORT_TABLES:
+            raise ValueError(f"Unknown export table: {table}")
         with self.lock:
             conn = sqlite3.connect(self.db_path)
             cursor = conn.cursor()
             
-            cursor.execute("""
-                SELECT DISTINCT user_id FROM raffle_entries 
-                WHERE raffle_id = ?
-            """, (raffle_id,))
-            
+            cursor.execute(f"PRAGMA table_info({table})")
             results = cursor.fetchall()
             conn.close()
             
-            return [row[0] for row in results]
+            return [(row[1], row[2].upper()) for row in results]
     
-    def set_raffle_winner(self, raffle_id: int, winner_id: int):
-        """Set winner for a raffle and mark as completed"""
+    def get_export_chunk(self, table: str, after_id: int = 0, limit: int = 5000,
+                         start: Optional[str] = None, end: Optional[str] = None) -> List[tuple]:
+        """내보내기 테이블 다음 행 조회 (id 키셋, [start, end) 기간 선택)"""
+        if table not in self.EXPORT_TABLES:
+            raise ValueError(f"Unknown export table: {table}")
+        date_column = self.EXPORT_TABLES[table]
+        conditions, params = ["id > ?"], [after_id]
+        if start is not None:
+            conditions.append(f"{date_column} >= ?")
+            params.append(start)
+        if end is not None:
+            conditions.append(f"{date_column} < ?")
+            params.append(end)
         with self.lock:
             conn = sqlite3.connect(self.db_path)
             cursor = conn.cursor()
             
-            cursor.execute("""
-                UPDATE raffles 
-                SET winner_id = ?, status = 'completed'
-                WHERE id = ?
-            """, (winner_id, raffle_id))
-            
-            conn.commit()
+            # 청크마다 짧게 잠그므로 긴 내보내기 중에도 봇 쓰기가 막히지 않는다
+            cursor.execute(f"""
+                SELECT * FROM {table}
+                WHERE {' AND '.join(conditions)}
+                ORDER BY id
+                LIMIT ?
+            """, params + [limit])
+            results = cursor.fetchall()
             conn.close()
+            
+            return results
     
-    def stop_raffle_by_id(self, raffle_id: int):
-        """Stop a raffle by setting status to stopped"""
+    # 기간 롤업 -> 기간 시작일 (SQLite 날짜 수식; 주는 월요일 시작)
+    ENGAGEMENT_PERIODS = {
+        'week': "date({day}, 'weekday 0', '-6 days')",
+        'month': "date({day}, 'start of month')"
+    }
+    
+    def refresh_engagement_rollups(self) -> Dict[str, int]:
+        """참여 지표 롤업 증분 갱신"""
+        week_of = self.ENGAGEMENT_PERIODS['week']
         with self.lock:
             conn = sqlite3.connect(self.db_path)
             cursor = conn.cursor()
             
-            cursor.execute("""
-                UPDATE raffles 
-                SET status = 'stopped'
-                WHERE id = ?
-            """, (raffle_id,))
-            
-            conn.commit()
-            conn.close()
+            try:
+                cursor.execute("SELECT name, last_id FROM rollup_watermarks")
+                marks = dict(cursor.fetchall())
+                cursor.execute("SELECT COALESCE(MAX(id), 0) FROM users")
+                max_user = cursor.fetchone()[0]
+                cursor.execute("SELECT COALESCE(MAX(id), 0) FROM daily_checkins")
+                max_checkin = cursor.fetchone()[0]
+                users_range = (marks.get('users', 0), max_user)
+                checkins_range = (marks.get('daily_checkins', 0), max_checkin)
+                
+                # 신규 가입: 일별 가입 수, 가입 주 코호트 크기
+                cursor.execute("""
+                    INSERT INTO engagement_daily (day, new_users)
+                    SELECT DATE(joined_date), COUNT(*) FROM users
+                    WHERE id > ? AND id <= ?
+                    GROUP BY 1
+                    ON CONFLICT(day) DO UPDATE SET new_users = new_users + excluded.new_users
+                """, users_range)
+                cursor.execute(f"""
+                    INSERT INTO cohort_sizes (cohort_week, users)
+                    SELECT {week_of.format(day='joined_date')}, COUNT(*) FROM users
+                    WHERE id > ? AND id <= ?
+                    GROUP BY 1
+                    ON CONFLICT(cohort_week) DO UPDATE SET users = users + excluded.users
+                """, users_range)
+                
+                # 체크인은 사용자·날짜당 1건이라 일별 활성 사용자는 그대로 더한다
+                cursor.execute("""
+                    INSERT INTO engagement_daily (day, active_users)
+                    SELECT checkin_date, COUNT(*) FROM daily_checkins
+                    WHERE id > ? AND id <= ?
+                    GROUP BY checkin_date
+                    ON CONFLICT(day) DO UPDATE SET active_users = active_users + excluded.active_users
+                """, checkins_range)
+                
+                # 주/월 활성 사용자: 그 기간의 첫 체크인만 센다 ((user_id, checkin_date) 인덱스)
+                for period, start_of in self.ENGAGEMENT_PERIODS.items():
+                    start = start_of.format(day='c.checkin_date')
+                    cursor.execute(f"""
+                        INSERT INTO engagement_periods (period, start_day, active_users)
+                        SELECT ?, {start}, COUNT(*) FROM daily_checkins c
+                        WHERE c.id > ? AND c.id <= ?
+                          AND NOT EXISTS (
+                              SELECT 1 FROM daily_checkins p
+                              WHERE p.user_id = c.user_id
+                                AND p.checkin_date >= {start} AND p.checkin_date < c.checkin_date
+                          )
+                        GROUP BY 2
+                        ON CONFLICT(period, start_day) DO UPDATE
+                        SET active_users = active_users + excluded.active_users
+                    """, (period,) + checkins_range)
+                
+                # 가입 주 코호트별 N주차 활성 사용자
+                start = week_of.format(day='c.checkin_date')
+                cohort = week_of.format(day='u.joined_date')
+                cursor.execute(f"""
+                    INSERT INTO cohort_activity (cohort_week, week_number, active_users)
+                    SELECT {cohort}, CAST((julianday({start}) - julianday({cohort})) / 7 AS INTEGER), COUNT(*)
+                    FROM daily_checkins c
+                    JOIN users u ON u.user_id = c.user_id
+                    WHERE c.id > ? AND c.id <= ?
+                      AND {start} >= {cohort}
+                      AND NOT EXISTS (
+                          SELECT 1 FROM daily_checkins p
+                          WHERE p.user_id = c.user_id
+                            AND p.checkin_date >= {start} AND p.checkin_date < c.checkin_date
+                      )
+                    GROUP BY 1, 2
+                    ON CONFLICT(cohort_week, week_number) DO UPDATE
+                    SET active_users = active_users + excluded.active_users
+                """, checkins_range)
+                
+                cursor.executemany("""
+                    INSERT INTO rollup_watermarks (name, last_id) VALUES (?, ?)
+                    ON CONFLICT(name) DO UPDATE SET last_id = excluded.last_id
+                """, [('users', max_user), ('daily_checkins', max_checkin)])
+                conn.commit()
+                
+                return {'users': max_user - users_range[0], 'checkins': max_checkin - checkins_range[0]}
+            except Exception as e:
+                conn.rollback()
+                raise e
+            finally:
+                conn.close()
     
-    def delete_product(self, product_id: int):
-        """Delete a product by setting is_active to False"""
+    def get_engagement_daily(self, since: date) -> List[tuple]:
+        """일별 활성/신규 사용자 조회 (롤업)"""
         with self.lock:
             conn = sqlite3.connect(self.db_path)
             cursor = conn.cursor()
             
             cursor.execute("""
-                UPDATE products 
-                SET is_active = 0
-                WHERE id = ?
-            """, (product_id,))
-            
-            conn.commit()
+                SELECT day, active_users, new_users FROM engagement_daily
+                WHERE day >= ? ORDER BY day
+            """, (since.isoformat(),))
+            results = cursor.fetchall()
             conn.close()
+            
+            return results
     
-    def update_product(self, product_id: int, name: str, description: str, price: int, stock: int, category: str):
-        """Update product information"""
+    def get_engagement_periods(self, period: str, since: date) -> List[tuple]:
+        """주/월별 활성 사용자 조회 (롤업)"""
+        with self.lock:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                SELECT start_day, active_users FROM engagement_periods
+                WHERE period = ? AND start_day >= ? ORDER BY start_day
+            """, (period, since.isoformat()))
+            results = cursor.fetchall()
+            conn.close()
+            
+            return results
+    
+    def get_cohorts(self, since_week: date) -> tuple:
+        """주간 가입 코호트 크기 및 주차별 활동 조회"""
+        with self.lock:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                SELECT cohort_week, users FROM cohort_sizes
+                WHERE cohort_week >= ? ORDER BY cohort_week
+            """, (since_week.isoformat(),))
+            sizes = cursor.fetchall()
+            cursor.execute("""
+                SELECT cohort_week, week_number, active_users FROM cohort_activity
+                WHERE cohort_week >= ?
+            """, (since_week.isoformat(),))
+            activity = cursor.fetchall()
+            conn.close()
+            
+            return sizes, activity
+    
+    def get_all_users(self) -> List[Dict[str, Any]]:
+        """모든 사용자 조회 (관리용)"""
+        with self.lock:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                SELECT user_id, username, full_name, coins, total_earned,
+                       joined_date, consecutive_checkins, total_checkins
+                FROM users
+                ORDER BY joined_date DESC
+            """)
+            
+            results = cursor.fetchall()
+            conn.close()
+            
+            users = []
+            for row in results:
+                users.append({
+                    'user_id': row[0],
+                    'username': row[1],
+                    'full_name': row[2],
+                    'coins': row[3],
+                    'total_earned': row[4],
+                    'joined_date': row[5],
+                    'consecutive_checkins': row[6],
+                    'total_checkins': row[7]
+                })
+            
+            return users
+    
+    # 관리자 사용자 목록 정렬 컬럼 (모두 (컬럼 DESC, user_id) 인덱스가 있음)
+    USER_SORT_COLUMNS = ('joined_date', 'coins', 'total_earned', 'consecutive_checkins')
+    
+    def _user_search_filter(self, search: str) -> tuple:
+        """사용자 검색 WHERE 절 (이름/사용자명, 숫자면 user_id)"""
+        search = search.strip()
+        if not search:
+            return "", ()
+        if len(search) >= 3:
+            # trigram 은 3글자 이상부터 색인을 쓴다
+            phrase = '"' + search.replace('"', '""') + '"'
+            clause = "id IN (SELECT rowid FROM users_fts WHERE users_fts MATCH ?)"
+            params = (phrase,)
+        else:
+            pattern = '%' + search.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+            clause = "(full_name LIKE ? ESCAPE '\\' OR username LIKE ? ESCAPE '\\')"
+            params = (pattern, pattern)
+        if search.isdigit():
+            clause = f"({clause} OR user_id = ?)"
+            params += (int(search),)
+        return "WHERE " + clause, params
+    
+    def get_users_page(self, search: str = "", sort: str = 'joined_date', descending: bool = True,
+                       limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
+        """사용자 목록 한 페이지 조회 (관리용, 검색/정렬)"""
+        if sort not in self.USER_SORT_COLUMNS:
+            raise ValueError(f"Unknown sort column: {sort}")
+        where, params = self._user_search_filter(search)
+        # 인덱스 (컬럼 DESC, user_id) 를 정방향/역방향으로 그대로 탄다
+        order = f"{sort} DESC, user_id" if descending else f"{sort}, user_id DESC"
+        with self.lock:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute(f"""
+                SELECT user_id, username, full_name, coins, total_earned,
+                       joined_date, consecutive_checkins, total_checkins
+                FROM users
+                {where}
+                ORDER BY {order}
+                LIMIT ? OFFSET ?
+            """, params + (limit, offset))
+            
+            results = cursor.fetchall()
+            conn.close()
+            
+            return [
+                {
+                    'user_id': row[0],
+                    'username': row[1],
+                    'full_name': row[2],
+                    'coins': row[3],
+                    'total_earned': row[4],
+                    'joined_date': row[5],
+                    'consecutive_checkins': row[6],
+                    'total_checkins': row[7]
+                }
+                for row in results
+            ]
+    
+    def count_users(self, search: str = "") -> int:
+        """검색 조건에 맞는 사용자 수 (관리용)"""
+        where, params = self._user_search_filter(search)
+        with self.lock:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute(f"SELECT COUNT(*) FROM users {where}", params)
+            count = cursor.fetchone()[0]
+            conn.close()
+            
+            return count
+    
+    def create_raffle(self, name: str, description: str, prize: str, entry_cost: int, end_date: str,
+                      max_entries: Optional[int] = None, winners: int = 1) -> int:
+        """래플 생성 (max_entries: 판매 티켓 상한, None 이면 무제한 / winners: 당첨자 수)"""
+        with self.lock:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            # 추첨 시드는 지금 정하고 해시만 공개한다
+            seed = raffle_draw.new_seed()
+            cursor.execute("""
+                INSERT INTO raffles (name, description, prize, entry_cost, end_date, max_entries, winners,
+                                     draw_seed, draw_commitment)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (name, description, prize, entry_cost, end_date, max_entries, winners,
+                  seed, raffle_draw.commitment(seed)))
+            
+            raffle_id = cursor.lastrowid
+            self._bump_version(cursor, 'catalog', 'raffles')
+            conn.commit()
+            conn.close()
+            
+            return raffle_id
+    
+    def create_product(self, name: str, description: str, price: int, stock: int, category: str) -> int:
+        """상품 생성"""
+        with self.lock:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                INSERT INTO products (name, description, price, stock, category)
+                VALUES (?, ?, ?, ?, ?)
+            """, (name, description, price, stock, category))
+            
+            product_id = cursor.lastrowid
+            self._bump_version(cursor, 'catalog')
+            conn.commit()
+            conn.close()
+            
+            return product_id
+    
+    def get_all_raffles(self) -> List[Dict[str, Any]]:
+        """모든 래플 조회 (관리용)"""
+        with self.lock:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                SELECT id, name, description, prize, entry_cost, 
+                       start_date, end_date, status, winner_id
+                FROM raffles
+                ORDER BY created_at DESC
+            """)
+            
+            results = cursor.fetchall()
+            conn.close()
+            
+            raffles = []
+            for row in results:
+                raffles.append({
+                    'id': row[0],
+                    'name': row[1],
+                    'description': row[2],
+                    'prize': row[3],
+                    'entry_cost': row[4],
+                    'start_date': row[5],
+                    'end_date': row[6],
+                    'status': row[7],
+                    'winner_id': row[8]
+                })
+            
+            return raffles
+    
+    def get_all_products(self) -> List[Dict[str, Any]]:
+        """모든 상품 조회 (관리용)"""
+        with self.lock:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                SELECT id, name, description, price, stock, category, is_active
+                FROM products
+                WHERE is_active = 1
+                ORDER BY created_at DESC
+            """)
+            
+            results = cursor.fetchall()
+            conn.close()
+            
+            products = []
+            for row in results:
+                products.append({
+                    'id': row[0],
+                    'name': row[1],
+                    'description': row[2],
+                    'price': row[3],
+                    'stock': row[4],
+                    'category': row[5],
+                    'is_active': row[6]
+                })
+            
+            return products
+    
+    def get_raffles_page(self, status: Optional[str] = None, limit: int = 20,
+                         offset: int = 0) -> List[Dict[str, Any]]:
+        """래플 목록 조회 (관리용, 당첨자/참여 수/수집 코인 포함)"""
+        where, params = ("WHERE r.status = ?", (status,)) if status else ("", ())
+        with self.lock:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            # 참여 집계는 스칼라 서브쿼리라 LIMIT 뒤 페이지의 래플만 계산된다
+            cursor.execute(f"""
+                SELECT r.id, r.name, r.description, r.prize, r.entry_cost,
+                       r.start_date, r.end_date, r.status, r.winner_id,
+                       u.full_name, u.username,
+                       (SELECT COUNT(*) FROM raffle_entries e WHERE e.raffle_id = r.id),
+                       (SELECT COALESCE(SUM(e.coins_spent), 0) FROM raffle_entries e WHERE e.raffle_id = r.id),
+                       r.draw_commitment,
+                       CASE WHEN r.draw_entries IS NOT NULL THEN r.draw_seed END,
+                       r.draw_entries, r.draw_index,
+                       r.tickets_sold, r.max_entries, r.winners,
+                       (SELECT COUNT(*) FROM raffle_winners w WHERE w.raffle_id = r.id)
+                FROM raffles r
+                LEFT JOIN users u ON u.user_id = r.winner_id
+                {where}
+                ORDER BY r.id DESC
+                LIMIT ? OFFSET ?
+            """, params + (limit, offset))
+            
+            results = cursor.fetchall()
+            conn.close()
+            
+            return [
+                {
+                    'id': row[0],
+                    'name': row[1],
+                    'description': row[2],
+                    'prize': row[3],
+                    'entry_cost': row[4],
+                    'start_date': row[5],
+                    'end_date': row[6],
+                    'status': row[7],
+                    'winner_id': row[8],
+                    'winner_name': row[9],
+                    'winner_username': row[10],
+                    'entries': row[11],
+                    'coins_collected': row[12],
+                    'draw_commitment': row[13],
+                    'draw_seed': row[14],
+                    'draw_entries': row[15],
+                    'draw_index': row[16],
+                    'tickets_sold': row[17],
+                    'max_entries': row[18],
+                    'winners': row[19],
+                    'winners_drawn': row[20]
+                }
+                for row in results
+            ]
+    
+    def count_raffles(self, status: Optional[str] = None) -> int:
+        """래플 수 조회 (상태 선택)"""
+        with self.lock:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            if status:
+                cursor.execute("SELECT COUNT(*) FROM raffles WHERE status = ?", (status,))
+            else:
+                cursor.execute("SELECT COUNT(*) FROM raffles")
+            count = cursor.fetchone()[0]
+            conn.close()
+            
+            return count
+    
+    def get_raffle_entries_page(self, raffle_id: int, limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
+        """래플 참여 목록 조회 (참여 순, 사용자 이름 포함)"""
+        with self.lock:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                SELECT e.id, e.user_id, u.full_name, u.username, e.entry_date, e.coins_spent,
+                       e.tickets, w.place
+                FROM raffle_entries e
+                LEFT JOIN users u ON u.user_id = e.user_id
+                LEFT JOIN raffle_winners w ON w.raffle_id = e.raffle_id AND w.user_id = e.user_id
+                WHERE e.raffle_id = ?
+                ORDER BY e.id
+                LIMIT ? OFFSET ?
+            """, (raffle_id, limit, offset))
+            
+            results = cursor.fetchall()
+            conn.close()
+            
+            return [
+                {
+                    'entry_id': row[0],
+                    'user_id': row[1],
+                    'full_name': row[2],
+                    'username': row[3],
+                    'entry_date': row[4],
+                    'coins_spent': row[5],
+                    'tickets': row[6],
+                    'place': row[7]
+                }
+                for row in results
+            ]
+    
+    def get_raffle_deadlines(self) -> List[tuple]:
+        """활성 래플 마감 시각 조회 (end_date, raffle_id)"""
+        with self.lock:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                SELECT end_date, id FROM raffles
+                WHERE status = 'active'
+                ORDER BY end_date
+            """)
+            
+            results = cursor.fetchall()
+            conn.close()
+            
+            return results
+    
+    def close_and_draw_raffle(self, raffle_id: int) -> Optional[Dict[str, Any]]:
+        """래플 마감 및 당첨자 추첨 (한 트랜잭션)
+        
+        티켓 번호는 참여 순서대로 매긴다 (raffle_draw 참고). 당첨자가 한 명이면
+        OFFSET (모두 1장일 때) 또는 누적합 쿼리 한 번으로 찾아 참여 목록을
+        메모리에 올리지 않고, 여러 명이면 티켓 수로 만든 Fenwick 트리에서
+        비복원 추첨한다 (O(N + K log N)). 시드, 총 티켓 수, 1등 티켓과 순위를
+        결과와 함께 저장한다. 이미 마감된 래플이면 None (예: 관리자가 먼저 추첨).
+        """
+        with self.lock:
+            conn = sqlite3.connect(self.db_path, isolation_level=None)
+            cursor = conn.cursor()
+            
+            try:
+                cursor.execute("BEGIN IMMEDIATE")
+                
+                cursor.execute("""
+                    SELECT id, name, prize, draw_seed, draw_commitment, winners FROM raffles
+                    WHERE id = ? AND status = 'active'
+                """, (raffle_id,))
+                
+                raffle = cursor.fetchone()
+                if not raffle:
+                    cursor.execute("ROLLBACK")
+                    return None
+                
+                seed, published = raffle[3], raffle[4]
+                if seed is None:
+                    # 시드 없이 만들어진 래플: 지금 정한다 (사전 공개는 없음)
+                    seed = raffle_draw.new_seed()
+                    published = raffle_draw.commitment(seed)
+                
+                cursor.execute("""
+                    SELECT COUNT(*), COALESCE(SUM(tickets), 0) FROM raffle_entries WHERE raffle_id = ?
+                """, (raffle_id,))
+                entries, tickets = cursor.fetchone()
+                
+                winners = []
+                if tickets and raffle[5] <= 1 and tickets == entries:
+                    # 모두 한 장씩이면 티켓 번호 = 참여 순번: 인덱스 OFFSET 한 번
+                    ticket = raffle_draw.winner_index(seed, raffle_id, tickets)
+                    cursor.execute("""
+                        SELECT user_id FROM raffle_entries
+                        WHERE raffle_id = ?
+                        ORDER BY id
+                        LIMIT 1 OFFSET ?
+                    """, (raffle_id, ticket))
+                    winners.append((cursor.fetchone()[0], ticket))
+                elif tickets and raffle[5] <= 1:
+                    ticket = raffle_draw.winner_index(seed, raffle_id, tickets)
+                    # 참여 순서 누적 티켓 수가 ticket 을 처음 넘는 참여
+                    cursor.execute("""
+                        SELECT user_id FROM (
+                            SELECT id, user_id, SUM(tickets) OVER (ORDER BY id) AS through
+                            FROM raffle_entries
+                            WHERE raffle_id = ?
+                        )
+                        WHERE through > ?
+                        ORDER BY id
+                        LIMIT 1
+                    """, (raffle_id, ticket))
+                    winners.append((cursor.fetchone()[0], ticket))
+                elif tickets:
+                    cursor.execute("""
+                        SELECT user_id, tickets FROM raffle_entries
+                        WHERE raffle_id = ?
+                        ORDER BY id
+                    """, (raffle_id,))
+                    user_ids, counts = raffle_draw.entry_arrays(cursor, entries)
+                    winners = [(int(user_ids[entry]), ticket)
+                               for entry, ticket in raffle_draw.draw_winners(seed, raffle_id, counts, raffle[5])]
+                
+                winner_id = winners[0][0] if winners else None
+                cursor.execute("""
+                    UPDATE raffles
+                    SET winner_id = ?, status = 'completed',
+                        draw_seed = ?, draw_commitment = ?, draw_entries = ?, draw_index = ?
+                    WHERE id = ?
+                """, (winner_id, seed, published, tickets, winners[0][1] if winners else None, raffle_id))
+                
+                states = []
+                if winners:
+                    cursor.executemany("""
+                        INSERT INTO raffle_winners (raffle_id, place, user_id, ticket)
+                        VALUES (?, ?, ?, ?)
+                    """, [(raffle_id, place, user_id, ticket)
+                          for place, (user_id, ticket) in enumerate(winners, 1)])
+                    cursor.executemany("""
+                        UPDATE users SET raffle_wins = raffle_wins + 1
+                        WHERE user_id = ?
+                    """, [(user_id,) for user_id, _ in winners])
+                    states = self._user_changed(cursor, *[user_id for user_id, _ in winners])
+                
+                self._bump_version(cursor, 'catalog', 'raffles')
+                cursor.execute("COMMIT")
+                self._notify_user_listeners(states)
+                
+                return {
+                    'id': raffle[0],
+                    'name': raffle[1],
+                    'prize': raffle[2],
+                    'winner_id': winner_id,
+                    'winners': [{'place': place, 'user_id': user_id, 'ticket': ticket}
+                                for place, (user_id, ticket) in enumerate(winners, 1)],
+                    'draw_seed': seed,
+                    'draw_commitment': published,
+                    'draw_entries': tickets,
+                    'draw_index': winners[0][1] if winners else None
+                }
+                
+            except Exception as e:
+                cursor.execute("ROLLBACK")
+                raise e
+            finally:
+                conn.close()
+    
+    def get_raffle_winners(self, raffle_id: int) -> List[Dict[str, Any]]:
+        """래플 당첨자 조회 (순위별)"""
+        with self.lock:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                SELECT w.place, w.user_id, u.full_name, u.username, w.ticket
+                FROM raffle_winners w
+                LEFT JOIN users u ON u.user_id = w.user_id
+                WHERE w.raffle_id = ?
+                ORDER BY w.place
+            """, (raffle_id,))
+            
+            results = cursor.fetchall()
+            conn.close()
+            
+            return [
+                {
+                    'place': row[0],
+                    'user_id': row[1],
+                    'full_name': row[2],
+                    'username': row[3],
+                    'ticket': row[4]
+                }
+                for row in results
+            ]
+    
+    def get_raffle_participant_chats(self, raffle_id: int, after_user_id: int = 0, limit: int = 500) -> List[tuple]:
+        """래플 참여자 채팅 조회 (user_id 키셋 페이지)"""
+        with self.lock:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                SELECT u.user_id, u.chat_id
+                FROM raffle_entries e
+                JOIN users u ON u.user_id = e.user_id
+                WHERE e.raffle_id = ? AND u.user_id > ? AND u.chat_id IS NOT NULL
+                ORDER BY u.user_id
+                LIMIT ?
+            """, (raffle_id, after_user_id, limit))
+            
+            results = cursor.fetchall()
+            conn.close()
+            
+            return results
+    
+    def stop_raffle_by_id(self, raffle_id: int):
+        """Stop a raffle by setting status to stopped"""
+        with self.lock:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                UPDATE raffles 
+                SET status = 'stopped'
+                WHERE id = ?
+            """, (raffle_id,))
+            self._bump_version(cursor, 'catalog', 'raffles')
+            
+            conn.commit()
+            conn.close()
+    
+    def delete_product(self, product_id: int):
+        """Delete a product by setting is_active to False"""
+        with self.lock:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                UPDATE products 
+                SET is_active = 0
+                WHERE id = ?
+            """, (product_id,))
+            self._bump_version(cursor, 'catalog')
+            
+            conn.commit()
+            conn.close()
+    
+    def update_product(self, product_id: int, name: str, description: str, price: int, stock: int, category: str):
+        """Update product information"""
         with self.lock:
             conn = sqlite3.connect(self.db_path)
             cursor = conn.cursor()
@@ -913,6 +2430,7 @@ class Database:
                 SET name = ?, description = ?, price = ?, stock = ?, category = ?
                 WHERE id = ?
             """, (name, description, price, stock, category, product_id))
+            self._bump_version(cursor, 'catalog')
             
             conn.commit()
             conn.close()
@@ -923,11 +2441,13 @@ class Database:
             conn = sqlite3.connect(self.db_path)
             cursor = conn.cursor()
             
-            # First delete all raffle entries
+            # First delete all raffle entries and winners
             cursor.execute("DELETE FROM raffle_entries WHERE raffle_id = ?", (raffle_id,))
+            cursor.execute("DELETE FROM raffle_winners WHERE raffle_id = ?", (raffle_id,))
             
             # Then delete the raffle itself
             cursor.execute("DELETE FROM raffles WHERE id = ?", (raffle_id,))
+            self._bump_version(cursor, 'catalog', 'raffles')
             
             conn.commit()
             conn.close()
@@ -947,13 +2467,22 @@ class Database:
                 )
             """)
             
-            # Save each setting
+            # Save each setting (unchanged values are left alone so the
+            # settings version only moves on a real change)
+            changes_before = conn.total_changes
             for key, value in settings.items():
                 cursor.execute("""
-                    INSERT OR REPLACE INTO settings (key, value, updated_at)
+                    INSERT INTO settings (key, value, updated_at)
                     VALUES (?, ?, CURRENT_TIMESTAMP)
+                    ON CONFLICT(key) DO UPDATE SET
+                        value = excluded.value,
+                        updated_at = excluded.updated_at
+                    WHERE settings.value != excluded.value
                 """, (key, str(value)))
             
+            if conn.total_changes != changes_before:
+                self._bump_version(cursor, 'settings')
+            
             conn.commit()
             conn.close()
     
@@ -985,6 +2514,12 @@ class Database:
                 'welcome_bonus': 1,
                 'auto_raffle_draw': False,
                 'send_daily_reminder': True,
+                'reminder_hour': 18,
+                'reminder_window_minutes': 60,
+                'rate_limit_enabled': True,
+                'user_rate_per_minute': 30,
+                'user_burst': 10,
+                'global_rate_per_second': 30,
                 'maintenance_mode': False,
                 'debug_mode': False,
                 'notify_new_user': True,
@@ -1006,3 +2541,357 @@ class Database:
                         settings[key] = value
             
             return settings
+    
+    def create_broadcast(self, message: str) -> int:
+        """브로드캐스트 생성 (대기열 등록)"""
+        with self.lock:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute("SELECT COUNT(*) FROM users WHERE chat_id IS NOT NULL")
+            total = cursor.fetchone()[0]
+            
+            cursor.execute("""
+                INSERT INTO broadcasts (message, total_recipients)
+                VALUES (?, ?)
+            """, (message, total))
+            
+            broadcast_id = cursor.lastrowid
+            conn.commit()
+            conn.close()
+            
+            return broadcast_id
+    
+    def get_broadcasts(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """최근 브로드캐스트 조회 (진행률, 소요 시간)"""
+        with self.lock:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                SELECT id, message, status, total_recipients, sent_count, failed_count,
+                       created_at, started_at, finished_at,
+                       (julianday(COALESCE(finished_at, updated_at)) - julianday(started_at)) * 86400
+                FROM broadcasts
+                ORDER BY id DESC
+                LIMIT ?
+            """, (limit,))
+            
+            results = cursor.fetchall()
+            conn.close()
+            
+            broadcasts = []
+            for row in results:
+                broadcasts.append({
+                    'id': row[0],
+                    'message': row[1],
+                    'status': row[2],
+                    'total_recipients': row[3],
+                    'sent_count': row[4],
+                    'failed_count': row[5],
+                    'created_at': row[6],
+                    'started_at': row[7],
+                    'finished_at': row[8],
+                    'elapsed_seconds': row[9] or 0.0
+                })
+            
+            return broadcasts
+    
+    def get_next_broadcast(self) -> Optional[Dict[str, Any]]:
+        """다음 처리할 브로드캐스트 조회 (대기 중 또는 중단된 것)"""
+        with self.lock:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                SELECT id, message, status FROM broadcasts
+                WHERE status IN ('queued', 'running')
+                ORDER BY id ASC
+                LIMIT 1
+            """)
+            
+            result = cursor.fetchone()
+            conn.close()
+            
+            if result:
+                return {'id': result[0], 'message': result[1], 'status': result[2]}
+            return None
+    
+    def get_broadcast_status(self, broadcast_id: int) -> Optional[str]:
+        """브로드캐스트 상태 조회"""
+        with self.lock:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute("SELECT status FROM broadcasts WHERE id = ?", (broadcast_id,))
+            result = cursor.fetchone()
+            conn.close()
+            
+            return result[0] if result else None
+    
+    def set_broadcast_status(self, broadcast_id: int, status: str):
+        """브로드캐스트 상태 변경"""
+        with self.lock:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            if status == 'running':
+                cursor.execute("""
+                    UPDATE broadcasts
+                    SET status = 'running',
+                        started_at = COALESCE(started_at, CURRENT_TIMESTAMP),
+                        updated_at = CURRENT_TIMESTAMP
+                    WHERE id = ? AND status IN ('queued', 'running')
+                """, (broadcast_id,))
+            else:
+                cursor.execute("""
+                    UPDATE broadcasts
+                    SET status = ?, updated_at = CURRENT_TIMESTAMP, finished_at = CURRENT_TIMESTAMP
+                    WHERE id = ? AND status IN ('queued', 'running')
+                """, (status, broadcast_id))
+            
+            conn.commit()
+            conn.close()
+    
+    def enqueue_broadcast_batch(self, broadcast_id: int, batch_size: int = 100) -> int:
+        """브로드캐스트 수신자 다음 배치 추가 (추가된 행 수 반환)"""
+        with self.lock:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            try:
+                cursor.execute("SELECT cursor_user_id FROM broadcasts WHERE id = ?", (broadcast_id,))
+                row = cursor.fetchone()
+                if not row:
+                    return 0
+                
+                cursor.execute("""
+                    SELECT user_id, chat_id FROM users
+                    WHERE user_id > ? AND chat_id IS NOT NULL
+                    ORDER BY user_id
+                    LIMIT ?
+                """, (row[0], batch_size))
+                
+                recipients = cursor.fetchall()
+                if not recipients:
+                    return 0
+                
+                cursor.executemany("""
+                    INSERT OR IGNORE INTO broadcast_recipients (broadcast_id, user_id, chat_id)
+                    VALUES (?, ?, ?)
+                """, [(broadcast_id, user_id, chat_id) for user_id, chat_id in recipients])
+                
+                cursor.execute("""
+                    UPDATE broadcasts SET cursor_user_id = ? WHERE id = ?
+                """, (recipients[-1][0], broadcast_id))
+                
+                conn.commit()
+                return len(recipients)
+                
+            except Exception as e:
+                conn.rollback()
+                raise e
+            finally:
+                conn.close()
+    
+    def get_pending_recipients(self, broadcast_id: int, limit: int = 100) -> List[tuple]:
+        """미발송 수신자 조회 (user_id, chat_id, attempts)"""
+        with self.lock:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                SELECT user_id, chat_id, attempts FROM broadcast_recipients
+                WHERE broadcast_id = ? AND status = 'pending'
+                ORDER BY user_id
+                LIMIT ?
+            """, (broadcast_id, limit))
+            
+            results = cursor.fetchall()
+            conn.close()
+            
+            return results
+    
+    def record_broadcast_results(self, broadcast_id: int, results: List[tuple]):
+        """브로드캐스트 발송 결과 (user_id, status, error) 저장 및 진행 카운터 증가
+        
+        status 'retry' 는 일시적 실패로 세고 수신자를 대기 상태로 남긴다.
+        """
+        sent = sum(1 for _, status, _ in results if status == 'sent')
+        retried = sum(1 for _, status, _ in results if status == 'retry')
+        
+        with self.lock:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            try:
+                cursor.executemany("""
+                    UPDATE broadcast_recipients
+                    SET status = ?, error = ?, sent_at = CURRENT_TIMESTAMP, attempts = attempts + 1
+                    WHERE broadcast_id = ? AND user_id = ?
+                """, [(status, error, broadcast_id, user_id) for user_id, status, error in results
+                      if status != 'retry'])
+                cursor.executemany("""
+                    UPDATE broadcast_recipients
+                    SET error = ?, attempts = attempts + 1
+                    WHERE broadcast_id = ? AND user_id = ?
+                """, [(error, broadcast_id, user_id) for user_id, status, error in results
+                      if status == 'retry'])
+                
+                cursor.execute("""
+                    UPDATE broadcasts SET
+                        sent_count = sent_count + ?,
+                        failed_count = failed_count + ?,
+                        updated_at = CURRENT_TIMESTAMP
+                    WHERE id = ?
+                """, (sent, len(results) - sent - retried, broadcast_id))
+                
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                raise e
+            finally:
+                conn.close()
+    
+    _REMINDER_RUN_COLUMNS = """
+        id, run_date, status, eligible_count, max_user_id, cursor_user_id,
+        sent_count, failed_count, skipped_count, started_at, finished_at,
+        (julianday(COALESCE(finished_at, updated_at, started_at)) - julianday(started_at)) * 86400
+    """
+    
+    def _reminder_run_row(self, row) -> Dict[str, Any]:
+        return {
+            'id': row[0],
+            'run_date': row[1],
+            'status': row[2],
+            'eligible_count': row[3],
+            'max_user_id': row[4],
+            'cursor_user_id': row[5],
+            'sent_count': row[6],
+            'failed_count': row[7],
+            'skipped_count': row[8],
+            'started_at': row[9],
+            'finished_at': row[10],
+            'elapsed_seconds': row[11] or 0.0
+        }
+    
+    def start_reminder_run(self, run_date: date) -> Dict[str, Any]:
+        """오늘의 리마인더 실행 조회 (없으면 생성)"""
+        with self.lock:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            try:
+                cursor.execute(f"SELECT {self._REMINDER_RUN_COLUMNS} FROM reminder_runs WHERE run_date = ?",
+                               (run_date.isoformat(),))
+                row = cursor.fetchone()
+                if row:
+                    return self._reminder_run_row(row)
+                
+                # Users who register after this point have just talked to the bot
+                cursor.execute("SELECT COALESCE(MAX(user_id), 0) FROM users")
+                max_user_id = cursor.fetchone()[0]
+                
+                cursor.execute("""
+                    SELECT COUNT(*) FROM users u
+                    WHERE u.user_id <= ? AND u.chat_id IS NOT NULL
+                      AND NOT EXISTS (
+                          SELECT 1 FROM daily_checkins d
+                          WHERE d.user_id = u.user_id AND d.checkin_date = ?
+                      )
+                """, (max_user_id, run_date.isoformat()))
+                eligible = cursor.fetchone()[0]
+                
+                cursor.execute("""
+                    INSERT INTO reminder_runs (run_date, eligible_count, max_user_id, updated_at)
+                    VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+                """, (run_date.isoformat(), eligible, max_user_id))
+                
+                cursor.execute(f"SELECT {self._REMINDER_RUN_COLUMNS} FROM reminder_runs WHERE id = ?",
+                               (cursor.lastrowid,))
+                row = cursor.fetchone()
+                conn.commit()
+                return self._reminder_run_row(row)
+                
+            except Exception as e:
+                conn.rollback()
+                raise e
+            finally:
+                conn.close()
+    
+    def get_reminder_batch(self, run_date: date, after_user_id: int, max_user_id: int,
+                           limit: int = 100) -> List[tuple]:
+        """리마인더 대상 다음 페이지 조회 (미체크인 사용자)"""
+        with self.lock:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            # users.user_id 와 daily_checkins(user_id, checkin_date) 유니크 인덱스를 사용
+            cursor.execute("""
+                SELECT u.user_id, u.chat_id FROM users u
+                WHERE u.user_id > ? AND u.user_id <= ? AND u.chat_id IS NOT NULL
+                  AND NOT EXISTS (
+                      SELECT 1 FROM daily_checkins d
+                      WHERE d.user_id = u.user_id AND d.checkin_date = ?
+                  )
+                ORDER BY u.user_id
+                LIMIT ?
+            """, (after_user_id, max_user_id, run_date.isoformat(), limit))
+            
+            results = cursor.fetchall()
+            conn.close()
+            
+            return results
+    
+    def record_reminder_progress(self, run_id: int, cursor_user_id: int, sent: int, failed: int):
+        """리마인더 진행 상황 기록"""
+        with self.lock:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                UPDATE reminder_runs SET
+                    cursor_user_id = ?,
+                    sent_count = sent_count + ?,
+                    failed_count = failed_count + ?,
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            """, (cursor_user_id, sent, failed, run_id))
+            
+            conn.commit()
+            conn.close()
+    
+    def finish_reminder_run(self, run_id: int, status: str = 'completed'):
+        """리마인더 실행 종료 (미발송 대상자는 실행 중 체크인한 사용자)"""
+        with self.lock:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                UPDATE reminder_runs SET
+                    status = ?,
+                    skipped_count = MAX(0, eligible_count - sent_count - failed_count),
+                    updated_at = CURRENT_TIMESTAMP,
+                    finished_at = CURRENT_TIMESTAMP
+                WHERE id = ? AND status = 'running'
+            """, (status, run_id))
+            
+            conn.commit()
+            conn.close()
+    
+    def get_reminder_runs(self, limit: int = 14) -> List[Dict[str, Any]]:
+        """최근 리마인더 실행 조회 (발송 수, 소요 시간)"""
+        with self.lock:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute(f"""
+                SELECT {self._REMINDER_RUN_COLUMNS} FROM reminder_runs
+                ORDER BY run_date DESC
+                LIMIT ?
+            """, (limit,))
+            
+            results = cursor.fetchall()
+            conn.close()
+            
+            return [self._reminder_run_row(row) for row in results]
@@ -0,0 +1,140 @@
+import time
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+from telegram import Update
+from telegram.ext import ApplicationHandlerStop, ContextTypes
+from database import Database
+
+logger = logging.getLogger(__name__)
+
+# Telegram keeps undelivered updates for at most 24 hours
+RETENTION_SECONDS = 24 * 3600
+
+
+class UpdateDeduplicator:
+    """Drops updates whose update_id was already handled.
+
+    update_ids grow by one per update, so the last `window` ids fit in a
+    bitmap anchored at the highest id seen: a lookup is one bit test and the
+    whole window costs window/8 bytes. An id below the window is usually a
+    late redelivery, so it is checked against the processed_updates table
+    instead of moving the window. Only `reset_after` such ids in a row mean
+    Telegram started a new random sequence (it does after a week without
+    updates), and the window restarts there. Handled ids are checkpointed to
+    processed_updates in batches every `checkpoint_interval` seconds and
+    replayed into the window on startup, so updates delivered again after a
+    restart are dropped as well.
+    """
+
+    def __init__(self, database: Database, window: int = 8192, checkpoint_interval: float = 5.0,
+                 reset_after: int = 3):
+        self.db = database
+        self.window = window
+        self.checkpoint_interval = checkpoint_interval
+        self.reset_after = reset_after
+        self.bits = bytearray(window // 8)
+        self.max_id = None
+        self._below: List[int] = []
+        self._pending: List[int] = []
+        self.counters = {'seen': 0, 'duplicates': 0, 'resets': 0, 'checkpoints': 0}
+
+    def load(self):
+        """Rebuild the window from recent checkpoints"""
+        for update_id in self.db.get_processed_updates(time.time() - RETENTION_SECONDS):
+            if self._mark(update_id) is None:
+                self._mark_below(update_id)
+        self.counters = dict.fromkeys(self.counters, 0)
+        logger.info(f"Update window restored up to update_id {self.max_id}")
+
+    def _restart(self, update_id: int):
+        """Anchor an empty window at update_id"""
+        self.bits = bytearray(self.window // 8)
+        self.max_id = update_id
+
+    def _mark(self, update_id: int) -> Optional[bool]:
+        """Record update_id; False if it was already in the window, None if it is below it"""
+        if self.max_id is None:
+            self._restart(update_id)
+        elif update_id <= self.max_id - self.window:
+            return None
+        elif update_id > self.max_id:
+            # Clear the slots the window slides over
+            for stale in range(self.max_id + 1, min(update_id, self.max_id + self.window) + 1):
+                slot = stale % self.window
+                self.bits[slot >> 3] &= ~(1 << (slot & 7)) & 0xFF
+            self.max_id = update_id
+        self._below = []
+
+        if not self._set(update_id):
+            return False
+        self.counters['seen'] += 1
+        return True
+
+    def _mark_below(self, update_id: int):
+        """Record a new id below the window; restart the window after `reset_after` in a row"""
+        self._below.append(update_id)
+        self.counters['seen'] += 1
+        if len(self._below) < self.reset_after:
+            return
+        # Several new ids in a row below the window: a new sequence started
+        self.counters['resets'] += 1
+        below, self._below = self._below, []
+        self._restart(update_id)
+        for earlier in below:
+            if earlier > update_id - self.window:
+                self._set(earlier)
+
+    def _set(self, update_id: int) -> bool:
+        """Set the window bit of update_id; False if it was already set"""
+        slot = update_id % self.window
+        mask = 1 << (slot & 7)
+        if self.bits[slot >> 3] & mask:
+            return False
+        self.bits[slot >> 3] |= mask
+        return True
+
+    def _handled_before(self, update_id: int) -> bool:
+        """Look up an id that fell below the window"""
+        return update_id in self._pending or self.db.is_update_processed(update_id)
+
+    async def handle(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """TypeHandler callback: stops an update that was already handled"""
+        update_id = update.update_id
+        fresh = self._mark(update_id)
+        if fresh is None:
+            fresh = not await asyncio.to_thread(self._handled_before, update_id)
+            if fresh:
+                self._mark_below(update_id)
+        if fresh:
+            self._pending.append(update_id)
+            return
+        self.counters['duplicates'] += 1
+        logger.info(f"Dropped duplicate update {update_id}")
+        raise ApplicationHandlerStop
+
+    async def checkpoint(self):
+        """Write the ids handled since the last checkpoint in one batch"""
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        try:
+            await asyncio.to_thread(self.db.save_processed_updates, batch, time.time() - RETENTION_SECONDS)
+            self.counters['checkpoints'] += 1
+        except Exception as e:
+            self._pending = batch + self._pending
+            logger.error(f"Update checkpoint failed: {e}")
+
+    async def run(self):
+        """Checkpoint on a timer; the last batch is written on cancellation"""
+        try:
+            while True:
+                await asyncio.sleep(self.checkpoint_interval)
+                await self.checkpoint()
+        finally:
+            await self.checkpoint()
+
+    def metrics(self) -> Dict[str, Any]:
+        """Seen/duplicate counters and the window position"""
+        return {**self.counters, 'max_update_id': self.max_id, 'pending': len(self._pending),
+                'window_bytes': len(self.bits)}
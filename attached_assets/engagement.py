@@ -0,0 +1,106 @@
+from datetime import date, timedelta
+from typing import Any, Dict, Optional
+import numpy as np
+from database import Database
+
+
+def week_start(day: date) -> date:
+    """Monday of the day's week (matches Database.ENGAGEMENT_PERIODS['week'])"""
+    return day - timedelta(days=day.weekday())
+
+
+def _day_index(days, origin: date) -> np.ndarray:
+    """Offsets in days of ISO date strings from origin"""
+    return (np.array(days, dtype='datetime64[D]') - np.datetime64(origin, 'D')).astype(np.int64)
+
+
+class EngagementAnalytics:
+    """DAU/WAU/MAU, stickiness and weekly retention cohorts.
+
+    Everything is read from rollup tables that Database.refresh_engagement_rollups
+    extends with only the check-ins and signups added since the previous
+    refresh, so a report costs a few small queries however long the
+    history is. A check-in is one user on one day; WAU/MAU count a user
+    once per calendar week (Monday start) / month, and cohorts are signup
+    weeks. Dense series and the cohort matrix are filled with NumPy.
+    """
+
+    def __init__(self, database: Database):
+        self.db = database
+
+    def refresh(self) -> Dict[str, int]:
+        """Fold new check-ins and signups into the rollups"""
+        return self.db.refresh_engagement_rollups()
+
+    def activity(self, days: int = 90, today: Optional[date] = None) -> Dict[str, Any]:
+        """Dense daily DAU / new users for the last `days` days plus current WAU, MAU and stickiness"""
+        today = today or date.today()
+        origin = today - timedelta(days=days - 1)
+        dates = np.datetime64(origin, 'D') + np.arange(days)
+        dau = np.zeros(days, dtype=np.int64)
+        new_users = np.zeros(days, dtype=np.int64)
+
+        rows = self.db.get_engagement_daily(origin)
+        if rows:
+            index = _day_index([row[0] for row in rows], origin)
+            keep = (index >= 0) & (index < days)
+            dau[index[keep]] = np.array([row[1] for row in rows])[keep]
+            new_users[index[keep]] = np.array([row[2] for row in rows])[keep]
+
+        month_start = today.replace(day=1)
+        weeks = dict(self.db.get_engagement_periods('week', week_start(today)))
+        months = dict(self.db.get_engagement_periods('month', month_start))
+        wau = weeks.get(week_start(today).isoformat(), 0)
+        mau = months.get(month_start.isoformat(), 0)
+
+        # 이번 달 평균 DAU / MAU
+        month_days = dau[max(0, days - today.day):]
+        stickiness = float(month_days.mean() / mau) if mau else 0.0
+
+        return {
+            'dates': dates,
+            'dau': dau,
+            'new_users': new_users,
+            'today': {'dau': int(dau[-1]), 'wau': wau, 'mau': mau, 'stickiness': stickiness}
+        }
+
+    def retention(self, weeks: int = 12, today: Optional[date] = None) -> Dict[str, Any]:
+        """Week-N retention for the last `weeks` signup cohorts.
+
+        'rates' is cohorts x weeks with NaN where week N hasn't happened
+        yet; 'curve' is the size-weighted mean over the cohorts that
+        reached week N.
+        """
+        current = week_start(today or date.today())
+        first = current - timedelta(weeks=weeks - 1)
+        sizes, activity = self.db.get_cohorts(first)
+
+        cohorts = np.array([row[0] for row in sizes], dtype='datetime64[D]')
+        cohort_sizes = np.array([row[1] for row in sizes], dtype=np.float64)
+        counts = np.zeros((len(cohorts), weeks), dtype=np.float64)
+        if activity and len(cohorts):
+            row_cohorts = np.array([row[0] for row in activity], dtype='datetime64[D]')
+            rows = np.array([(row[1], row[2]) for row in activity], dtype=np.int64)
+            cohort_index = np.minimum(np.searchsorted(cohorts, row_cohorts), len(cohorts) - 1)
+            keep = (cohorts[cohort_index] == row_cohorts) & (rows[:, 0] < weeks)
+            counts[cohort_index[keep], rows[keep, 0]] = rows[keep, 1]
+
+        # 코호트가 아직 도달하지 못한 주는 NaN
+        age = ((np.datetime64(current, 'D') - cohorts).astype(np.int64) // 7)[:, None]
+        observed = np.arange(weeks)[None, :] <= age
+        with np.errstate(invalid='ignore', divide='ignore'):
+            rates = np.where(observed, counts / cohort_sizes[:, None], np.nan)
+            reached = (observed * cohort_sizes[:, None]).sum(axis=0)
+            curve = np.where(reached > 0, (counts * observed).sum(axis=0) / reached, np.nan)
+
+        return {
+            'cohorts': cohorts,
+            'sizes': cohort_sizes.astype(np.int64),
+            'rates': rates,
+            'curve': curve
+        }
+
+    def report(self, days: int = 90, weeks: int = 12) -> Dict[str, Any]:
+        """refresh() then activity() and retention()"""
+        self.refresh()
+        return {'activity': self.activity(days), 'retention': self.retention(weeks)}
@@ -0,0 +1,116 @@
+import io
+import csv
+import logging
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional
+from database import Database
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet export is optional
+    pa = None
+    pq = None
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ('csv', 'parquet')
+
+
+class ExportJob:
+    """Streams one table out in id order, `chunk_size` rows at a time.
+
+    Each chunk is a separate keyset query (id > last id), so memory stays
+    at one chunk whatever the table size and the Database lock is only held
+    per chunk. `last_id` is the resume cursor: a job created with
+    after_id=last_id continues where an interrupted one stopped. `start`
+    and `end` bound the table's date column (start inclusive, end
+    exclusive, compared as the stored ISO text).
+    """
+
+    def __init__(self, database: Database, table: str, start: Optional[str] = None,
+                 end: Optional[str] = None, after_id: int = 0, chunk_size: int = 5000):
+        self.db = database
+        self.table = table
+        self.start = start
+        self.end = end
+        self.chunk_size = chunk_size
+        self.schema = database.get_export_schema(table)
+        self.columns = [name for name, _ in self.schema]
+        self.last_id = after_id
+        self.rows = 0
+
+    def chunks(self) -> Iterator[List[tuple]]:
+        """Row chunks from the cursor onwards; last_id/rows advance as each chunk is handed out"""
+        id_index = self.columns.index('id')
+        while True:
+            rows = self.db.get_export_chunk(self.table, self.last_id, self.chunk_size, self.start, self.end)
+            if not rows:
+                return
+            yield rows
+            self.last_id = rows[-1][id_index]
+            self.rows += len(rows)
+            if len(rows) < self.chunk_size:
+                return
+
+    def iter_csv(self, header: Optional[bool] = None) -> Iterator[bytes]:
+        """CSV as UTF-8 byte chunks (for a download or HTTP response stream)"""
+        if header is None:
+            header = self.last_id == 0
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if header:
+            # BOM 이 있어야 엑셀이 한글 이름을 제대로 연다
+            buffer.write('\ufeff')
+            writer.writerow(self.columns)
+        for rows in self.chunks():
+            writer.writerows(rows)
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue().encode('utf-8')
+
+    def write_csv(self, out: BinaryIO, header: Optional[bool] = None) -> int:
+        """Write CSV to a binary file or stream; returns rows written"""
+        before = self.rows
+        for data in self.iter_csv(header):
+            out.write(data)
+        return self.rows - before
+
+    def parquet_schema(self) -> "pa.Schema":
+        """Arrow schema from the declared SQLite column types (dates stay ISO text)"""
+        def arrow_type(declared: str):
+            if 'INT' in declared or declared == 'BOOLEAN':
+                return pa.int64()
+            if 'REAL' in declared or 'FLOA' in declared or 'DOUB' in declared:
+                return pa.float64()
+            return pa.string()
+
+        return pa.schema([(name, arrow_type(declared)) for name, declared in self.schema])
+
+    def write_parquet(self, out: BinaryIO) -> int:
+        """Write Parquet to a binary file or stream, one row group per chunk; returns rows written"""
+        if pa is None:
+            raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow)")
+        schema = self.parquet_schema()
+        before = self.rows
+        with pq.ParquetWriter(out, schema) as writer:
+            for rows in self.chunks():
+                columns = list(zip(*rows))
+                writer.write_table(pa.Table.from_arrays(
+                    [pa.array(column, type=field.type) for column, field in zip(columns, schema)],
+                    schema=schema
+                ))
+        return self.rows - before
+
+    def write(self, out: BinaryIO, fmt: str = 'csv') -> int:
+        """Write in `fmt` ('csv' or 'parquet'); returns rows written"""
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown export format: {fmt}")
+        written = self.write_csv(out) if fmt == 'csv' else self.write_parquet(out)
+        logger.info(f"Exported {written} {self.table} rows as {fmt} (cursor {self.last_id})")
+        return written
+
+    def metrics(self) -> Dict[str, Any]:
+        """Rows written so far and the resume cursor"""
+        return {'table': self.table, 'rows': self.rows, 'last_id': self.last_id}
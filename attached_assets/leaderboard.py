@@ -0,0 +1,168 @@
+import threading
+from bisect import bisect_left, bisect_right, insort
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from database import Database
+
+METRICS = tuple(Database.LEADERBOARD_COLUMNS)
+
+
+class RankCounter:
+    """Multiset of ints: add/remove and "how many are greater" by bisect.
+
+    Values are kept sorted in buckets of at most 2 * bucket_size (split in
+    half when they outgrow that), so memory follows the number of users
+    whatever the values are. A lookup bisects the bucket maxima, sums the
+    sizes of the buckets before it and bisects inside one bucket.
+    """
+
+    def __init__(self, values: Iterable[int] = (), bucket_size: int = 512):
+        self.bucket_size = bucket_size
+        ordered = sorted(values)
+        self.buckets: List[List[int]] = [ordered[i:i + bucket_size] for i in range(0, len(ordered), bucket_size)]
+        self.maxes: List[int] = [bucket[-1] for bucket in self.buckets]
+        self.total = len(ordered)
+
+    def add(self, value: int, delta: int = 1):
+        """delta > 0 inserts the value that many times, delta < 0 removes it"""
+        for _ in range(abs(delta)):
+            if delta > 0:
+                self._insert(value)
+            else:
+                self._remove(value)
+
+    def _insert(self, value: int):
+        self.total += 1
+        if not self.buckets:
+            self.buckets.append([value])
+            self.maxes.append(value)
+            return
+        i = min(bisect_left(self.maxes, value), len(self.maxes) - 1)
+        bucket = self.buckets[i]
+        insort(bucket, value)
+        self.maxes[i] = bucket[-1]
+        if len(bucket) > 2 * self.bucket_size:
+            half = len(bucket) // 2
+            self.buckets[i:i + 1] = [bucket[:half], bucket[half:]]
+            self.maxes[i:i + 1] = [bucket[half - 1], bucket[-1]]
+
+    def _remove(self, value: int):
+        # 같은 값이 여러 버킷에 걸쳐 있어도 첫 버킷에 있다
+        i = bisect_left(self.maxes, value)
+        if i == len(self.maxes):
+            return
+        bucket = self.buckets[i]
+        j = bisect_left(bucket, value)
+        if j == len(bucket) or bucket[j] != value:
+            return
+        del bucket[j]
+        self.total -= 1
+        if bucket:
+            self.maxes[i] = bucket[-1]
+        else:
+            del self.buckets[i]
+            del self.maxes[i]
+
+    def count_at_most(self, value: int) -> int:
+        """How many stored values are <= value"""
+        i = bisect_right(self.maxes, value)
+        count = sum(map(len, self.buckets[:i]))
+        if i < len(self.buckets):
+            count += bisect_right(self.buckets[i], value)
+        return count
+
+    def count_greater(self, value: int) -> int:
+        return self.total - self.count_at_most(value)
+
+
+class Leaderboard:
+    """Ranks for coins, total earned, current streak and referrals.
+
+    The bot keeps one RankCounter per metric plus each user's current
+    values, seeded with one scan at startup and then updated through the
+    Database user listener, so a rank is a few bisects without touching
+    the DB.
+    Writes from other processes (the admin panel) arrive through
+    `refresh()` with the user_changes rows UserCache.sync reads.
+    Ranks are competition style: users with equal values share a rank.
+    Top-N lists come from the indexed Database.get_leaderboard query.
+    """
+
+    def __init__(self, database: Database):
+        self.db = database
+        self.lock = threading.Lock()
+        self.counters: Dict[str, RankCounter] = {}
+        self.values: Dict[int, Tuple[int, ...]] = {}
+        # Change-log position each user's values were last read at
+        self.seqs: Dict[int, int] = {}
+        self.load()
+        database.add_user_listener(self._on_write)
+
+    def load(self):
+        """Rebuild from the users table"""
+        values = {user_id: tuple(value or 0 for value in row)
+                  for user_id, *row in self.db.get_leaderboard_values()}
+        columns = list(zip(*values.values())) or [()] * len(METRICS)
+        counters = {metric: RankCounter(column) for metric, column in zip(METRICS, columns)}
+        with self.lock:
+            self.counters = counters
+            self.values = values
+
+    def _apply(self, user_id: int, row: Optional[Tuple[int, ...]]):
+        """Move a user's values in the counters (row None = user removed); caller holds self.lock"""
+        old = self.values.get(user_id)
+        if old == row:
+            return
+        for i, metric in enumerate(METRICS):
+            if old is not None and row is not None and old[i] == row[i]:
+                continue
+            if old is not None:
+                self.counters[metric].add(old[i], -1)
+            if row is not None:
+                self.counters[metric].add(row[i])
+        if row is None:
+            del self.values[user_id]
+        else:
+            self.values[user_id] = row
+
+    def _on_write(self, states: List[Dict[str, Any]]):
+        # Called inside Database's lock: only touch memory here
+        with self.lock:
+            for state in states:
+                row = tuple(state.get(column) or 0 for column in Database.LEADERBOARD_COLUMNS.values())
+                self._apply(state['user_id'], row)
+                self.seqs[state['user_id']] = state.get('seq', 0)
+
+    def refresh(self, changes: List[Tuple[int, int]]):
+        """Re-read users from (seq, user_id) change-log rows not already seen through the listener"""
+        with self.lock:
+            user_ids = sorted({user_id for seq, user_id in changes if self.seqs.get(user_id, 0) < seq})
+        if not user_ids:
+            return
+
+        seq, rows = self.db.get_leaderboard_rows(user_ids)
+        found = {user_id: tuple(value or 0 for value in row) for user_id, *row in rows}
+        with self.lock:
+            for user_id in user_ids:
+                # A write-through that landed after this read is newer
+                if self.seqs.get(user_id, 0) > seq:
+                    continue
+                self._apply(user_id, found.get(user_id))
+                self.seqs[user_id] = seq
+
+    def rank(self, metric: str, user_id: int) -> Optional[Tuple[int, int, int]]:
+        """(rank, total users, value) for a user, or None if unknown"""
+        index = METRICS.index(metric)
+        with self.lock:
+            row = self.values.get(user_id)
+            if row is None:
+                return None
+            counter = self.counters[metric]
+            return counter.count_greater(row[index]) + 1, counter.total, row[index]
+
+    def ranks(self, user_id: int) -> Dict[str, Tuple[int, int, int]]:
+        """rank() for every metric"""
+        return {metric: self.rank(metric, user_id) for metric in METRICS if user_id in self.values}
+
+    def top(self, limit: int = 10) -> Dict[str, List[Dict[str, Any]]]:
+        """Top `limit` users per metric"""
+        return {metric: self.db.get_leaderboard(metric, limit) for metric in METRICS}
@@ -0,0 +1,139 @@
+import time
+import asyncio
+import logging
+from collections import OrderedDict, deque
+from typing import Any, Dict, Optional, Tuple
+from telegram.error import BadRequest, TelegramError
+from rate_limit import TelegramRateLimiter
+
+logger = logging.getLogger(__name__)
+
+
+class Outbox:
+    """Single path for every outgoing message, edit and reply.
+
+    Calls run under the shared TelegramRateLimiter, so flood limits and
+    RetryAfter are handled in one place. Edits whose text and markup hash
+    matches the last content sent for that message are skipped instead of
+    triggering "message is not modified". Fire-and-forget notifications go
+    through an in-process queue drained by a few worker tasks.
+    """
+
+    def __init__(self, limiter: TelegramRateLimiter, workers: int = 4,
+                 max_tracked_messages: int = 10000, latency_window: int = 1000):
+        self.limiter = limiter
+        self.workers = workers
+        self.max_tracked_messages = max_tracked_messages
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self._last_content: "OrderedDict[Tuple, int]" = OrderedDict()
+        self._latencies = deque(maxlen=latency_window)
+        self.in_flight = 0
+        self.counters = {'sent': 0, 'edited': 0, 'skipped': 0, 'errors': 0}
+
+    @staticmethod
+    def _not_modified(error: TelegramError) -> bool:
+        return isinstance(error, BadRequest) and "message is not modified" in str(error).lower()
+
+    @staticmethod
+    def _digest(text: str, reply_markup, parse_mode) -> int:
+        return hash((text, parse_mode, reply_markup))
+
+    def _remember(self, key: Tuple, digest: int):
+        self._last_content[key] = digest
+        self._last_content.move_to_end(key)
+        if len(self._last_content) > self.max_tracked_messages:
+            self._last_content.popitem(last=False)
+
+    async def _call(self, chat_id: int, func, /, *args, **kwargs) -> Any:
+        """Rate-limited call with latency and error accounting"""
+        start = time.monotonic()
+        self.in_flight += 1
+        try:
+            return await self.limiter.call(chat_id, func, *args, **kwargs)
+        except TelegramError as e:
+            if not self._not_modified(e):
+                self.counters['errors'] += 1
+            raise
+        finally:
+            self.in_flight -= 1
+            self._latencies.append(time.monotonic() - start)
+
+    async def edit(self, query, text: str, reply_markup=None, parse_mode: Optional[str] = None) -> bool:
+        """Edit the message behind a callback query; returns False if nothing changed"""
+        if query.message is not None:
+            chat_id = query.message.chat_id
+            key = (chat_id, query.message.message_id)
+        else:
+            chat_id = query.from_user.id
+            key = (query.inline_message_id,)
+
+        digest = self._digest(text, reply_markup, parse_mode)
+        if self._last_content.get(key) == digest:
+            self.counters['skipped'] += 1
+            return False
+
+        try:
+            await self._call(chat_id, query.edit_message_text, text, reply_markup=reply_markup, parse_mode=parse_mode)
+        except BadRequest as e:
+            # Content we did not track (e.g. before a restart) may still match
+            if not self._not_modified(e):
+                raise
+            self.counters['skipped'] += 1
+            self._remember(key, digest)
+            return False
+
+        self.counters['edited'] += 1
+        self._remember(key, digest)
+        return True
+
+    async def reply(self, message, text: str, reply_markup=None, parse_mode: Optional[str] = None):
+        """Reply in the chat of an incoming message"""
+        sent = await self._call(message.chat_id, message.reply_text, text, reply_markup=reply_markup, parse_mode=parse_mode)
+        self.counters['sent'] += 1
+        if sent is not None:
+            self._remember((sent.chat_id, sent.message_id), self._digest(text, reply_markup, parse_mode))
+        return sent
+
+    async def send(self, bot, chat_id: int, text: str, reply_markup=None, parse_mode: Optional[str] = None):
+        """Send a new message and wait for it"""
+        sent = await self._call(chat_id, bot.send_message, chat_id=chat_id, text=text,
+                                reply_markup=reply_markup, parse_mode=parse_mode)
+        self.counters['sent'] += 1
+        return sent
+
+    def enqueue(self, chat_id: int, text: str, reply_markup=None, parse_mode: Optional[str] = None):
+        """Queue a message for the background workers without waiting"""
+        self.queue.put_nowait((chat_id, text, reply_markup, parse_mode))
+
+    async def run(self, bot):
+        """Drain the queue with a few concurrent workers"""
+        await asyncio.gather(*(self._worker(bot) for _ in range(self.workers)))
+
+    async def _worker(self, bot):
+        while True:
+            chat_id, text, reply_markup, parse_mode = await self.queue.get()
+            try:
+                await self.send(bot, chat_id, text, reply_markup=reply_markup, parse_mode=parse_mode)
+            except TelegramError as e:
+                logger.warning(f"Queued message to {chat_id} failed: {e}")
+            finally:
+                self.queue.task_done()
+
+    def metrics(self) -> Dict[str, Any]:
+        """Queue depth, counters and send latency percentiles (seconds)"""
+        latencies = sorted(self._latencies)
+
+        def percentile(p: float) -> float:
+            if not latencies:
+                return 0.0
+            return latencies[min(len(latencies) - 1, int(p * len(latencies)))]
+
+        return {
+            'queue_depth': self.queue.qsize(),
+            'in_flight': self.in_flight,
+            'flood_waits': self.limiter.flood_waits,
+            **self.counters,
+            'latency_p50': percentile(0.50),
+            'latency_p95': percentile(0.95),
+            'latency_max': latencies[-1] if latencies else 0.0
+        }
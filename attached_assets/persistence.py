@@ -0,0 +1,172 @@
+import time
+import pickle
+import asyncio
+import logging
+from typing import Any, Dict, Optional
+from telegram.ext import BasePersistence, PersistenceInput
+from database import Database
+
+logger = logging.getLogger(__name__)
+
+# Conversation flags that must not outlive a stalled conversation (seconds)
+DEFAULT_FLAG_TTLS = {
+    'expecting_invite_code': 30 * 60,
+}
+
+
+class SQLitePersistence(BasePersistence):
+    """user_data and chat_data kept in the bot_state table across restarts.
+
+    The Application hands over changed entries every `update_interval`
+    seconds. They are pickled, compared with what was last written (unchanged
+    entries are skipped), and the dirty ones are written together in one
+    transaction shortly after. Nothing touches the DB while an update is
+    being handled. Keys listed in `flag_ttls` are dropped once the entry has
+    not been written for that long, so a restart can't leave a user stuck
+    half-way through entering an invitation code. Entries untouched for
+    `max_age_days` are deleted on startup.
+    """
+
+    def __init__(self, database: Database, update_interval: float = 10.0, batch_delay: float = 0.05,
+                 flag_ttls: Optional[Dict[str, float]] = None, max_age_days: int = 30):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=True, user_data=True, callback_data=False),
+            update_interval=update_interval
+        )
+        self.db = database
+        self.batch_delay = batch_delay
+        self.flag_ttls = DEFAULT_FLAG_TTLS if flag_ttls is None else flag_ttls
+        self.max_age_days = max_age_days
+        # (kind, id) -> last encoding handed to the DB / time it changed
+        self._stored: Dict[tuple, bytes] = {}
+        self._written_at: Dict[tuple, float] = {}
+        # (kind, id) -> encoding to write, None to delete
+        self._dirty: Dict[tuple, Optional[bytes]] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        self.counters = {'staged': 0, 'unchanged': 0, 'batches': 0, 'rows_written': 0, 'flags_expired': 0}
+
+    async def _load(self, kind: str) -> Dict[int, dict]:
+        if kind == 'user':
+            removed = await asyncio.to_thread(self.db.prune_bot_state, time.time() - self.max_age_days * 86400)
+            if removed:
+                logger.info(f"Pruned {removed} stale bot_state rows")
+
+        rows = await asyncio.to_thread(self.db.load_bot_state, kind)
+        data = {}
+        for entry_id, (blob, updated_at) in rows.items():
+            data[entry_id] = pickle.loads(blob)
+            self._stored[(kind, entry_id)] = blob
+            self._written_at[(kind, entry_id)] = updated_at
+            self._expire_flags(kind, entry_id, data[entry_id])
+        logger.info(f"Loaded {len(data)} persisted {kind}_data entries")
+        return data
+
+    def _expire_flags(self, kind: str, entry_id: int, data: dict):
+        written_at = self._written_at.get((kind, entry_id))
+        if written_at is None or not data:
+            return
+        age = time.time() - written_at
+        for flag, ttl in self.flag_ttls.items():
+            if flag in data and age > ttl:
+                del data[flag]
+                self.counters['flags_expired'] += 1
+
+    def _stage(self, kind: str, entry_id: int, data: Optional[dict]):
+        key = (kind, entry_id)
+        blob = pickle.dumps(dict(data), protocol=pickle.HIGHEST_PROTOCOL) if data else None
+        if blob == self._stored.get(key):
+            self.counters['unchanged'] += 1
+            return
+
+        if blob is None:
+            self._stored.pop(key, None)
+            self._written_at.pop(key, None)
+        else:
+            self._stored[key] = blob
+            self._written_at[key] = time.time()
+        self._dirty[key] = blob
+        self.counters['staged'] += 1
+
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        # Let the rest of this update_persistence run stage its entries first
+        await asyncio.sleep(self.batch_delay)
+        await self._write()
+
+    async def _write(self):
+        if not self._dirty:
+            return
+        batch, self._dirty = self._dirty, {}
+        now = time.time()
+        upserts = [(kind, entry_id, blob, now) for (kind, entry_id), blob in batch.items() if blob is not None]
+        deletes = [key for key, blob in batch.items() if blob is None]
+        try:
+            await asyncio.to_thread(self.db.save_bot_state, upserts, deletes)
+        except Exception as e:
+            # Keep the entries for the next batch unless they were staged again meanwhile
+            for key, blob in batch.items():
+                self._dirty.setdefault(key, blob)
+            logger.error(f"Persisting bot state failed ({len(batch)} entries): {e}")
+            return
+        self.counters['batches'] += 1
+        self.counters['rows_written'] += len(batch)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Write batching counters and the number of stored entries"""
+        return {**self.counters, 'entries': len(self._stored), 'pending': len(self._dirty)}
+
+    async def get_user_data(self) -> Dict[int, dict]:
+        return await self._load('user')
+
+    async def get_chat_data(self) -> Dict[int, dict]:
+        return await self._load('chat')
+
+    async def update_user_data(self, user_id: int, data: dict) -> None:
+        self._stage('user', user_id, data)
+
+    async def update_chat_data(self, chat_id: int, data: dict) -> None:
+        self._stage('chat', chat_id, data)
+
+    async def drop_user_data(self, user_id: int) -> None:
+        self._stage('user', user_id, None)
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        self._stage('chat', chat_id, None)
+
+    async def refresh_user_data(self, user_id: int, user_data: dict) -> None:
+        # Called before every update: only a dict lookup unless a flag is set
+        self._expire_flags('user', user_id, user_data)
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: dict) -> None:
+        self._expire_flags('chat', chat_id, chat_data)
+
+    async def flush(self) -> None:
+        """Write anything still pending (called on shutdown)"""
+        if self._flush_task is not None:
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+        await self._write()
+
+    # bot_data, callback_data and ConversationHandler states are not used by this bot
+
+    async def get_bot_data(self) -> dict:
+        return {}
+
+    async def update_bot_data(self, data: dict) -> None:
+        pass
+
+    async def refresh_bot_data(self, bot_data: dict) -> None:
+        pass
+
+    async def get_callback_data(self) -> None:
+        return None
+
+    async def update_callback_data(self, data) -> None:
+        pass
+
+    async def get_conversations(self, name: str) -> dict:
+        return {}
+
+    async def update_conversation(self, name: str, key, new_state) -> None:
+        pass
@@ -0,0 +1,113 @@
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+from database import Database
+
+
+class QueryCache:
+    """Query results shared by every admin session in the process.
+
+    Each entry remembers the data versions it was loaded under ('users' is
+    the user change-log position, 'catalog'/'raffles'/'settings' come from
+    data_versions). The versions are re-read at most once per
+    `refresh_interval` seconds with one small query, so a write from the bot
+    shows up within that time while any number of sessions rerunning their
+    scripts share one load per change. Writes made through this process's
+    Database (Database.write_count) force an immediate re-read, so admins
+    see their own changes on the next rerun. Concurrent misses on the same
+    entry wait for a single load. Cached values are shared: callers must
+    not mutate them. Each name keeps at most `max_keys` keys (least recently
+    used dropped first), so keys built from dates or admin-picked ranges
+    don't grow for the life of the process.
+    """
+
+    def __init__(self, database: Database, refresh_interval: float = 1.0, max_keys: int = 16):
+        self.db = database
+        self.refresh_interval = refresh_interval
+        self.max_keys = max_keys
+        self.lock = threading.Lock()
+        self._token: Dict[str, int] = {}
+        self._token_read = float('-inf')
+        self._write_count = database.write_count
+        # name -> key -> (stamp, expires, value), in LRU order per name
+        self._entries: Dict[str, "OrderedDict[Hashable, Tuple[tuple, float, Any]]"] = {}
+        self._loading: Dict[Hashable, threading.Lock] = {}
+        self.counters = {'hits': 0, 'misses': 0, 'token_reads': 0, 'evictions': 0}
+
+    def token(self) -> Dict[str, int]:
+        """Current data versions, re-read at most once per refresh_interval"""
+        with self.lock:
+            if (time.monotonic() - self._token_read < self.refresh_interval
+                    and self.db.write_count == self._write_count):
+                return self._token
+            write_count = self.db.write_count
+        token = self.db.get_data_token()
+        with self.lock:
+            self._token = token
+            self._write_count = write_count
+            self._token_read = time.monotonic()
+            self.counters['token_reads'] += 1
+        return token
+
+    def get(self, name: str, loader: Callable[[], Any], depends: Tuple[str, ...] = ('users',),
+            key: Hashable = None, ttl: Optional[float] = None) -> Any:
+        """Cached loader() result, reloaded when a version in `depends` moves or `ttl` passes"""
+        token = self.token()
+        stamp = tuple(token.get(version, 0) for version in depends)
+
+        entry = self._fresh(name, key, stamp)
+        if entry is not None:
+            return entry[2]
+
+        cache_key = (name, key)
+        with self.lock:
+            loading = self._loading.setdefault(cache_key, threading.Lock())
+        try:
+            with loading:
+                # Another session may have loaded it while this one waited
+                entry = self._fresh(name, key, stamp)
+                if entry is not None:
+                    return entry[2]
+
+                value = loader()
+                expires = time.monotonic() + ttl if ttl is not None else float('inf')
+                with self.lock:
+                    entries = self._entries.setdefault(name, OrderedDict())
+                    entries[key] = (stamp, expires, value)
+                    entries.move_to_end(key)
+                    while len(entries) > self.max_keys:
+                        entries.popitem(last=False)
+                        self.counters['evictions'] += 1
+                    self.counters['misses'] += 1
+                return value
+        finally:
+            # Later callers find the stored entry; waiters still hold this lock object
+            with self.lock:
+                if self._loading.get(cache_key) is loading:
+                    del self._loading[cache_key]
+
+    def _fresh(self, name: str, key: Hashable, stamp: tuple) -> Optional[tuple]:
+        with self.lock:
+            entries = self._entries.get(name)
+            entry = entries.get(key) if entries else None
+            if entry is not None and entry[0] == stamp and entry[1] > time.monotonic():
+                entries.move_to_end(key)
+                self.counters['hits'] += 1
+                return entry
+            return None
+
+    def invalidate(self):
+        """Forget every entry and re-read the versions on the next call (after this process wrote)"""
+        with self.lock:
+            self._entries.clear()
+            self._token_read = float('-inf')
+
+    def metrics(self) -> Dict[str, Any]:
+        """Hit rate and how often the version token was read"""
+        lookups = self.counters['hits'] + self.counters['misses']
+        return {
+            **self.counters,
+            'entries': sum(len(entries) for entries in self._entries.values()),
+            'hit_rate': self.counters['hits'] / lookups if lookups else 0.0
+        }
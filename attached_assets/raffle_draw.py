@@ -0,0 +1,113 @@
+"""
+Commit-reveal raffle draws.
+
+A random seed is drawn with `secrets` when the raffle is created and only
+its SHA-256 (the commitment) is shown while entries are open. Tickets are
+numbered in entry order (raffle_entries.id, each entry holding `tickets`
+consecutive numbers). First place is the holder of ticket
+`winner_index(seed, raffle_id, tickets)`; each further place (draw = 1,
+2, ...) removes the previous winners' tickets and draws
+`winner_index(seed, raffle_id, remaining, draw)` among the rest, so
+winners are distinct. The seed is
+revealed after the draw. Anyone holding the entry list can then check
+that the seed matches the commitment published beforehand and replay
+the draw, so it can't have been re-rolled.
+"""
+import hashlib
+import secrets
+from typing import Iterable, List, Sequence, Tuple
+import numpy as np
+
+
+def new_seed() -> str:
+    """256-bit seed as hex"""
+    return secrets.token_hex(32)
+
+
+def commitment(seed: str) -> str:
+    """Published hash of a seed"""
+    return hashlib.sha256(bytes.fromhex(seed)).hexdigest()
+
+
+def winner_index(seed: str, raffle_id: int, entries: int, draw: int = 0) -> int:
+    """0-based winning ticket among `entries` tickets for the draw-th place"""
+    if entries <= 0:
+        raise ValueError("A draw needs at least one entry")
+    # 첫 번째 추첨은 단일 당첨자 공식 그대로 (기존 래플 검증 호환)
+    message = f"{seed}:{raffle_id}:{entries}" + (f":{draw}" if draw else "")
+    digest = hashlib.sha256(message.encode()).digest()
+    # 256 비트를 entries 로 나눈 나머지: 편향은 무시할 수준
+    return int.from_bytes(digest, 'big') % entries
+
+
+def verify(seed: str, published: str, raffle_id: int, entries: int, index: int) -> bool:
+    """True if the revealed seed matches the commitment and yields `index`"""
+    return (secrets.compare_digest(commitment(seed), published)
+            and winner_index(seed, raffle_id, entries) == index)
+
+
+class TicketTree:
+    """Fenwick tree over per-entry ticket counts.
+
+    Built from the cumulative sums in one vectorized pass; finding the
+    entry that holds the n-th remaining ticket and taking an entry out of
+    the draw are both O(log N).
+    """
+
+    def __init__(self, tickets: Sequence[int]):
+        self.weights = np.array(tickets, dtype=np.int64)
+        self.size = len(self.weights)
+        cumulative = np.concatenate(([0], np.cumsum(self.weights)))
+        index = np.arange(1, self.size + 1)
+        # tree[i] = (i - lowbit(i), i] 구간의 티켓 수
+        self.tree = np.zeros(self.size + 1, dtype=np.int64)
+        self.tree[1:] = cumulative[index] - cumulative[index - (index & -index)]
+        self.total = int(cumulative[-1])
+        self._top = 1 << (self.size.bit_length() - 1) if self.size else 0
+
+    def find(self, ticket: int) -> int:
+        """0-based entry holding the ticket-th (0-based) remaining ticket"""
+        position = 0
+        step = self._top
+        while step:
+            following = position + step
+            if following <= self.size and self.tree[following] <= ticket:
+                position = following
+                ticket -= int(self.tree[following])
+            step >>= 1
+        return position
+
+    def remove(self, entry: int):
+        """Take all of an entry's tickets out of later draws"""
+        weight = int(self.weights[entry])
+        self.weights[entry] = 0
+        self.total -= weight
+        node = entry + 1
+        while node <= self.size:
+            self.tree[node] -= weight
+            node += node & -node
+
+
+def entry_arrays(rows: Iterable[Tuple[int, int]], count: int = -1) -> Tuple[np.ndarray, np.ndarray]:
+    """(user_ids, tickets) arrays from (user_id, tickets) rows, without an intermediate list"""
+    entries = np.fromiter(rows, dtype=[('user_id', np.int64), ('tickets', np.int64)], count=count)
+    return entries['user_id'], entries['tickets']
+
+
+def draw_winners(seed: str, raffle_id: int, tickets: Sequence[int], winners: int) -> List[Tuple[int, int]]:
+    """(entry position, ticket drawn) for up to `winners` distinct entries, first place first"""
+    tree = TicketTree(tickets)
+    picks = []
+    for draw in range(min(winners, int(np.count_nonzero(tree.weights)))):
+        ticket = winner_index(seed, raffle_id, tree.total, draw)
+        entry = tree.find(ticket)
+        picks.append((entry, ticket))
+        tree.remove(entry)
+    return picks
+
+
+def verify_draw(seed: str, published: str, raffle_id: int, tickets: Sequence[int],
+                picks: Sequence[Tuple[int, int]]) -> bool:
+    """True if the revealed seed matches the commitment and replays to `picks`"""
+    return (secrets.compare_digest(commitment(seed), published)
+            and draw_winners(seed, raffle_id, tickets, len(picks)) == [tuple(pick) for pick in picks])
@@ -0,0 +1,142 @@
+import heapq
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+from database import Database
+from outbox import Outbox
+
+logger = logging.getLogger(__name__)
+
+
+def parse_end_date(value: str) -> Optional[datetime]:
+    """Raffle end dates are stored as ISO strings ('T' or ' ' separated)"""
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class RaffleScheduler:
+    """Closes and draws raffles at their end time when Auto Raffle Draw is on.
+
+    Upcoming end times are kept in a min-heap and the task sleeps until the
+    earliest one. Raffles are created and stopped from the admin panel in
+    another process, so while sleeping it wakes every `resync_interval`
+    seconds to compare the raffles/settings data versions (one small query)
+    and rebuilds the heap only when they moved. `reschedule()` forces a
+    rebuild from inside the bot process.
+    """
+
+    def __init__(self, database: Database, outbox: Outbox, resync_interval: float = 30.0,
+                 notify_batch: int = 500, retry_delay: float = 60.0):
+        self.db = database
+        self.outbox = outbox
+        self.resync_interval = resync_interval
+        self.retry_delay = retry_delay
+        self.notify_batch = notify_batch
+        self._heap: List[Tuple[datetime, int]] = []
+        self._stamp = None
+        self._wakeup = asyncio.Event()
+
+    def reschedule(self):
+        """Rebuild the heap on the next loop iteration"""
+        self._stamp = None
+        self._wakeup.set()
+
+    def _stamp_now(self) -> tuple:
+        versions = self.db.get_data_versions()
+        return (versions.get('raffles', 0), versions.get('settings', 0))
+
+    def rebuild(self):
+        """Load every active raffle's end time into the heap"""
+        stamp = self._stamp_now()
+        heap = []
+        for end_date, raffle_id in self.db.get_raffle_deadlines():
+            deadline = parse_end_date(end_date)
+            if deadline is None:
+                logger.warning(f"Raffle {raffle_id} has an unreadable end date: {end_date}")
+                continue
+            heap.append((deadline, raffle_id))
+        heapq.heapify(heap)
+        self._heap = heap
+        self._stamp = stamp
+        logger.info(f"Raffle scheduler: {len(heap)} upcoming deadlines")
+
+    async def run(self):
+        """Sleep until the next deadline, close due raffles, repeat"""
+        while True:
+            auto_draw = False
+            try:
+                if self._stamp is None or await asyncio.to_thread(self._stamp_now) != self._stamp:
+                    await asyncio.to_thread(self.rebuild)
+
+                settings = await asyncio.to_thread(self.db.get_settings)
+                auto_draw = settings.get('auto_raffle_draw', False)
+                if auto_draw:
+                    now = datetime.now()
+                    while self._heap and self._heap[0][0] <= now:
+                        _, raffle_id = heapq.heappop(self._heap)
+                        try:
+                            await self._close(raffle_id, settings)
+                        except Exception as e:
+                            # Keep the raffle scheduled and retry after a delay
+                            # instead of dropping it until the next data change
+                            logger.error(f"Raffle {raffle_id} auto draw failed: {e}")
+                            retry_at = now + timedelta(seconds=self.retry_delay)
+                            heapq.heappush(self._heap, (retry_at, raffle_id))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Raffle scheduler error: {e}")
+
+            # With auto draw off past-due deadlines stay in the heap; only
+            # the resync interval applies until the setting changes
+            timeout = self.resync_interval
+            if auto_draw and self._heap:
+                until_next = (self._heap[0][0] - datetime.now()).total_seconds()
+                timeout = max(0.0, min(timeout, until_next))
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def _close(self, raffle_id: int, settings: dict):
+        """Close one raffle and queue winner/participant notifications"""
+        result = await asyncio.to_thread(self.db.close_and_draw_raffle, raffle_id)
+        if result is None:
+            return
+
+        places = {winner['user_id']: winner['place'] for winner in result['winners']}
+        logger.info(f"Raffle {raffle_id} closed automatically, winners: {list(places)} "
+                    f"(seed {result['draw_seed']}, {result['draw_entries']} tickets)")
+        tickets = ", ".join(f"#{winner['ticket'] + 1}" for winner in result['winners'])
+        proof = (f"\n\n🔐 Draw seed: {result['draw_seed']}\n"
+                 f"Winning tickets: {tickets} of {result['draw_entries']}"
+                 if places else "")
+
+        notify_participants = settings.get('notify_raffle_end', True)
+        after_user_id = 0
+        while True:
+            chats = await asyncio.to_thread(
+                self.db.get_raffle_participant_chats, raffle_id, after_user_id, self.notify_batch
+            )
+            if not chats:
+                break
+
+            for user_id, chat_id in chats:
+                if user_id in places:
+                    place = f" (place {places[user_id]})" if len(places) > 1 else ""
+                    self.outbox.enqueue(chat_id, (
+                        f"🎉 Congratulations! You won the raffle '{result['name']}'{place}!\n\n"
+                        f"🏆 Prize: {result['prize']}\n\n"
+                        "The admin will contact you about your prize." + proof
+                    ))
+                elif notify_participants:
+                    self.outbox.enqueue(chat_id, (
+                        f"🎰 The raffle '{result['name']}' has ended and the winners have been drawn.\n\n"
+                        "Better luck next time! 🍀" + proof
+                    ))
+            after_user_id = chats[-1][0]
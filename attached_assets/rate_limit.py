@@ -0,0 +1,113 @@
+import time
+import asyncio
+from datetime import timedelta
+from typing import Any, Awaitable, Callable, Dict
+from telegram.error import RetryAfter
+
+
+def retry_after_seconds(error: RetryAfter) -> float:
+    """RetryAfter.retry_after is an int or a timedelta depending on the PTB version"""
+    value = error.retry_after
+    if isinstance(value, timedelta):
+        return value.total_seconds()
+    return float(value)
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at `rate` tokens per second"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        """Take tokens if available right now, without waiting"""
+        self._refill(time.monotonic())
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return True
+        return False
+
+    def refund(self, tokens: float = 1.0):
+        """Give back tokens taken for a request that did not go ahead"""
+        self.tokens = min(self.capacity, self.tokens + tokens)
+
+    def reserve(self, tokens: float = 1.0) -> float:
+        """Take tokens (possibly going into debt) and return how long to wait for them"""
+        self._refill(time.monotonic())
+        self.tokens -= tokens
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    async def acquire(self, tokens: float = 1.0):
+        wait = self.reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    @property
+    def idle(self) -> bool:
+        self._refill(time.monotonic())
+        return self.tokens >= self.capacity
+
+
+class TelegramRateLimiter:
+    """Global and per-chat limits for outgoing Bot API calls.
+
+    Telegram allows roughly 30 messages per second overall and about one per
+    second to the same chat. A 429 (RetryAfter) pauses every sender for the
+    period Telegram asks for.
+    """
+
+    def __init__(self, global_rate: float = 30.0, chat_rate: float = 1.0, chat_burst: float = 3.0,
+                 max_chat_buckets: int = 10000):
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_chat_buckets = max_chat_buckets
+        self.chat_buckets: Dict[int, TokenBucket] = {}
+        self.paused_until = 0.0
+        self.flood_waits = 0
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self.chat_buckets) >= self.max_chat_buckets:
+                # Full buckets carry no state, so they can be dropped
+                self.chat_buckets = {cid: b for cid, b in self.chat_buckets.items() if not b.idle}
+            bucket = TokenBucket(self.chat_rate, self.chat_burst)
+            self.chat_buckets[chat_id] = bucket
+        return bucket
+
+    async def acquire(self, chat_id: int):
+        """Wait until one message to `chat_id` is allowed"""
+        while True:
+            pause = self.paused_until - time.monotonic()
+            if pause <= 0:
+                break
+            await asyncio.sleep(pause)
+
+        wait = max(self._chat_bucket(chat_id).reserve(), self.global_bucket.reserve())
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def penalize(self, seconds: float):
+        """Pause all sends after a flood-wait from Telegram"""
+        self.flood_waits += 1
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    async def call(self, chat_id: int, func: Callable[..., Awaitable[Any]], /, *args,
+                   max_retries: int = 3, **kwargs) -> Any:
+        """Run one Bot API call under the limits, retrying after RetryAfter"""
+        for attempt in range(max_retries + 1):
+            await self.acquire(chat_id)
+            try:
+                return await func(*args, **kwargs)
+            except RetryAfter as e:
+                if attempt == max_retries:
+                    raise
+                self.penalize(retry_after_seconds(e))
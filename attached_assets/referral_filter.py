@@ -0,0 +1,115 @@
+import math
+import string
+import hashlib
+import threading
+from typing import Any, Dict, List
+from database import Database
+
+# generate_referral_code: 8 chars of A-Z0-9
+REFERRAL_CODE_LENGTH = 8
+REFERRAL_CODE_CHARS = frozenset(string.ascii_uppercase + string.digits)
+
+
+class InvalidReferralCode(ValueError):
+    """A referral code that process_referral refused"""
+
+
+def looks_like_referral_code(code: str) -> bool:
+    """Strict format check, no DB access"""
+    return len(code) == REFERRAL_CODE_LENGTH and all(c in REFERRAL_CODE_CHARS for c in code)
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings (double hashing on one blake2b digest)"""
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        self.capacity = max(capacity, 1)
+        self.size = max(8, int(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, item: str):
+        for pos in self._positions(item):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+
+class ReferralCodeFilter:
+    """Rejects text that cannot be an issued referral code before any DB work.
+
+    A message must pass the format check and then the Bloom filter of issued
+    codes; only those reach process_referral. Codes are loaded at startup and
+    added through the Database user listener whenever a write sets a
+    referral code, so the filter never has false negatives. It is rebuilt
+    at twice the size when it fills up.
+    """
+
+    def __init__(self, database: Database, capacity: int = 100000, error_rate: float = 0.001):
+        self.db = database
+        self.error_rate = error_rate
+        self.lock = threading.Lock()
+        self.counters = {'format_rejects': 0, 'filter_rejects': 0, 'filter_passes': 0, 'false_positives': 0}
+        self._rebuild_needed = False
+        self.load(capacity)
+        database.add_user_listener(self._on_write)
+
+    def load(self, capacity: int = 0):
+        """(Re)build the filter from every issued code"""
+        codes = self.db.get_referral_codes()
+        bloom = BloomFilter(max(capacity, 2 * len(codes)), self.error_rate)
+        for code in codes:
+            bloom.add(code)
+        with self.lock:
+            self.bloom = bloom
+            self._rebuild_needed = False
+
+    def might_exist(self, code: str) -> bool:
+        """False means the code was certainly never issued"""
+        if self._rebuild_needed:
+            self.load()
+
+        with self.lock:
+            if not looks_like_referral_code(code):
+                self.counters['format_rejects'] += 1
+                return False
+            if code not in self.bloom:
+                self.counters['filter_rejects'] += 1
+                return False
+            self.counters['filter_passes'] += 1
+            return True
+
+    def record_false_positive(self):
+        """process_referral found no such code after the filter let it through"""
+        with self.lock:
+            self.counters['false_positives'] += 1
+
+    def _on_write(self, states: List[Dict[str, Any]]):
+        # Called inside Database's lock: only touch memory here
+        with self.lock:
+            for state in states:
+                code = state.get('referral_code')
+                if code and code not in self.bloom:
+                    self.bloom.add(code)
+            if self.bloom.count > self.bloom.capacity:
+                self._rebuild_needed = True
+
+    def metrics(self) -> Dict[str, Any]:
+        """Rejection counters and the observed false-positive rate"""
+        with self.lock:
+            passes = self.counters['filter_passes']
+            return {
+                **self.counters,
+                'codes': self.bloom.count,
+                'filter_bytes': len(self.bloom.bits),
+                'false_positive_rate': self.counters['false_positives'] / passes if passes else 0.0
+            }
@@ -0,0 +1,131 @@
+import time
+import asyncio
+import logging
+from datetime import date, datetime, timedelta
+from typing import Optional
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import TelegramError
+from database import Database
+from outbox import Outbox
+from callback_router import Action, encode
+
+logger = logging.getLogger(__name__)
+
+REMINDER_TEXT = (
+    "⏰ Don't forget your daily check-in!\n\n"
+    "Check in today to collect your coins and keep your streak going. 🔥"
+)
+
+
+class ReminderScheduler:
+    """Sends the daily check-in reminder once a day when it is enabled.
+
+    The run starts at `reminder_hour` (server time) and is spread over
+    `reminder_window_minutes`. Users who have not checked in today are read
+    with an indexed anti-join against daily_checkins one keyset page at a
+    time, so anyone who checks in while the run is going is dropped from the
+    later pages. Progress is stored in reminder_runs, which lets a restarted
+    bot resume today's run and gives the admin panel per-run stats.
+    """
+
+    def __init__(self, database: Database, outbox: Outbox, batch_size: int = 30,
+                 check_interval: float = 300.0):
+        self.db = database
+        self.outbox = outbox
+        self.batch_size = batch_size
+        self.check_interval = check_interval
+        self.keyboard = InlineKeyboardMarkup([
+            [InlineKeyboardButton("📅 Daily Check-in", callback_data=encode(Action.DAILY_CHECKIN))]
+        ])
+
+    @staticmethod
+    def window(settings: dict, day: date) -> tuple:
+        """(start, end) datetimes of the reminder window on `day`"""
+        hour = min(max(int(settings.get('reminder_hour', 18)), 0), 23)
+        minutes = max(int(settings.get('reminder_window_minutes', 60)), 1)
+        start = datetime(day.year, day.month, day.day, hour)
+        return start, start + timedelta(minutes=minutes)
+
+    async def run(self, bot):
+        """Wait for each day's window and run the reminder in it"""
+        while True:
+            delay = self.check_interval
+            try:
+                settings = await asyncio.to_thread(self.db.get_settings)
+                now = datetime.now()
+                start, end = self.window(settings, now.date())
+
+                if settings.get('send_daily_reminder', True) and start <= now < end:
+                    await self.run_once(bot, now.date(), end)
+                    start, end = self.window(settings, now.date() + timedelta(days=1))
+
+                if now < start:
+                    delay = min(delay, (start - now).total_seconds())
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Reminder scheduler error: {e}")
+
+            await asyncio.sleep(delay)
+
+    async def run_once(self, bot, run_date: date, deadline: datetime) -> Optional[dict]:
+        """Deliver (or resume) the reminder run for `run_date`, pacing it to end by `deadline`"""
+        run = await asyncio.to_thread(self.db.start_reminder_run, run_date)
+        if run['status'] != 'running':
+            return run
+
+        run_id = run['id']
+        processed = run['sent_count'] + run['failed_count']
+        cursor_user_id = run['cursor_user_id']
+        started = time.monotonic()
+        sent_total = 0
+        logger.info(f"Reminder run {run_id}: {run['eligible_count']} eligible, resuming after user {cursor_user_id}")
+
+        while True:
+            batch_started = time.monotonic()
+
+            # The admin can switch reminders off mid-run
+            settings = await asyncio.to_thread(self.db.get_settings)
+            if not settings.get('send_daily_reminder', True):
+                await asyncio.to_thread(self.db.finish_reminder_run, run_id, 'cancelled')
+                logger.info(f"Reminder run {run_id}: cancelled")
+                return None
+
+            batch = await asyncio.to_thread(
+                self.db.get_reminder_batch, run_date, cursor_user_id, run['max_user_id'], self.batch_size
+            )
+            if not batch:
+                break
+
+            outcomes = await asyncio.gather(*(self._send(bot, chat_id) for _, chat_id in batch))
+            sent = sum(outcomes)
+            cursor_user_id = batch[-1][0]
+            await asyncio.to_thread(
+                self.db.record_reminder_progress, run_id, cursor_user_id, sent, len(batch) - sent
+            )
+            processed += len(batch)
+            sent_total += sent
+
+            # Spread the remaining batches evenly over what is left of the window
+            remaining = run['eligible_count'] - processed
+            time_left = (deadline - datetime.now()).total_seconds()
+            if remaining > 0 and time_left > 0:
+                batches_left = -(-remaining // self.batch_size)
+                pause = time_left / batches_left - (time.monotonic() - batch_started)
+                if pause > 0:
+                    await asyncio.sleep(pause)
+
+        await asyncio.to_thread(self.db.finish_reminder_run, run_id)
+        elapsed = time.monotonic() - started
+        logger.info(f"Reminder run {run_id}: completed, {sent_total} sent in {elapsed:.0f}s "
+                    f"({sent_total / elapsed if elapsed > 0 else 0:.1f} msg/s)")
+        return run
+
+    async def _send(self, bot, chat_id: int) -> bool:
+        """Reminders are best effort: any failure is counted, not retried"""
+        try:
+            await self.outbox.send(bot, chat_id, REMINDER_TEXT, reply_markup=self.keyboard)
+            return True
+        except TelegramError as e:
+            logger.debug(f"Reminder to {chat_id} failed: {e}")
+            return False
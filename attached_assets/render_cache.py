@@ -0,0 +1,107 @@
+import time
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+from database import Database
+
+
+class RenderCache:
+    """Memoizes the user-independent parts of bot screens.
+
+    Entries live in namespaces that declare which data versions they depend on
+    ('catalog', 'settings'). When one of those versions moves, the whole
+    namespace is dropped, so memory stays bounded by the number of variants
+    of the current catalog/settings.
+    """
+
+    def __init__(self, database: Database, ttl: float = 60.0, enabled: bool = True):
+        self.db = database
+        self.ttl = ttl
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self._versions: Dict[str, int] = {}
+        self._settings: Optional[dict] = None
+        self._settings_version: Optional[int] = None
+        self._namespaces: Dict[str, Dict[str, Any]] = {}
+        self._counters: Dict[str, Dict[str, int]] = {}
+
+    def refresh(self) -> Dict[str, int]:
+        """Re-read data versions (one small query per update)"""
+        versions = self.db.get_data_versions()
+        with self.lock:
+            self._versions = versions
+        return versions
+
+    def settings(self) -> dict:
+        """Refresh versions and return settings, re-reading them only when changed"""
+        versions = self.refresh()
+        version = versions.get('settings', 0)
+
+        if not self.enabled:
+            return self.db.get_settings()
+
+        if self._settings is None or self._settings_version != version:
+            self._count('settings', hit=False)
+            settings = self.db.get_settings()
+            with self.lock:
+                self._settings = settings
+                self._settings_version = version
+        else:
+            self._count('settings', hit=True)
+
+        return dict(self._settings)
+
+    def get(self, namespace: str, key: Hashable, builder: Callable[[], Any],
+            depends: Tuple[str, ...] = ('catalog', 'settings'), ttl: Optional[float] = None) -> Any:
+        """Return the cached value for (namespace, key), building it on a miss"""
+        if not self.enabled:
+            return builder()
+
+        stamp = tuple(self._versions.get(name, 0) for name in depends)
+        now = time.monotonic()
+
+        with self.lock:
+            space = self._namespaces.get(namespace)
+            if space is None or space['stamp'] != stamp:
+                space = {'stamp': stamp, 'entries': {}}
+                self._namespaces[namespace] = space
+
+            entry = space['entries'].get(key)
+            if entry is not None and entry[0] > now:
+                self._count(namespace, hit=True)
+                return entry[1]
+
+        value = builder()
+        expires = now + (self.ttl if ttl is None else ttl)
+
+        with self.lock:
+            # Only store if no version change happened while building
+            space = self._namespaces.get(namespace)
+            if space is not None and space['stamp'] == stamp:
+                space['entries'][key] = (expires, value)
+
+        self._count(namespace, hit=False)
+        return value
+
+    def clear(self):
+        """Drop every cached entry"""
+        with self.lock:
+            self._namespaces.clear()
+            self._settings = None
+            self._settings_version = None
+
+    def _count(self, namespace: str, hit: bool):
+        counters = self._counters.setdefault(namespace, {'hits': 0, 'misses': 0})
+        counters['hits' if hit else 'misses'] += 1
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Hit/miss counters and hit rate per namespace"""
+        stats = {}
+        for namespace, counters in self._counters.items():
+            total = counters['hits'] + counters['misses']
+            stats[namespace] = {
+                'hits': counters['hits'],
+                'misses': counters['misses'],
+                'hit_rate': counters['hits'] / total if total else 0.0,
+                'entries': len(self._namespaces.get(namespace, {}).get('entries', {}))
+            }
+        return stats
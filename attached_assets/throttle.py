@@ -0,0 +1,127 @@
+import time
+import logging
+from collections import Counter
+from typing import Any, Callable, Dict, Optional
+from telegram import Update
+from telegram.error import TelegramError
+from telegram.ext import ApplicationHandlerStop, ContextTypes
+from database import Database
+from outbox import Outbox
+from rate_limit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+USER_LIMIT_TEXT = "⏳ You're going too fast. Please wait a moment and try again."
+GLOBAL_LIMIT_TEXT = "⏳ The bot is very busy right now. Please try again in a moment."
+
+
+class UpdateThrottle:
+    """Token-bucket limits on incoming updates, checked before any handler.
+
+    Registered as a TypeHandler in the first handler group. An update over
+    the per-user or the global limit gets a fixed notice and is stopped with
+    ApplicationHandlerStop, so it never reaches the cache sync or the DB.
+    Callback queries are always answered (that clears the button spinner);
+    text messages get at most one notice per `notice_interval` per user.
+    Limits come from the admin settings and are re-read every
+    `reload_interval` seconds.
+    """
+
+    def __init__(self, database: Database, outbox: Outbox,
+                 classify: Optional[Callable[[Update], str]] = None,
+                 reload_interval: float = 30.0, notice_interval: float = 10.0,
+                 max_user_buckets: int = 10000):
+        self.db = database
+        self.outbox = outbox
+        self.classify = classify or (lambda update: 'update')
+        self.reload_interval = reload_interval
+        self.notice_interval = notice_interval
+        self.max_user_buckets = max_user_buckets
+        self.limits: Optional[tuple] = None
+        self.global_bucket: Optional[TokenBucket] = None
+        # user_id -> [bucket, monotonic time of the last notice]
+        self.user_entries: Dict[int, list] = {}
+        self._loaded = float('-inf')
+        self.counters = {'allowed': 0, 'user_throttled': 0, 'global_throttled': 0}
+        self.by_handler: Counter = Counter()
+
+    def reload(self):
+        """Re-read the limits; buckets are rebuilt only when they changed"""
+        settings = self.db.get_settings()
+        limits = (
+            bool(settings.get('rate_limit_enabled', True)),
+            max(int(settings.get('user_rate_per_minute', 30)), 1),
+            max(int(settings.get('user_burst', 10)), 1),
+            max(int(settings.get('global_rate_per_second', 30)), 1)
+        )
+        if limits != self.limits:
+            self.limits = limits
+            self.global_bucket = TokenBucket(limits[3], limits[3])
+            self.user_entries = {}
+            logger.info(f"Update limits: enabled={limits[0]}, {limits[1]}/min per user "
+                        f"(burst {limits[2]}), {limits[3]}/s overall")
+        self._loaded = time.monotonic()
+
+    def _user_entry(self, user_id: int) -> list:
+        entry = self.user_entries.get(user_id)
+        if entry is None:
+            if len(self.user_entries) >= self.max_user_buckets:
+                # Full buckets carry no state, so they can be dropped
+                self.user_entries = {uid: e for uid, e in self.user_entries.items() if not e[0].idle}
+            _, per_minute, burst, _ = self.limits
+            entry = [TokenBucket(per_minute / 60.0, burst), float('-inf')]
+            self.user_entries[user_id] = entry
+        return entry
+
+    def check(self, user_id: Optional[int]) -> Optional[str]:
+        """None if the update may go ahead, otherwise 'user' or 'global'"""
+        if time.monotonic() - self._loaded > self.reload_interval:
+            self.reload()
+        if not self.limits[0]:
+            return None
+        user_bucket = self._user_entry(user_id)[0] if user_id is not None else None
+        if user_bucket is not None and not user_bucket.try_acquire():
+            return 'user'
+        if not self.global_bucket.try_acquire():
+            # The update never ran, so it should not count against the user
+            if user_bucket is not None:
+                user_bucket.refund()
+            return 'global'
+        return None
+
+    async def handle(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """TypeHandler callback: lets the update through or stops it"""
+        user = update.effective_user
+        limited = self.check(user.id if user else None)
+        if limited is None:
+            self.counters['allowed'] += 1
+            return
+
+        self.counters[f'{limited}_throttled'] += 1
+        self.by_handler[self.classify(update)] += 1
+        await self._notify(update, user.id if user else None, limited)
+        raise ApplicationHandlerStop
+
+    async def _notify(self, update: Update, user_id: Optional[int], limited: str):
+        text = USER_LIMIT_TEXT if limited == 'user' else GLOBAL_LIMIT_TEXT
+        try:
+            if update.callback_query:
+                await update.callback_query.answer(text)
+            elif update.message and user_id is not None:
+                entry = self.user_entries.get(user_id)
+                now = time.monotonic()
+                if entry is not None and now - entry[1] < self.notice_interval:
+                    return
+                if entry is not None:
+                    entry[1] = now
+                await self.outbox.reply(update.message, text)
+        except TelegramError as e:
+            logger.debug(f"Throttle notice failed: {e}")
+
+    def metrics(self) -> Dict[str, Any]:
+        """Allowed/throttled counts and throttled updates per handler"""
+        return {
+            **self.counters,
+            'tracked_users': len(self.user_entries),
+            'by_handler': dict(self.by_handler)
+        }
@@ -0,0 +1,110 @@
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List
+from database import Database
+
+
+class UserCache:
+    """Per-user state for the bot process, bounded LRU with TTL.
+
+    Rows are written through: every Database write method re-reads the rows
+    it changed inside its transaction and hands them to this cache. Writes
+    from other processes (the admin panel adding coins) land in the
+    user_changes log; `sync()` reads the log past the last position seen,
+    once per update, and drops users whose cached row is older than their
+    latest change.
+    """
+
+    def __init__(self, database: Database, max_entries: int = 10000, ttl: float = 300.0,
+                 enabled: bool = True, prune_interval: float = 3600.0):
+        self.db = database
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.enabled = enabled
+        self.prune_interval = prune_interval
+        self.lock = threading.Lock()
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()
+        self._seq = database.get_user_change_seq()
+        self._last_prune = time.monotonic()
+        self.counters = {'hits': 0, 'misses': 0, 'evictions': 0, 'expired': 0,
+                         'invalidations': 0, 'write_through': 0}
+        database.add_user_listener(self._on_write)
+
+    def sync(self) -> List[tuple]:
+        """Invalidate users changed elsewhere since the last sync; returns the (seq, user_id) rows read"""
+        changes = self.db.get_user_changes(self._seq)
+        if changes:
+            with self.lock:
+                for seq, user_id in changes:
+                    entry = self._entries.get(user_id)
+                    if entry is not None and entry[1] < seq:
+                        del self._entries[user_id]
+                        self.counters['invalidations'] += 1
+                self._seq = max(self._seq, changes[-1][0])
+
+        if time.monotonic() - self._last_prune > self.prune_interval:
+            self._last_prune = time.monotonic()
+            self.db.prune_user_changes()
+        return changes
+
+    def get(self, user_id: int) -> Dict[str, Any]:
+        """Cached user state ({} for unknown users, which are not cached)"""
+        if not self.enabled:
+            return self.db.get_user_state(user_id)
+
+        now = time.monotonic()
+        with self.lock:
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(user_id)
+                    self.counters['hits'] += 1
+                    return dict(entry[2])
+                del self._entries[user_id]
+                self.counters['expired'] += 1
+            self.counters['misses'] += 1
+
+        state = self.db.get_user_state(user_id)
+        if state:
+            self._store([state])
+        return dict(state)
+
+    def invalidate(self, user_id: int):
+        with self.lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self.lock:
+            self._entries.clear()
+
+    def _on_write(self, states: List[Dict[str, Any]]):
+        if not self.enabled:
+            return
+        self._store(states)
+        self.counters['write_through'] += len(states)
+
+    def _store(self, states: List[Dict[str, Any]]):
+        expires = time.monotonic() + self.ttl
+        with self.lock:
+            for state in states:
+                user_id = state['user_id']
+                entry = self._entries.get(user_id)
+                # A slower reader must not overwrite a newer write-through row
+                if entry is not None and entry[1] > state['seq']:
+                    continue
+                self._entries[user_id] = (expires, state['seq'], state)
+                self._entries.move_to_end(user_id)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.counters['evictions'] += 1
+
+    def metrics(self) -> Dict[str, Any]:
+        """Hit rate, evictions and invalidation counters"""
+        lookups = self.counters['hits'] + self.counters['misses']
+        return {
+            **self.counters,
+            'entries': len(self._entries),
+            'hit_rate': self.counters['hits'] / lookups if lookups else 0.0
+        }